@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivos do diretório sql_batches/ (00_setup.sql, NN_insert_batch_A_to_B.sql, NN_cleanup.sql)
+Layout compartilhado por split-sql-file.py e pelo modo paralelo do csv-to-sql.py
+"""
+
+import os
+
+def batch_filename(file_count, first_record, last_record):
+    """Nome de um lote de inserção no formato NN_insert_batch_A_to_B.sql"""
+    return f"{file_count:02d}_insert_batch_{first_record}_to_{last_record}.sql"
+
+def write_setup_file(output_dir, header_commands):
+    """Grava o 00_setup.sql com os comandos de cabeçalho"""
+    setup_content = '\n'.join(header_commands).strip()
+    if setup_content:
+        setup_file = os.path.join(output_dir, '00_setup.sql')
+        with open(setup_file, 'w', encoding='utf-8') as f:
+            f.write(setup_content)
+        print(f"✅ Criado: {setup_file}")
+
+def write_cleanup_file(output_dir, file_count, footer_commands):
+    """Grava o NN_cleanup.sql (numerado depois do último lote) com os comandos de rodapé"""
+    cleanup_content = '\n'.join(footer_commands).strip()
+    if cleanup_content:
+        cleanup_file = os.path.join(output_dir, f'{file_count+1:02d}_cleanup.sql')
+        with open(cleanup_file, 'w', encoding='utf-8') as f:
+            f.write(cleanup_content)
+        print(f"✅ Criado: {cleanup_file}")
+
+def write_instructions_file(output_dir, file_count, records_per_file, total_inserts, total_chars):
+    """Grava o README_INSTRUCTIONS.md com a ordem de execução e as estatísticas; retorna o caminho"""
+    instructions_file = os.path.join(output_dir, 'README_INSTRUCTIONS.md')
+    with open(instructions_file, 'w', encoding='utf-8') as f:
+        f.write(f"""# Instruções para Importação dos Dados
+
+## Arquivos Gerados
+
+O arquivo SQL original foi dividido em {file_count + 2} arquivos menores:
+
+### 1. Setup (00_setup.sql)
+- Desabilita RLS temporariamente
+- Deve ser executado PRIMEIRO
+
+### 2. Lotes de Inserção (01_insert_batch_*.sql)
+- {file_count} arquivos com até {records_per_file} registros cada
+- Execute em ordem numérica
+- Aguarde cada arquivo terminar antes do próximo
+
+### 3. Cleanup ({file_count+1:02d}_cleanup.sql)
+- Reabilita RLS
+- Recalcula as contagens do dashboard (se dashboard-aggregates.sql já foi executado)
+- Comandos de verificação
+- Deve ser executado POR ÚLTIMO
+
+## Como Executar
+
+### No Supabase Dashboard:
+
+1. Acesse o **SQL Editor** no Supabase Dashboard
+2. Execute os arquivos na ordem:
+   ```
+   00_setup.sql
+   01_insert_batch_1_to_{min(records_per_file, total_inserts)}.sql
+   02_insert_batch_{records_per_file+1}_to_{min(records_per_file*2, total_inserts)}.sql
+   ...
+   {file_count+1:02d}_cleanup.sql
+   ```
+
+3. **IMPORTANTE**: Aguarde cada arquivo terminar completamente antes de executar o próximo
+
+4. Se algum arquivo der erro, você pode re-executá-lo individualmente
+
+### Verificação
+
+Após executar todos os arquivos, verifique:
+
+```sql
+-- Contar total de registros
+SELECT COUNT(*) as total_leads FROM public.leads;
+
+-- Verificar alguns registros
+SELECT * FROM public.leads LIMIT 10;
+
+-- Verificar RLS está ativo
+SELECT schemaname, tablename, rowsecurity 
+FROM pg_tables 
+WHERE tablename = 'leads';
+```
+
+## Solução de Problemas
+
+- **Erro de timeout**: Reduza o tamanho dos lotes (re-execute este script com records_per_file menor)
+- **Erro de permissão**: Verifique se RLS foi desabilitado no setup
+- **Dados duplicados**: Use `DELETE FROM leads WHERE lead_id = 'ID_ESPECÍFICO';` para remover duplicatas
+
+## Estatísticas
+
+- **Total de registros**: {total_inserts:,}
+- **Registros por arquivo**: {records_per_file}
+- **Arquivos gerados**: {file_count + 2}
+- **Tamanho original**: {total_chars:,} caracteres
+""")
+    
+
+    return instructions_file
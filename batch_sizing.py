@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Controle adaptativo do tamanho dos lotes de importação
+Mede a latência e as falhas de cada lote e ajusta o tamanho em direção a uma latência alvo
+"""
+
+import threading
+
+DEFAULT_TARGET_SECONDS = 2.0
+
+class AdaptiveBatchSizer:
+    """
+    Ajusta o tamanho do lote a partir da latência e das falhas dos lotes já enviados
+
+    A latência por registro é suavizada (média móvel exponencial) e o tamanho ideal
+    é target_seconds dividido por ela. O crescimento é gradual (no máximo 1.5x o lote
+    medido) e uma falha reduz o lote à metade do que falhou; o tamanho que falhou passa
+    (com folga de 20%) a ser o teto até que lotes menores funcionem várias vezes seguidas.
+    Mudanças menores que 10% são ignoradas, para não oscilar a cada lote.
+
+    Args:
+        initial: Tamanho inicial (o antigo valor fixo do script)
+        minimum: Menor tamanho permitido
+        maximum: Maior tamanho permitido
+        target_seconds: Latência desejada por lote
+        log: Função usada para registrar cada decisão (None para silenciar)
+    """
+
+    def __init__(self, initial=100, minimum=10, maximum=5000, target_seconds=DEFAULT_TARGET_SECONDS, log=print):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.size = min(max(initial, minimum), self.maximum)
+        self.target_seconds = target_seconds
+        self.log = log
+        self.ceiling = self.maximum
+        self.seconds_per_row = None
+        self.successes_since_failure = 0
+        self.decisions = 0
+        self._lock = threading.Lock()
+
+    def record(self, rows, seconds, success):
+        """Registra o resultado de um lote de rows registros que levou seconds segundos"""
+        if rows <= 0:
+            return
+
+        with self._lock:
+            # As decisões partem do tamanho do lote medido, e não do atual: com vários lotes
+            # em andamento, resultados de lotes antigos não devem ser contados duas vezes
+            if not success:
+                self.successes_since_failure = 0
+                self.ceiling = max(self.minimum, min(self.ceiling, int(rows * 0.8)))
+                self._resize(min(self.size, rows // 2), f"falha num lote de {rows} registros")
+                return
+
+            self.successes_since_failure += 1
+            per_row = seconds / rows
+            if self.seconds_per_row is None:
+                self.seconds_per_row = per_row
+            else:
+                self.seconds_per_row = 0.7 * self.seconds_per_row + 0.3 * per_row
+
+            # Depois de 20 sucessos seguidos, o teto imposto pela última falha é liberado aos poucos
+            if self.successes_since_failure >= 20 and self.ceiling < self.maximum:
+                self.ceiling = min(self.maximum, int(self.ceiling * 1.25) + 1)
+                self.successes_since_failure = 0
+
+            ideal = self.target_seconds / self.seconds_per_row if self.seconds_per_row > 0 else self.maximum
+            new_size = min(int(ideal), max(self.size, int(rows * 1.5) + 1))
+            self._resize(new_size, f"latência {seconds:.2f}s para {rows} registros, alvo {self.target_seconds:.1f}s")
+
+    def _resize(self, new_size, reason):
+        new_size = max(self.minimum, min(new_size, self.ceiling, self.maximum))
+        if new_size == self.size or abs(new_size - self.size) < self.size * 0.1:
+            return
+
+        old_size, self.size = self.size, new_size
+        self.decisions += 1
+        if self.log:
+            arrow = '📈' if new_size > old_size else '📉'
+            self.log(f"{arrow} Tamanho do lote: {old_size} → {new_size} registros ({reason})")
+
+def iter_adaptive_batches(rows, sizer):
+    """Agrupa um iterável em listas cujo tamanho acompanha sizer.size no momento de cada corte"""
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= sizer.size:
+            yield batch
+            batch = []
+
+    if batch:
+        yield batch
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do codificador binário do COPY (copy_binary) contra o formato texto (CopyTextStream)
+Mede só a codificação dos blocos já normalizados e, com --dsn, o COPY completo num banco local
+"""
+
+import argparse
+import importlib
+import os
+import tempfile
+import time
+from itertools import chain
+
+from copy_binary import BinaryCopyEncoder, BinaryCopyStream
+from leads_csv import LEAD_COLUMNS, iter_column_batches
+from synthetic_leads import write_synthetic_leads_csv
+
+csv_to_sql = importlib.import_module('csv-to-sql')
+
+READ_SIZE = 65536
+
+def column_types(timestamptz):
+    """Tipos de final-import.sql; com timestamptz, data_hora_agendamento_bposs como em create-leads-table.sql"""
+    types = {'data_criada': 'date', 'data_entrada_agendamento': 'date'}
+    if timestamptz:
+        types['data_hora_agendamento_bposs'] = 'timestamp with time zone'
+    return [types.get(column, 'text') for column in LEAD_COLUMNS]
+
+def make_streams(batches, types):
+    return {
+        'texto': lambda: csv_to_sql.CopyTextStream(chain.from_iterable(batch.rows() for batch in batches)),
+        'binário': lambda: BinaryCopyStream(batches, BinaryCopyEncoder(types)),
+    }
+
+def drain(stream):
+    """Lê o stream inteiro como o copy_expert faria; retorna os bytes gerados"""
+    total = 0
+    while True:
+        data = stream.read(READ_SIZE)
+        if not data:
+            return total
+        total += len(data)
+
+def benchmark_encoding(batches, types, rows):
+    print(f"\n⏱️  Codificação ({rows:,} registros já normalizados em memória)")
+    print(f"{'formato':>10} {'tempo (s)':>10} {'MB gerados':>11} {'MB/s':>8} {'registros/s':>12}")
+
+    elapsed = {}
+    for name, make_stream in make_streams(batches, types).items():
+        start = time.perf_counter()
+        size = drain(make_stream())
+        elapsed[name] = time.perf_counter() - start
+        megabytes = size / 1024 / 1024
+        print(f"{name:>10} {elapsed[name]:>10.2f} {megabytes:>11.1f} {megabytes / elapsed[name]:>8.1f} "
+              f"{rows / elapsed[name]:>12,.0f}")
+
+    print(f"\n✅ Binário {elapsed['texto'] / elapsed['binário']:.2f}x mais rápido que texto na codificação")
+
+def benchmark_copy(batches, types, rows, dsn):
+    """COPY completo para uma tabela temporária em cada formato; confere se o conteúdo é idêntico"""
+    import psycopg2
+
+    definition = ', '.join(f"{column} {type_name}" for column, type_name in zip(LEAD_COLUMNS, types))
+    columns = ', '.join(LEAD_COLUMNS)
+
+    print(f"\n⏱️  COPY completo ({rows:,} registros)")
+    print(f"{'formato':>10} {'tempo (s)':>10} {'registros/s':>12}")
+
+    digests = {}
+    conn = psycopg2.connect(dsn)
+    try:
+        conn.set_client_encoding('UTF8')
+        with conn.cursor() as cur:
+            # O texto de data/hora do CRM é DD/MM/YYYY; no formato binário o servidor não interpreta nada
+            cur.execute("SET DateStyle = 'ISO, DMY'")
+            for name, make_stream in make_streams(batches, types).items():
+                cur.execute("DROP TABLE IF EXISTS leads_copy_benchmark")
+                cur.execute(f"CREATE TEMP TABLE leads_copy_benchmark (id BIGSERIAL, {definition})")
+                options = " WITH (FORMAT binary)" if name == 'binário' else ""
+
+                start = time.perf_counter()
+                cur.copy_expert(f"COPY leads_copy_benchmark ({columns}) FROM STDIN{options}", make_stream(),
+                                size=READ_SIZE)
+                elapsed = time.perf_counter() - start
+
+                cur.execute(f"SELECT md5(string_agg(row({columns})::text, E'\\n' ORDER BY id)) "
+                            f"FROM leads_copy_benchmark")
+                digests[name] = cur.fetchone()[0]
+                print(f"{name:>10} {elapsed:>10.2f} {rows / elapsed:>12,.0f}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+    if digests['texto'] != digests['binário']:
+        print("❌ Os dois formatos carregaram dados diferentes!")
+    else:
+        print("✅ Conteúdo idêntico nos dois formatos")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do COPY binário contra o COPY texto')
+    parser.add_argument('--rows', type=int, default=200000, help='Registros no CSV sintético')
+    parser.add_argument('--csv', help='Usar um CSV existente em vez de gerar um sintético')
+    parser.add_argument('--timestamptz', action='store_true',
+                        help='Tratar data_hora_agendamento_bposs como timestamptz (create-leads-table.sql)')
+    parser.add_argument('--dsn', help='Também medir o COPY completo neste banco (ex.: PostgreSQL local)')
+    args = parser.parse_args()
+
+    types = column_types(args.timestamptz)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if not path:
+            path = os.path.join(tmp, 'synthetic_leads.csv')
+            print(f"📝 Gerando CSV sintético com {args.rows:,} registros...")
+            # Sem registros estragados: as linhas curtas violariam o NOT NULL no COPY completo
+            write_synthetic_leads_csv(path, args.rows, malformed_rate=0.0)
+
+        with open(path, 'r', encoding='utf-8') as csv_file:
+            batches = list(iter_column_batches(csv_file))
+
+    rows = sum(batch.row_count for batch in batches)
+    benchmark_encoding(batches, types, rows)
+
+    if args.dsn:
+        benchmark_copy(batches, types, rows, args.dsn)
+
+if __name__ == '__main__':
+    main()
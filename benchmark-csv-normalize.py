@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark da normalização colunar do CSV (leads_csv.iter_column_batches)
+Gera um CSV sintético no formato do export do CRM e compara com o caminho antigo,
+registro a registro (DictReader + row.get + escape_sql_string/convert_date)
+"""
+
+import argparse
+import csv
+import hashlib
+import importlib
+import os
+import tempfile
+import time
+
+from leads_csv import iter_column_batches
+from synthetic_leads import write_synthetic_leads_csv
+
+csv_to_sql = importlib.import_module('csv-to-sql')
+
+def legacy_values(csv_file):
+    """Caminho antigo de process_csv_to_sql(): uma linha de VALUES por registro"""
+    convert_date = csv_to_sql.convert_date
+    escape_sql_string = csv_to_sql.escape_sql_string
+
+    for row in csv.DictReader(csv_file):
+        lead_id = escape_sql_string(row.get('lead_id', ''))
+        usuario_responsavel = escape_sql_string(row.get('usuario_responsavel', ''))
+        contato_principal = escape_sql_string(row.get('contato_principal (obrigatório)', ''))
+        data_criada = convert_date(row.get('data_criada', ''))
+        fonte_lead = escape_sql_string(row.get('fonte_lead', ''))
+        etapa_funil = escape_sql_string(row.get('etapa_funil (obrigatório)', ''))
+        estado_onde_mora = escape_sql_string(row.get('estado onde mora', ''))
+        tipo_agendamento = escape_sql_string(row.get('tipo_agendamento', ''))
+        respostas_ia = escape_sql_string(row.get('respostas_ia', ''))
+        email_comercial = escape_sql_string(row.get('email_comercial', ''))
+        telefone_comercial = escape_sql_string(row.get('telefone_comercial', ''))
+        estado_contato = escape_sql_string(row.get('estado_contato', ''))
+        permissao_trabalho = escape_sql_string(row.get('permissao_trabalho (obrigatório)', ''))
+        data_entrada_agendamento = convert_date(row.get('data_entrada_agendamento', ''))
+        data_hora_agendamento_bposs = escape_sql_string(row.get('data_hora_agendamento_bposs', ''))
+
+        yield f"""(
+    {lead_id},
+    {usuario_responsavel},
+    {contato_principal},
+    {data_criada},
+    {fonte_lead},
+    {etapa_funil},
+    {estado_onde_mora},
+    {tipo_agendamento},
+    {respostas_ia},
+    {email_comercial},
+    {telefone_comercial},
+    {estado_contato},
+    {permissao_trabalho},
+    {data_entrada_agendamento},
+    {data_hora_agendamento_bposs}
+)"""
+
+def columnar_values(csv_file):
+    """Caminho novo: blocos colunares formatados com format_sql_columns"""
+    for batch in iter_column_batches(csv_file):
+        yield from csv_to_sql.format_sql_columns(batch)
+
+def time_path(path, values_function):
+    """Consome todas as linhas de VALUES; retorna (registros, hash do texto, segundos)"""
+    digest = hashlib.blake2b(digest_size=16)
+    rows = 0
+
+    start = time.perf_counter()
+    with open(path, 'r', encoding='utf-8') as csv_file:
+        for values in values_function(csv_file):
+            digest.update(values.encode('utf-8'))
+            rows += 1
+    return rows, digest.hexdigest(), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da normalização colunar do CSV de leads')
+    parser.add_argument('--rows', type=int, default=1000000, help='Registros no CSV sintético')
+    parser.add_argument('--csv', help='Usar um CSV existente em vez de gerar um sintético')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.csv
+        if not path:
+            path = os.path.join(tmp, 'synthetic_leads.csv')
+            print(f"📝 Gerando CSV sintético com {args.rows:,} registros...")
+            write_synthetic_leads_csv(path, args.rows)
+
+        megabytes = os.path.getsize(path) / 1024 / 1024
+        print(f"⏱️  Benchmark de normalização: {path} ({megabytes:.1f} MB)")
+        print(f"{'caminho':>12} {'registros':>10} {'tempo (s)':>10} {'MB/s':>8} {'registros/s':>12}")
+
+        results = {}
+        for name, values_function in (('registro', legacy_values), ('colunar', columnar_values)):
+            rows, digest, elapsed = time_path(path, values_function)
+            results[name] = (digest, elapsed)
+            print(f"{name:>12} {rows:>10,} {elapsed:>10.2f} {megabytes / elapsed:>8.1f} {rows / elapsed:>12,.0f}")
+
+    if results['registro'][0] != results['colunar'][0]:
+        print("❌ Os dois caminhos geraram SQL diferente!")
+        return
+
+    speedup = results['registro'][1] / results['colunar'][1]
+    print(f"\n✅ SQL idêntico nos dois caminhos; colunar {speedup:.2f}x mais rápido")
+
+if __name__ == '__main__':
+    main()
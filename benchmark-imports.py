@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark dos caminhos de importação com CSVs sintéticos (10 mil a 5 milhões de leads)
+Executa csv-to-sql.py, split-sql-file.py e os importadores REST/psql contra servidores
+locais e grava vazão, pico de memória (RSS) e tempo de cada etapa num arquivo JSON
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+from import_metrics import METRICS_ENV
+from synthetic_leads import write_synthetic_leads_csv
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ALL_STAGES = ['csv-to-sql', 'csv-to-sql-parallel', 'split-sql-file', 'rest-csv', 'copy', 'psql-batches']
+DATABASE_STAGES = {'copy', 'psql-batches'}
+
+# Mesma tabela do final-import.sql, sem as políticas RLS (que dependem do schema auth do Supabase)
+BENCHMARK_SCHEMA = """
+DROP TABLE IF EXISTS public.leads CASCADE;
+CREATE TABLE public.leads (
+    id BIGSERIAL PRIMARY KEY,
+    lead_id TEXT,
+    usuario_responsavel TEXT,
+    contato_principal TEXT NOT NULL,
+    data_criada DATE,
+    fonte_lead TEXT,
+    etapa_funil TEXT NOT NULL,
+    estado_onde_mora TEXT,
+    tipo_agendamento TEXT,
+    respostas_ia TEXT,
+    email_comercial TEXT,
+    telefone_comercial TEXT,
+    estado_contato TEXT,
+    permissao_trabalho TEXT NOT NULL,
+    data_entrada_agendamento DATE,
+    data_hora_agendamento_bposs TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+CREATE INDEX idx_leads_lead_id ON public.leads(lead_id);
+CREATE INDEX idx_leads_contato_principal ON public.leads(contato_principal);
+CREATE INDEX idx_leads_etapa_funil ON public.leads(etapa_funil);
+CREATE INDEX idx_leads_data_criada ON public.leads(data_criada);
+CREATE INDEX idx_leads_created_at ON public.leads(created_at);
+"""
+
+def parse_size(text):
+    """Converte '10k', '1m', '5M' ou '25000' em número de registros"""
+    text = text.strip().lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * multiplier)
+
+def script(name):
+    return os.path.join(SCRIPT_DIR, name)
+
+def run_stage(command, log_path, env=None):
+    """
+    Executa um comando e mede tempo de parede e pico de RSS do processo filho
+
+    O RSS vem de os.wait4, que retorna o consumo só deste filho (e não o máximo
+    acumulado de todos os filhos, como getrusage(RUSAGE_CHILDREN)).
+    """
+    with open(log_path, 'w', encoding='utf-8') as log:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                   env=env, cwd=os.path.dirname(log_path))
+        _, status, usage = os.wait4(process.pid, 0)
+        elapsed = time.perf_counter() - start
+
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak_rss_mb = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return {'wall_seconds': round(elapsed, 3), 'peak_rss_mb': round(peak_rss_mb, 1), 'exit_code': process.returncode}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+class StubServer:
+    """stub-postgrest-server.py rodando em segundo plano numa porta livre"""
+
+    def __init__(self, log_path):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._log = open(log_path, 'w', encoding='utf-8')
+        self.process = subprocess.Popen([sys.executable, script('stub-postgrest-server.py'), '--port', str(self.port)],
+                                        stdout=self._log, stderr=subprocess.STDOUT)
+
+        for _ in range(100):
+            try:
+                self.stats()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("stub-postgrest-server.py não respondeu")
+
+    def stats(self):
+        with urllib.request.urlopen(f"{self.url}/stats", timeout=5) as response:
+            return json.loads(response.read())
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait()
+        self._log.close()
+
+def psql(dsn, sql):
+    """Executa SQL via psql e retorna a saída sem formatação"""
+    result = subprocess.run(['psql', dsn, '-v', 'ON_ERROR_STOP=1', '-q', '-At', '-c', sql],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip()
+
+def read_stage_totals(metrics_path):
+    """Tempo por etapa interna ({etapa: segundos}) da linha de resumo gravada via IMPORT_METRICS"""
+    if not os.path.exists(metrics_path):
+        return None
+
+    with open(metrics_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry.get('type') == 'summary':
+                return {stage: round(values[0], 3) for stage, values in entry['stages'].items()}
+    return None
+
+def benchmark_size(rows, stages, workdir, dsn, stub, malformed_rate):
+    """Gera o CSV com rows registros e executa as etapas escolhidas; retorna os resultados"""
+    csv_path = os.path.join(workdir, f"leads_{rows}.csv")
+    if not os.path.exists(csv_path):
+        print(f"📝 Gerando {rows:,} leads sintéticos...")
+        write_synthetic_leads_csv(csv_path, rows, malformed_rate=malformed_rate)
+    csv_mb = os.path.getsize(csv_path) / 1024 / 1024
+
+    sql_path = os.path.join(workdir, f"leads_{rows}.sql")
+    batches_dir = os.path.join(workdir, f"sql_batches_{rows}")
+    parallel_dir = os.path.join(workdir, f"sql_batches_parallel_{rows}")
+    env = dict(os.environ, DATABASE_URL=dsn or '', PYTHONUNBUFFERED='1')
+    if stub:
+        env.update(VITE_SUPABASE_URL=stub.url, SUPABASE_SERVICE_ROLE_KEY='benchmark')
+
+    commands = {
+        'csv-to-sql': [script('csv-to-sql.py'), '--csv', csv_path, '--output', sql_path],
+        'csv-to-sql-parallel': [script('csv-to-sql.py'), '--csv', csv_path, '--batches-dir', parallel_dir],
+        'split-sql-file': [script('split-sql-file.py'), '--input', sql_path, '--output-dir', batches_dir],
+        'rest-csv': [script('import-batch-api.py'), '--csv', csv_path,
+                     '--journal', os.path.join(workdir, f"rest_{rows}.journal")],
+        'copy': [script('csv-to-sql.py'), '--csv', csv_path, '--copy'],
+        'psql-batches': [script('import-direct-psql.py'), '--dir', batches_dir, '--yes'],
+    }
+
+    results = []
+    for stage in stages:
+        # Cada etapa parte do zero: sem saídas de uma execução anterior
+        if stage == 'csv-to-sql-parallel':
+            shutil.rmtree(parallel_dir, ignore_errors=True)
+        elif stage == 'split-sql-file':
+            shutil.rmtree(batches_dir, ignore_errors=True)
+        elif stage in DATABASE_STAGES:
+            psql(dsn, BENCHMARK_SCHEMA)
+
+        stub_rows = stub.stats()['rows'] if stage == 'rest-csv' else 0
+
+        # Os scripts gravam o tempo de cada etapa interna (parse, normalize, network...) neste arquivo
+        metrics_path = os.path.join(workdir, f"{stage}_{rows}.metrics.jsonl")
+        if os.path.exists(metrics_path):
+            os.remove(metrics_path)
+
+        print(f"⏱️  {stage} ({rows:,} registros)...", end=' ', flush=True)
+        result = run_stage([sys.executable] + commands[stage], os.path.join(workdir, f"{stage}_{rows}.log"),
+                           dict(env, **{METRICS_ENV: metrics_path}))
+        result['stages'] = read_stage_totals(metrics_path)
+
+        if stage == 'rest-csv':
+            result['loaded_rows'] = stub.stats()['rows'] - stub_rows
+        elif stage in DATABASE_STAGES:
+            result['loaded_rows'] = int(psql(dsn, "SELECT COUNT(*) FROM public.leads"))
+
+        seconds = result['wall_seconds']
+        result.update({
+            'stage': stage,
+            'rows': rows,
+            'csv_mb': round(csv_mb, 1),
+            'rows_per_second': round(rows / seconds) if seconds else None,
+            'mb_per_second': round(csv_mb / seconds, 2) if seconds else None,
+        })
+        results.append(result)
+
+        status = '✅' if result['exit_code'] == 0 else f"❌ (código {result['exit_code']})"
+        print(f"{status} {seconds:.2f}s, {result['rows_per_second'] or 0:,} registros/s, "
+              f"pico {result['peak_rss_mb']:.0f} MB")
+
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_comparison(previous_path, runs):
+    """Compara a vazão desta execução com a de um arquivo de resultados anterior"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+
+    before = {(run['stage'], run['rows']): run for run in previous['runs']}
+    print(f"\n📊 Comparação com {previous_path} (versão {previous.get('git_revision') or '?'}):")
+    print(f"{'etapa':>20} {'registros':>10} {'antes/s':>10} {'agora/s':>10} {'variação':>9} {'RSS MB':>13}")
+
+    for run in runs:
+        old = before.get((run['stage'], run['rows']))
+        if not old or not old.get('rows_per_second') or not run.get('rows_per_second'):
+            continue
+        change = (run['rows_per_second'] / old['rows_per_second'] - 1) * 100
+        print(f"{run['stage']:>20} {run['rows']:>10,} {old['rows_per_second']:>10,} {run['rows_per_second']:>10,} "
+              f"{change:>+8.1f}% {old['peak_rss_mb']:>6.0f}→{run['peak_rss_mb']:<6.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark dos importadores de leads com dados sintéticos')
+    parser.add_argument('--sizes', default='10k,100k', help='Tamanhos separados por vírgula (ex.: 10k,100k,1m,5m)')
+    parser.add_argument('--stages', default=','.join(ALL_STAGES), help='Etapas separadas por vírgula')
+    parser.add_argument('--dsn', help='PostgreSQL local para as etapas copy e psql-batches (padrão: DATABASE_URL)')
+    parser.add_argument('--malformed-rate', type=float, default=0.01, help='Fração de registros malformados')
+    parser.add_argument('--workdir', help='Diretório de trabalho (mantido; padrão: temporário, apagado no fim)')
+    parser.add_argument('--output', help='Arquivo JSON de resultados (padrão: benchmark-results-<data>.json)')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    stages = [stage.strip() for stage in args.stages.split(',')]
+    unknown = [stage for stage in stages if stage not in ALL_STAGES]
+    if unknown:
+        print(f"❌ Etapas desconhecidas: {', '.join(unknown)} (disponíveis: {', '.join(ALL_STAGES)})")
+        return
+
+    dsn = args.dsn or os.getenv('DATABASE_URL')
+    if not dsn and DATABASE_STAGES.intersection(stages):
+        print("⚠️  Sem --dsn/DATABASE_URL: etapas copy e psql-batches ignoradas")
+        stages = [stage for stage in stages if stage not in DATABASE_STAGES]
+
+    # A ordem importa: split-sql-file usa o SQL de csv-to-sql, psql-batches usa os lotes do split
+    stages = [stage for stage in ALL_STAGES if stage in stages]
+
+    # Caminho absoluto: cada etapa roda com o diretório de trabalho como cwd
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='leads-benchmark-'))
+    os.makedirs(workdir, exist_ok=True)
+    output = args.output or f"benchmark-results-{datetime.now():%Y%m%d-%H%M%S}.json"
+
+    print(f"🏁 Benchmark de importação: {', '.join(f'{size:,}' for size in sizes)} registros")
+    print(f"📁 Diretório de trabalho: {workdir}")
+
+    started_at = datetime.now().isoformat(timespec='seconds')
+    stub = StubServer(os.path.join(workdir, 'stub.log')) if 'rest-csv' in stages else None
+    runs = []
+
+    try:
+        for rows in sizes:
+            runs.extend(benchmark_size(rows, stages, workdir, dsn, stub, args.malformed_rate))
+    finally:
+        if stub:
+            stub.close()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'started_at': started_at,
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'malformed_rate': args.malformed_rate,
+        'runs': runs,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print(f"\n💾 Resultados gravados em {output}")
+
+    if args.compare:
+        print_comparison(args.compare, runs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark das consultas do dashboard e da busca de leads com EXPLAIN ANALYZE
+Roda contra um PostgreSQL local (opcionalmente recarregado com leads sintéticos) e compara
+os tempos antes e depois de uma migração de índices, como leads-indexes.sql
+"""
+
+import argparse
+import importlib
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+from leads_partitions import PARTITIONED_SQL_FILE
+from synthetic_leads import write_synthetic_leads_csv
+
+benchmark_imports = importlib.import_module('benchmark-imports')
+csv_to_sql = importlib.import_module('csv-to-sql')
+
+DEFAULT_MIGRATION = 'leads-indexes.sql'
+
+# Consultas medidas: (nome, grupo, SQL). Os parâmetros %(...)s vêm de query_parameters()
+# O dashboard agrupa por estado, permissão, etapa e mês (leadsService.ts e o recálculo das contagens);
+# (recalculo_contagens é o SELECT de refresh_leads_dashboard_counts, medido se dashboard-aggregates.sql
+# estiver instalado); a busca filtra por etapa, permissão/estado e período (LeadsPage) e lista os mais recentes
+QUERIES = [
+    ('leads_por_estado', 'dashboard',
+     "SELECT estado_contato, COUNT(*) FROM public.leads WHERE estado_contato IS NOT NULL GROUP BY estado_contato"),
+    ('permissao_trabalho', 'dashboard',
+     "SELECT permissao_trabalho, COUNT(*) FROM public.leads GROUP BY permissao_trabalho"),
+    ('etapa_funil', 'dashboard',
+     "SELECT etapa_funil, COUNT(*) FROM public.leads GROUP BY etapa_funil"),
+    ('evolucao_mensal', 'dashboard',
+     "SELECT date_trunc('month', data_criada) AS mes, COUNT(*), "
+     "COUNT(*) FILTER (WHERE etapa_funil LIKE '%%meeting realizado%%') "
+     "FROM public.leads WHERE data_criada IS NOT NULL GROUP BY 1"),
+    ('reunioes_realizadas', 'dashboard',
+     "SELECT COUNT(*) FROM public.leads WHERE etapa_funil LIKE '%%meeting realizado%%'"),
+    ('recalculo_contagens', 'dashboard',
+     "SELECT b.dimension, b.bucket, COUNT(*), COUNT(*) FILTER (WHERE b.converted) FROM public.leads l "
+     "CROSS JOIN LATERAL public.leads_dashboard_buckets(l.estado_contato, l.permissao_trabalho, "
+     "l.etapa_funil, l.data_criada) b GROUP BY b.dimension, b.bucket"),
+    ('lista_recentes', 'busca',
+     "SELECT * FROM public.leads ORDER BY created_at DESC LIMIT 50"),
+    ('filtro_etapa', 'busca',
+     "SELECT * FROM public.leads WHERE etapa_funil = %(etapa)s ORDER BY data_criada DESC LIMIT 50"),
+    ('filtro_permissao_estado', 'busca',
+     "SELECT * FROM public.leads WHERE permissao_trabalho = %(permissao)s AND estado_contato = %(estado)s "
+     "ORDER BY data_criada DESC LIMIT 50"),
+    ('etapas_do_mes', 'busca',
+     "SELECT etapa_funil, COUNT(*) FROM public.leads "
+     "WHERE data_criada >= %(mes_inicio)s AND data_criada < %(mes_fim)s GROUP BY etapa_funil"),
+    ('reunioes_do_mes', 'busca',
+     "SELECT lead_id, contato_principal, data_criada FROM public.leads "
+     "WHERE etapa_funil LIKE '%%meeting realizado%%' AND data_criada >= %(mes_inicio)s AND data_criada < %(mes_fim)s "
+     "ORDER BY data_criada"),
+]
+
+def query_parameters(cur):
+    """Valores reais da tabela para os filtros: a etapa de conversão, a permissão e o estado mais comuns, o último mês"""
+    def most_common(column):
+        cur.execute(f"SELECT {column} FROM public.leads WHERE NULLIF(btrim({column}), '') IS NOT NULL "
+                    f"GROUP BY 1 ORDER BY COUNT(*) DESC LIMIT 1")
+        row = cur.fetchone()
+        return row[0] if row else ''
+
+    cur.execute("SELECT date_trunc('month', MAX(data_criada))::date, "
+                "(date_trunc('month', MAX(data_criada)) + interval '1 month')::date FROM public.leads")
+    month_start, month_end = cur.fetchone()
+    return {
+        'etapa': 'meeting realizado',
+        'permissao': most_common('permissao_trabalho'),
+        'estado': most_common('estado_contato'),
+        'mes_inicio': month_start,
+        'mes_fim': month_end,
+    }
+
+def plan_summary(plan, parent_indexes):
+    """
+    Nós de leitura do plano, ex.: 'Index Only Scan (idx_leads_etapa_data)', 'Seq Scan', e as tabelas lidas
+
+    Numa tabela particionada, cada partição tem a sua cópia do índice: o nome mostrado é o
+    do índice da tabela-mãe (parent_indexes), e o número de tabelas mostra a poda de partições.
+    """
+    scans = []
+    relations = set()
+
+    def walk(node):
+        if 'Scan' in node['Node Type']:
+            index = node.get('Index Name')
+            index = parent_indexes.get(index, index)
+            scans.append(f"{node['Node Type']} ({index})" if index else node['Node Type'])
+            if 'Relation Name' in node:
+                relations.add(node['Relation Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan)
+    return ', '.join(dict.fromkeys(scans)), len(relations)
+
+def explain_query(cur, sql, params, repeat, parent_indexes):
+    """
+    EXPLAIN (ANALYZE, BUFFERS) repetido: mediana e mínimo do Execution Time, páginas lidas e o plano
+
+    A primeira execução só aquece o cache de páginas e não entra nas estatísticas.
+    """
+    timings = []
+    planning = []
+    plan = None
+    for attempt in range(repeat + 1):
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        result = cur.fetchone()[0][0]
+        if attempt == 0:
+            continue
+        timings.append(result['Execution Time'])
+        planning.append(result['Planning Time'])
+        plan = result['Plan']
+
+    scans, relations = plan_summary(plan, parent_indexes)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'planning_ms': round(statistics.median(planning), 3),
+        'buffers': plan.get('Shared Hit Blocks', 0) + plan.get('Shared Read Blocks', 0),
+        'rows': plan['Actual Rows'],
+        'tables': relations,
+        'plan': scans,
+    }
+
+def run_queries(conn, repeat, label):
+    """Mede todas as QUERIES; cada uma roda numa transação desfeita no fim"""
+    results = {}
+    with conn.cursor() as cur:
+        params = query_parameters(cur)
+        # Índice de cada partição -> índice da tabela-mãe (vazio se public.leads não é particionada)
+        cur.execute("SELECT c.relname, p.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "JOIN pg_class p ON p.oid = i.inhparent WHERE c.relkind = 'i'")
+        parent_indexes = dict(cur.fetchall())
+        conn.rollback()
+
+        print(f"\n⏱️  Consultas ({label}; mediana de {repeat} execuções do EXPLAIN ANALYZE)")
+        print(f"{'consulta':>24} {'grupo':>9} {'mediana ms':>11} {'páginas':>9} {'tabelas':>8}  plano")
+        cur.execute("SELECT to_regprocedure('public.leads_dashboard_buckets(text, text, text, date)') IS NOT NULL")
+        has_aggregates = cur.fetchone()[0]
+        for name, group, sql in QUERIES:
+            if 'leads_dashboard_buckets' in sql and not has_aggregates:
+                continue
+            result = explain_query(cur, sql, params, repeat, parent_indexes)
+            conn.rollback()
+            result['group'] = group
+            results[name] = result
+            print(f"{name:>24} {group:>9} {result['median_ms']:>11.2f} {result['buffers']:>9,} "
+                  f"{result['tables']:>8}  {result['plan']}")
+
+    return results
+
+def table_summary(conn):
+    """Registros, tamanho da tabela e de cada índice de public.leads (somando as partições, se houver)"""
+    with conn.cursor() as cur:
+        # pg_partition_tree não devolve nada para uma tabela (ou índice) sem partições
+        cur.execute("SELECT (SELECT COUNT(*) FROM public.leads), "
+                    "COALESCE((SELECT SUM(pg_table_size(relid)) FROM pg_partition_tree('public.leads')), "
+                    "pg_table_size('public.leads'))")
+        rows, table_bytes = cur.fetchone()
+        cur.execute("SELECT indexrelid::regclass::text, "
+                    "COALESCE((SELECT SUM(pg_relation_size(relid)) FROM pg_partition_tree(indexrelid)), "
+                    "pg_relation_size(indexrelid)) FROM pg_index "
+                    "WHERE indrelid = 'public.leads'::regclass ORDER BY 1")
+        indexes = dict(cur.fetchall())
+    conn.rollback()
+    return {'rows': rows, 'table_mb': round(table_bytes / 1024 / 1024, 1),
+            'indexes_mb': {name: round(size / 1024 / 1024, 2) for name, size in indexes.items()}}
+
+def vacuum_analyze(conn):
+    """Estatísticas e mapa de visibilidade em dia: sem ele, o Index Only Scan volta a ler a tabela"""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("VACUUM ANALYZE public.leads")
+    finally:
+        conn.autocommit = False
+
+def load_synthetic_leads(dsn, rows, csv_path=None, partitioned=False):
+    """
+    Recria public.leads (como em final-import.sql, com os índices originais) e carrega leads sintéticos via COPY
+
+    Com partitioned=True a tabela vazia é convertida por leads-partitioned.sql antes da carga,
+    que então grava direto nas partições mensais.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        if not csv_path:
+            csv_path = os.path.join(tmp, 'synthetic_leads.csv')
+            print(f"📝 Gerando {rows:,} leads sintéticos...")
+            # Sem registros estragados: as linhas curtas violariam o NOT NULL no COPY
+            write_synthetic_leads_csv(csv_path, rows, malformed_rate=0.0)
+
+        print("🗑️  Recriando public.leads com os índices de final-import.sql")
+        benchmark_imports.psql(dsn, benchmark_imports.BENCHMARK_SCHEMA)
+        if partitioned:
+            print(f"🗓️  Particionando por mês com {PARTITIONED_SQL_FILE}")
+            with open(benchmark_imports.script(PARTITIONED_SQL_FILE), 'r', encoding='utf-8') as f:
+                # A tabela vazia de BENCHMARK_SCHEMA é convertida e a original, descartada
+                benchmark_imports.psql(dsn, "DROP TABLE IF EXISTS public.leads_nao_particionada;\n" + f.read() +
+                                       "\nDROP TABLE public.leads_nao_particionada;")
+        return csv_to_sql.copy_csv_to_postgres(csv_path, dsn)
+
+def apply_migration(conn, path):
+    """Executa o arquivo de migração numa transação; retorna os segundos gastos (criação dos índices)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        sql = f.read()
+
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(sql)
+    conn.commit()
+    return time.perf_counter() - start
+
+def print_comparison(before, after, before_label='antes', after_label='depois'):
+    """Tabela com a mediana de cada consulta antes e depois, e a variação"""
+    print(f"\n📊 Comparação ({before_label} → {after_label}):")
+    print(f"{'consulta':>24} {before_label + ' ms':>11} {after_label + ' ms':>11} {'ganho':>8} {'páginas':>19}")
+    for name, _, _ in QUERIES:
+        old, new = before.get(name), after.get(name)
+        if not old or not new:
+            continue
+        speedup = old['median_ms'] / new['median_ms'] if new['median_ms'] else float('inf')
+        print(f"{name:>24} {old['median_ms']:>11.2f} {new['median_ms']:>11.2f} {speedup:>7.1f}x "
+              f"{old['buffers']:>9,}→{new['buffers']:<9,}")
+
+def main():
+    parser = argparse.ArgumentParser(description='EXPLAIN ANALYZE das consultas do dashboard e da busca de leads')
+    parser.add_argument('--dsn', help='PostgreSQL local (padrão: DATABASE_URL); --rows recria public.leads nele')
+    parser.add_argument('--rows', type=int,
+                        help='Recriar public.leads com este número de leads sintéticos (padrão: usar os dados atuais)')
+    parser.add_argument('--csv', help='Com --rows: carregar este CSV em vez de gerar um sintético')
+    parser.add_argument('--partitioned', action='store_true',
+                        help=f'Com --rows: particionar public.leads por mês ({PARTITIONED_SQL_FILE}) antes da carga')
+    parser.add_argument('--apply', nargs='?', const=DEFAULT_MIGRATION,
+                        help=f'Medir, aplicar a migração (padrão: {DEFAULT_MIGRATION}) e medir de novo')
+    parser.add_argument('--repeat', type=int, default=5, help='Execuções medidas por consulta')
+    parser.add_argument('--output', help='Arquivo JSON de resultados (padrão: query-benchmark-<data>.json)')
+    parser.add_argument('--compare', help='Arquivo JSON de uma execução anterior para comparar')
+    args = parser.parse_args()
+
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ psycopg2 não encontrado. Instale com: pip install psycopg2-binary")
+        return
+
+    dsn = args.dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("❌ Informe --dsn ou defina DATABASE_URL no ambiente")
+        return
+
+    if args.apply and not os.path.exists(args.apply):
+        print(f"❌ Arquivo não encontrado: {args.apply}")
+        return
+
+    if args.rows and not load_synthetic_leads(dsn, args.rows, args.csv, args.partitioned):
+        return
+
+    conn = psycopg2.connect(dsn)
+    report = {'started_at': datetime.now().isoformat(timespec='seconds'),
+              'git_revision': benchmark_imports.git_revision()}
+    try:
+        vacuum_analyze(conn)
+        report['table'] = table_summary(conn)
+        print(f"\n🗄️  public.leads: {report['table']['rows']:,} registros, {report['table']['table_mb']} MB")
+        report['before'] = run_queries(conn, args.repeat, 'índices atuais')
+
+        if args.apply:
+            print(f"\n🔧 Aplicando {args.apply}...")
+            report['migration_seconds'] = round(apply_migration(conn, args.apply), 2)
+            vacuum_analyze(conn)
+            report['table_after'] = table_summary(conn)
+            print(f"✅ Migração aplicada em {report['migration_seconds']:.2f}s")
+            for name, size in report['table_after']['indexes_mb'].items():
+                print(f"   • {name}: {size} MB")
+            report['after'] = run_queries(conn, args.repeat, f'com {args.apply}')
+    except psycopg2.Error as e:
+        print(f"❌ Erro no banco: {str(e).strip()}")
+        return
+    finally:
+        conn.close()
+
+    output = args.output or f"query-benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+    print(f"\n💾 Resultados gravados em {output}")
+
+    if args.apply:
+        print_comparison(report['before'], report['after'])
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print_comparison(previous.get('after') or previous['before'], report['before'],
+                         os.path.basename(args.compare), 'agora')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do tokenizador de INSERT ... VALUES (sql_values.py)
+Gera arquivos SQL sintéticos no formato do csv-to-sql.py e mede o tempo de leitura
+para tamanhos crescentes, comparando com o parser antigo baseado em regex/split
+"""
+
+import argparse
+import os
+import random
+import re
+import tempfile
+import time
+
+from sql_values import iter_insert_rows
+
+COLUMNS = [
+    'lead_id', 'usuario_responsavel', 'contato_principal', 'data_criada', 'fonte_lead',
+    'etapa_funil', 'estado_onde_mora', 'tipo_agendamento', 'respostas_ia', 'email_comercial',
+    'telefone_comercial', 'estado_contato', 'permissao_trabalho', 'data_entrada_agendamento',
+    'data_hora_agendamento_bposs'
+]
+
+RESPOSTAS = [
+    "Sim, tenho interesse. Trabalho na área há 5 anos, mas quero mudar.",
+    "Não sei ainda; preciso falar com meu marido (ele decide).",
+    "It's complicated, I'd say maybe",
+    "",
+]
+
+def sql_literal(value):
+    return 'NULL' if value is None else "'" + value.replace("'", "''") + "'"
+
+def write_synthetic_sql(path, target_bytes, rows_per_insert=100):
+    """Escreve INSERTs de 100 registros até atingir o tamanho desejado; retorna o total de registros"""
+    random.seed(42)
+    total = 0
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("-- Arquivo sintético\nALTER TABLE public.leads DISABLE ROW LEVEL SECURITY;\n\n")
+
+        while f.tell() < target_bytes:
+            values_list = []
+            for _ in range(rows_per_insert):
+                total += 1
+                resposta = random.choice(RESPOSTAS) * random.randint(1, 8)
+                row = [
+                    str(20000000 + total), 'Cláudia Fehribach', random.choice(['Edilaine', "D'Ávila", 'Vanessa']),
+                    f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}", 'Tráfego - Lead Direct - Carreira',
+                    'etapa 1 - ativação', 'Utah', None, resposta or None, f'lead{total}@gmail.com',
+                    '+18624054641', 'Florida', 'Possui Work Permit', None, None,
+                ]
+                values_list.append("(\n" + ",\n".join(f"    {sql_literal(v)}" for v in row) + "\n)")
+
+            f.write(f"-- Lote {total // rows_per_insert}\n")
+            f.write("INSERT INTO public.leads (\n" + ",\n".join(f"    {c}" for c in COLUMNS) + "\n) VALUES\n")
+            f.write(',\n'.join(values_list))
+            f.write(";\n\n")
+
+        f.write("ALTER TABLE public.leads ENABLE ROW LEVEL SECURITY;\n")
+
+    return total
+
+def legacy_parse(path):
+    """Parser antigo de import-batch-api.py: regex não-gulosa + split por vírgula"""
+    rows = 0
+    broken = 0
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    for sql in content.split(';\n'):
+        if 'INSERT INTO' not in sql.upper():
+            continue
+        values_match = re.search(r'VALUES\s*\((.*?)\);', sql + ';', re.DOTALL | re.IGNORECASE)
+        if values_match:
+            for record in re.split(r'\),\s*\(', values_match.group(1)):
+                values = [v.strip().strip("'") for v in record.strip('()').split(',')]
+                rows += 1
+                if len(values) != len(COLUMNS):
+                    broken += 1
+
+    return rows, broken
+
+def time_tokenizer(path):
+    start = time.perf_counter()
+    rows = sum(1 for _ in iter_insert_rows(open(path, 'r', encoding='utf-8')))
+    return rows, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do tokenizador de INSERT ... VALUES')
+    parser.add_argument('--sizes', default='25,50,100', help='Tamanhos dos arquivos em MB, separados por vírgula')
+    parser.add_argument('--legacy', action='store_true', help='Também medir o parser antigo (regex/split)')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    print("⏱️  Benchmark do tokenizador SQL")
+    print(f"{'MB':>6} {'registros':>10} {'tempo (s)':>10} {'MB/s':>8} {'registros/s':>12}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = os.path.join(tmp, f'synthetic_{size}mb.sql')
+            expected = write_synthetic_sql(path, size * 1024 * 1024)
+            megabytes = os.path.getsize(path) / 1024 / 1024
+
+            rows, elapsed = time_tokenizer(path)
+            assert rows == expected, f"esperados {expected} registros, lidos {rows}"
+            print(f"{megabytes:>6.1f} {rows:>10,} {elapsed:>10.2f} {megabytes / elapsed:>8.1f} {rows / elapsed:>12,.0f}")
+
+            if args.legacy:
+                start = time.perf_counter()
+                legacy_rows, broken = legacy_parse(path)
+                legacy_elapsed = time.perf_counter() - start
+                print(f"{'':>6} {'legado':>10} {legacy_elapsed:>10.2f} {megabytes / legacy_elapsed:>8.1f} "
+                      f"{legacy_rows / legacy_elapsed:>12,.0f}  ({broken:,} registros com colunas erradas)")
+
+            os.remove(path)
+
+    print("\n💡 MB/s constante entre os tamanhos indica custo linear no tamanho do arquivo")
+
+if __name__ == '__main__':
+    main()
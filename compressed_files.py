@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Arquivos SQL compactados (gzip ou zstd) gerados por csv-to-sql.py e split-sql-file.py
+Os importadores descompactam durante a leitura: o texto completo nunca vai para o disco
+"""
+
+import gzip
+import io
+
+# Compressões aceitas e a extensão acrescentada ao nome do arquivo
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Comando equivalente para descompactar à mão (ex.: '<comando> lote.sql.gz | psql ...')
+DECOMPRESS_COMMANDS = {'gzip': 'gzip -dc', 'zstd': 'zstd -dc'}
+
+# Os arquivos são gravados uma vez e lidos várias: níveis que compactam bem sem pesar na geração
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 9
+
+_MAGIC_NUMBERS = {
+    b'\x1f\x8b': 'gzip',
+    b'\x28\xb5\x2f\xfd': 'zstd',
+}
+
+# Bytes por leitura ao descompactar para um pipe
+_COPY_BLOCK_SIZE = 1 << 16
+
+def zstandard_module():
+    """Importa o zstandard sob demanda; None (com aviso) se não estiver instalado"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        print("❌ zstandard não encontrado. Instale com: pip install zstandard")
+        return None
+
+def add_compression_argument(parser):
+    """Adiciona --compress {gzip,zstd} a um argparse.ArgumentParser"""
+    parser.add_argument('--compress', choices=sorted(COMPRESSION_SUFFIXES),
+                        help='Grava os lotes SQL compactados (.gz ou .zst); os importadores leem direto')
+
+def compression_available(compression):
+    """False (com aviso) se a compressão escolhida depende de um pacote ausente"""
+    return compression != 'zstd' or zstandard_module() is not None
+
+def compressed_path(path, compression):
+    """Caminho com a extensão da compressão (sem compressão, o próprio caminho)"""
+    if not compression:
+        return path
+    suffix = COMPRESSION_SUFFIXES[compression]
+    return path if path.endswith(suffix) else path + suffix
+
+def strip_compression_suffix(path):
+    """Caminho sem a extensão .gz/.zst, se houver"""
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+def detect_compression(path):
+    """Compressão do arquivo pelos primeiros bytes (não pela extensão); None se for texto"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    for magic, compression in _MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+def _require_zstandard():
+    zstandard = zstandard_module()
+    if zstandard is None:
+        raise ImportError("zstandard não encontrado")
+    return zstandard
+
+def open_binary_input(path):
+    """Abre o arquivo para leitura binária, descompactando sob demanda se for gzip/zstd"""
+    compression = detect_compression(path)
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        return _require_zstandard().ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+def open_text_input(path, newline=None):
+    """Abre um arquivo de texto UTF-8, compactado ou não, para leitura sob demanda"""
+    if detect_compression(path) is None:
+        return open(path, 'r', encoding='utf-8', newline=newline)
+    return io.TextIOWrapper(open_binary_input(path), encoding='utf-8', newline=newline)
+
+def open_text_output(path, compression=None):
+    """Abre um arquivo de texto UTF-8 para escrita, compactado com gzip/zstd se pedido"""
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=GZIP_LEVEL)
+    if compression == 'zstd':
+        writer = _require_zstandard().ZstdCompressor(level=ZSTD_LEVEL).stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+def copy_decompressed(path, output):
+    """Escreve em output (ex.: stdin de um processo) o conteúdo descompactado do arquivo"""
+    with open_binary_input(path) as f:
+        while True:
+            block = f.read(_COPY_BLOCK_SIZE)
+            if not block:
+                return
+            output.write(block)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Codificação dos leads no formato binário do COPY do PostgreSQL
+Os campos saem prontos (tamanho + bytes), sem escapar texto nem formatar datas como texto
+"""
+
+import struct
+from datetime import date, datetime, timezone
+from itertools import islice
+
+from import_metrics import NULL_METRICS
+from leads_csv import DEFAULT_CHUNK_SIZE, LEAD_COLUMNS, ColumnBatch
+
+# Assinatura, flags e tamanho da extensão do cabeçalho; o fim é um nº de campos -1
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('!ii', 0, 0)
+COPY_BINARY_TRAILER = struct.pack('!h', -1)
+
+TEXT_TYPES = ('text', 'character varying')
+DATE_TYPES = ('date',)
+TIMESTAMPTZ_TYPES = ('timestamp with time zone',)
+TIMESTAMP_TYPES = ('timestamp without time zone',)
+
+# Acima deste nº de valores distintos uma coluna de texto deixa de usar o cache de campos
+TEXT_CACHE_LIMIT = 4096
+DATE_CACHE_LIMIT = 100000
+
+# Formatos aceitos em colunas timestamp: o do CRM (DD/MM/YYYY HH:MM) e ISO
+TIMESTAMP_FORMATS = ('%d/%m/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y')
+
+_NULL_FIELD = struct.pack('!i', -1)
+_PG_EPOCH_DATE = date(2000, 1, 1)
+_PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+_PG_EPOCH_NAIVE = datetime(2000, 1, 1)
+
+class CopyEncodingError(ValueError):
+    """Valor que não pode ser codificado para o tipo da coluna no banco"""
+
+class _LengthPrefixes(dict):
+    """Prefixo de tamanho (int4) já empacotado; tamanho 0 vira NULL, como em normalize_text"""
+
+    def __missing__(self, length):
+        return struct.pack('!i', length)
+
+_LENGTH_PREFIXES = _LengthPrefixes((length, struct.pack('!i', length)) for length in range(1, 1 << 13))
+_LENGTH_PREFIXES[0] = _NULL_FIELD
+
+class _FieldCache(dict):
+    """Campo codificado de cada valor distinto; guarda até limit valores e marca overflowed"""
+
+    def __init__(self, encode, limit):
+        super().__init__({None: _NULL_FIELD, '': _NULL_FIELD})
+        self.encode = encode
+        self.limit = limit
+        self.overflowed = False
+
+    def __missing__(self, value):
+        field = self.encode(value)
+        if len(self) < self.limit:
+            self[value] = field
+        else:
+            self.overflowed = True
+        return field
+
+def _microseconds(delta):
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def encode_text_field(value):
+    data = value.encode('utf-8')
+    return struct.pack('!i', len(data)) + data
+
+def encode_date_field(value):
+    """'YYYY-MM-DD' (saída de normalize_date) como int4 de dias desde 2000-01-01"""
+    try:
+        days = (date.fromisoformat(value) - _PG_EPOCH_DATE).days
+    except ValueError:
+        raise CopyEncodingError(f"data inválida: {value!r}") from None
+    return struct.pack('!ii', 4, days)
+
+def parse_timestamp(value):
+    """Converte 'DD/MM/YYYY HH:MM[:SS]', 'DD/MM/YYYY' ou ISO em datetime (com ou sem fuso)"""
+    text = value.strip()
+    for timestamp_format in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(text, timestamp_format)
+        except ValueError:
+            pass
+
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise CopyEncodingError(f"data/hora inválida: {value!r}") from None
+
+def encode_timestamptz_field(value, tz):
+    """int8 de microssegundos desde 2000-01-01 UTC; valores sem fuso usam tz"""
+    moment = parse_timestamp(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=tz)
+    return struct.pack('!iq', 8, _microseconds(moment - _PG_EPOCH))
+
+def encode_timestamp_field(value):
+    """int8 de microssegundos desde 2000-01-01; um fuso no valor é ignorado, como no PostgreSQL"""
+    moment = parse_timestamp(value).replace(tzinfo=None)
+    return struct.pack('!iq', 8, _microseconds(moment - _PG_EPOCH_NAIVE))
+
+def _field_encoder(type_name, tz):
+    base_type = type_name.split('(')[0].strip()
+    if base_type in TEXT_TYPES:
+        return encode_text_field, TEXT_CACHE_LIMIT
+    if base_type in DATE_TYPES:
+        return encode_date_field, DATE_CACHE_LIMIT
+    if base_type in TIMESTAMPTZ_TYPES:
+        return (lambda value: encode_timestamptz_field(value, tz)), DATE_CACHE_LIMIT
+    if base_type in TIMESTAMP_TYPES:
+        return encode_timestamp_field, DATE_CACHE_LIMIT
+    raise CopyEncodingError(f"tipo {type_name!r} não é suportado pelo COPY binário; use o formato texto")
+
+class _Column:
+    __slots__ = ('name', 'is_text', 'cache')
+
+    def __init__(self, name, type_name, tz):
+        encode, limit = _field_encoder(type_name, tz)
+        self.name = name
+        self.is_text = encode is encode_text_field
+        self.cache = _FieldCache(encode, limit)
+
+class BinaryCopyEncoder:
+    """
+    Codifica blocos colunares (ColumnBatch, na ordem de LEAD_COLUMNS) no formato binário do COPY
+
+    Datas e colunas de texto com poucos valores distintos (etapa, estado, permissão...)
+    usam um cache com o campo já codificado: o valor vira um lookup num dicionário, sem
+    alocar nada. Colunas de texto com muitos valores distintos (respostas_ia, email...)
+    são codificadas de uma vez, juntando a coluna com '\\0' (que o PostgreSQL não aceita
+    em texto) num único encode() seguido de split(). Os campos são intercalados numa lista
+    de posições pré-alocada, reaproveitada entre blocos, e unidos com um único join.
+
+    Args:
+        column_types: Tipo de cada coluna de LEAD_COLUMNS no banco (ver fetch_column_types)
+        tz: Fuso aplicado às datas/horas sem fuso em colunas timestamptz (o TimeZone da sessão)
+    """
+
+    def __init__(self, column_types, tz=timezone.utc):
+        if len(column_types) != len(LEAD_COLUMNS):
+            raise CopyEncodingError(f"esperados {len(LEAD_COLUMNS)} tipos de coluna, recebidos {len(column_types)}")
+
+        self.columns = [_Column(name, type_name, tz) for name, type_name in zip(LEAD_COLUMNS, column_types)]
+        self._row_header = struct.pack('!h', len(self.columns))
+        self._slots = None
+
+    def _encode_text_column(self, column, values):
+        """Campos de texto de uma coluna inteira como [prefixos, dados]"""
+        data = '\0'.join([value or '' for value in values]).encode('utf-8').split(b'\0')
+        if len(data) != len(values):
+            raise CopyEncodingError("texto com caractere NUL não é aceito pelo PostgreSQL")
+
+        return list(map(_LENGTH_PREFIXES.__getitem__, map(len, data))), data
+
+    def encode(self, batch):
+        """Retorna os bytes de todos os registros do bloco (sem cabeçalho nem trailer)"""
+        row_count = batch.row_count
+        if not row_count:
+            return b''
+        width = 1 + sum(1 if column.cache is not None else 2 for column in self.columns)
+
+        slots = self._slots
+        if slots is None or len(slots) != row_count * width:
+            slots = self._slots = [self._row_header] * (row_count * width)
+
+        position = 1
+        for column, values in zip(self.columns, batch.columns):
+            try:
+                if column.cache is not None:
+                    slots[position::width] = list(map(column.cache.__getitem__, values))
+                    position += 1
+                else:
+                    slots[position::width], slots[position + 1::width] = self._encode_text_column(column, values)
+                    position += 2
+            except CopyEncodingError as e:
+                raise CopyEncodingError(f"{column.name}: {e}") from None
+
+        data = b''.join(slots)
+
+        # Colunas de texto cujo cache encheu passam a ser codificadas direto a partir do próximo bloco
+        for column in self.columns:
+            if column.is_text and column.cache is not None and column.cache.overflowed:
+                column.cache = None
+                self._slots = None
+
+        return data
+
+def iter_row_batches(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Agrupa tuplas normalizadas (ex.: as de LeadState.iter_changes) em ColumnBatch"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield ColumnBatch(list(zip(*chunk)), len(chunk))
+
+class BinaryCopyStream:
+    """Objeto tipo arquivo para cursor.copy_expert: cabeçalho, blocos codificados sob demanda e trailer"""
+
+    def __init__(self, column_batches, encoder, metrics=NULL_METRICS):
+        self.batches = iter(column_batches)
+        self.encoder = encoder
+        self.metrics = metrics
+        self.row_count = 0
+        self.byte_count = 0
+        self._chunk = memoryview(COPY_BINARY_HEADER)
+        self._offset = 0
+        self._finished = False
+
+    def _next_chunk(self):
+        batch = next(self.batches, None)
+        if batch is None:
+            self._finished = True
+            return memoryview(COPY_BINARY_TRAILER)
+
+        with self.metrics.stage('serialize', rows=batch.row_count) as stage:
+            data = self.encoder.encode(batch)
+            stage.add(bytes=len(data))
+        self.row_count += batch.row_count
+        return memoryview(data)
+
+    def read(self, size=-1):
+        # Devolve no máximo o que resta do bloco atual; o copy_expert lê até receber b''
+        while self._offset >= len(self._chunk):
+            if self._finished:
+                return b''
+            self._chunk, self._offset = self._next_chunk(), 0
+
+        end = len(self._chunk) if size is None or size < 0 else self._offset + size
+        data = bytes(self._chunk[self._offset:end])
+        self._offset += len(data)
+        self.byte_count += len(data)
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+def fetch_column_types(cursor, table='public.leads'):
+    """Tipos (format_type) das colunas de LEAD_COLUMNS na tabela de destino"""
+    cursor.execute("SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute "
+                   "WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped", (table,))
+    types = dict(cursor.fetchall())
+
+    missing = [column for column in LEAD_COLUMNS if column not in types]
+    if missing:
+        raise CopyEncodingError(f"colunas ausentes em {table}: {', '.join(missing)}")
+    return [types[column] for column in LEAD_COLUMNS]
+
+def session_timezone(cursor):
+    """
+    Fuso da sessão (SHOW TimeZone), o mesmo que o servidor usaria para datas/horas em texto
+
+    Um fuso que o Python não reconhece gera CopyEncodingError: assumir UTC deslocaria
+    em silêncio todo valor timestamptz em relação a uma carga pelo formato texto.
+    """
+    cursor.execute("SHOW TimeZone")
+    name = cursor.fetchone()[0]
+
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        raise CopyEncodingError(
+            f"fuso da sessão {name!r} não reconhecido pelo Python (no Windows: pip install tzdata); "
+            f"use o formato texto ou defina PGTZ com um nome IANA (ex.: America/Sao_Paulo)"
+        ) from None
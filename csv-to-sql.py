@@ -1,168 +1,156 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import csv
+import argparse
 import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import chain, islice
+
+from batch_files import batch_filename, write_cleanup_file, write_instructions_file, write_setup_file
+from compressed_files import add_compression_argument, compressed_path, compression_available, open_text_output
+from copy_binary import (BinaryCopyEncoder, BinaryCopyStream, CopyEncodingError, fetch_column_types,
+                         iter_row_batches, session_timezone)
+from dashboard_aggregates import (REFRESH_COMMANDS, dashboard_triggers_installed, defer_to_refresh, print_refresh_result,
+                                  refresh_dashboard_counts, write_refresh_commands)
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+from lead_state import DEFAULT_STATE_PATH, LeadState
+from lead_schema import DATE, LEAD_COLUMNS, TEXT, column_converters
+from leads_csv import (DEFAULT_CSV_PATH, iter_column_batches, iter_normalized_rows, iter_shard_column_batches,
+                       normalize_date, normalize_text, split_csv_shards)
+from leads_partitions import MERGE_FUNCTION, PartitionedCopy, is_partitioned
+
+# Tamanho alvo de cada faixa do CSV no modo paralelo (há pelo menos 2 faixas por processo)
+SHARD_BYTES = 32 * 1024 * 1024
+EXISTING_BATCH_PATTERN = re.compile(r'^\d+_(insert_batch_.*|cleanup)\.sql(\.gz|\.zst)?$')
 
 def convert_date(date_str):
     """Converte data do formato DD/MM/YYYY para YYYY-MM-DD"""
-    if not date_str or date_str.strip() == '':
-        return 'NULL'
-    
-    try:
-        # Formato esperado: DD/MM/YYYY
-        day, month, year = date_str.split('/')
-        return f"'{year}-{month.zfill(2)}-{day.zfill(2)}'"
-    except:
+    iso_date = normalize_date(date_str)
+    if iso_date is None:
         return 'NULL'
 
+    return f"'{iso_date}'"
+
 def escape_sql_string(value):
     """Escapa strings para SQL"""
-    if value is None or value == '':
+    text = normalize_text(value)
+    if text is None:
         return 'NULL'
-    
+
     # Escapar aspas simples
-    escaped = str(value).replace("'", "''")
+    escaped = text.replace("'", "''")
     return f"'{escaped}'"
 
-def process_csv_to_sql():
-    """Processa o CSV e gera comandos SQL INSERT"""
-    
-    # Caminhos dos arquivos
-    csv_path = 'public/leads_filtrado_revisado.csv'
-    sql_path = 'insert-leads-data.sql'
-    
+def quote_iso_date(value):
+    """Data já normalizada (YYYY-MM-DD) como literal SQL"""
+    return f"'{value}'" if value is not None else 'NULL'
+
+def format_date_column(values):
+    """Linhas de VALUES de uma coluna de datas normalizadas (com a indentação)"""
+    return [f"    '{value}'" if value is not None else '    NULL' for value in values]
+
+def format_text_column(values):
+    """Linhas de VALUES de uma coluna de texto, com as aspas escapadas (com a indentação)"""
+    return ["    '" + value.replace("'", "''") + "'" if value is not None else '    NULL' for value in values]
+
+# Conversores por coluna, na ordem de LEAD_COLUMNS: por valor e por coluna inteira
+SQL_LITERALS = column_converters({TEXT: escape_sql_string, DATE: quote_iso_date})
+SQL_COLUMN_FORMATTERS = column_converters({TEXT: format_text_column, DATE: format_date_column})
+
+def format_sql_values(values):
+    """Formata uma tupla normalizada como linha de VALUES"""
+    fields = [literal(value) for value, literal in zip(values, SQL_LITERALS)]
+    return "(\n" + ",\n".join(f"    {field}" for field in fields) + "\n)"
+
+def format_sql_columns(batch):
+    """
+    Formata um ColumnBatch como linhas de VALUES, escapando coluna a coluna
+
+    Gera o mesmo texto que format_sql_values aplicado registro a registro.
+    """
+    formatted = [format_column(column) for column, format_column in zip(batch.columns, SQL_COLUMN_FORMATTERS)]
+    return ["(\n" + ",\n".join(fields) + "\n)" for fields in zip(*formatted)]
+
+def format_insert_statement(values_list):
+    """Monta um comando INSERT (terminado em ';') com o lote de valores"""
+    return ("INSERT INTO public.leads (\n"
+            + ",\n".join(f"    {column}" for column in LEAD_COLUMNS)
+            + "\n) VALUES\n"
+            + ',\n'.join(values_list)
+            + ";")
+
+def write_insert_batch(sql_file, batch_count, values_list):
+    """Escreve um comando INSERT com o lote de valores"""
+    sql_file.write(f"-- Lote {batch_count} ({len(values_list)} registros)\n")
+    sql_file.write(format_insert_statement(values_list))
+    sql_file.write("\n\n")
+
+def iter_values_batches(column_batches, batch_size):
+    """Reagrupa blocos colunares em listas de até batch_size linhas de VALUES formatadas"""
+    values_list = []
+
+    for column_batch in column_batches:
+        values_list.extend(format_sql_columns(column_batch))
+
+        start = 0
+        while len(values_list) - start >= batch_size:
+            yield values_list[start:start + batch_size]
+            start += batch_size
+
+        # Manter o restante para o próximo lote
+        values_list = values_list[start:]
+
+    if values_list:
+        yield values_list
+
+def process_csv_to_sql(csv_path=DEFAULT_CSV_PATH, sql_path='insert-leads-data.sql', compression=None,
+                       metrics=NULL_METRICS):
+    """Processa o CSV e gera comandos SQL INSERT (compactados com gzip/zstd se compression for informado)"""
+
     if not os.path.exists(csv_path):
         print(f"❌ Arquivo não encontrado: {csv_path}")
         return
-    
+
     print(f"📁 Lendo arquivo: {csv_path}")
-    
+    sql_path = compressed_path(sql_path, compression)
+
     # Abrir arquivo SQL para escrita
-    with open(sql_path, 'w', encoding='utf-8') as sql_file:
+    with open_text_output(sql_path, compression) as sql_file:
         # Cabeçalho do arquivo SQL
         sql_file.write("-- Comandos SQL para inserção de dados dos leads\n")
         sql_file.write("-- Gerado automaticamente a partir do CSV\n\n")
-        
+
         sql_file.write("-- Desabilitar RLS temporariamente\n")
         sql_file.write("ALTER TABLE public.leads DISABLE ROW LEVEL SECURITY;\n\n")
-        
+
         # Ler CSV
         with open(csv_path, 'r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            
             batch_size = 100
             batch_count = 0
-            records_in_batch = 0
             total_records = 0
-            
-            values_list = []
-            
-            for row in reader:
-                total_records += 1
-                
-                # Mapear campos do CSV
-                lead_id = escape_sql_string(row.get('lead_id', ''))
-                usuario_responsavel = escape_sql_string(row.get('usuario_responsavel', ''))
-                contato_principal = escape_sql_string(row.get('contato_principal (obrigatório)', ''))
-                data_criada = convert_date(row.get('data_criada', ''))
-                fonte_lead = escape_sql_string(row.get('fonte_lead', ''))
-                etapa_funil = escape_sql_string(row.get('etapa_funil (obrigatório)', ''))
-                estado_onde_mora = escape_sql_string(row.get('estado onde mora', ''))
-                tipo_agendamento = escape_sql_string(row.get('tipo_agendamento', ''))
-                respostas_ia = escape_sql_string(row.get('respostas_ia', ''))
-                email_comercial = escape_sql_string(row.get('email_comercial', ''))
-                telefone_comercial = escape_sql_string(row.get('telefone_comercial', ''))
-                estado_contato = escape_sql_string(row.get('estado_contato', ''))
-                permissao_trabalho = escape_sql_string(row.get('permissao_trabalho (obrigatório)', ''))
-                data_entrada_agendamento = convert_date(row.get('data_entrada_agendamento', ''))
-                data_hora_agendamento_bposs = escape_sql_string(row.get('data_hora_agendamento_bposs', ''))
-                
-                # Criar linha de valores
-                values = f"""(
-    {lead_id},
-    {usuario_responsavel},
-    {contato_principal},
-    {data_criada},
-    {fonte_lead},
-    {etapa_funil},
-    {estado_onde_mora},
-    {tipo_agendamento},
-    {respostas_ia},
-    {email_comercial},
-    {telefone_comercial},
-    {estado_contato},
-    {permissao_trabalho},
-    {data_entrada_agendamento},
-    {data_hora_agendamento_bposs}
-)"""
-                
-                values_list.append(values)
-                records_in_batch += 1
-                
-                # Quando atingir o tamanho do lote, escrever INSERT
-                if records_in_batch >= batch_size:
-                    batch_count += 1
-                    
-                    sql_file.write(f"-- Lote {batch_count} ({records_in_batch} registros)\n")
-                    sql_file.write("INSERT INTO public.leads (\n")
-                    sql_file.write("    lead_id,\n")
-                    sql_file.write("    usuario_responsavel,\n")
-                    sql_file.write("    contato_principal,\n")
-                    sql_file.write("    data_criada,\n")
-                    sql_file.write("    fonte_lead,\n")
-                    sql_file.write("    etapa_funil,\n")
-                    sql_file.write("    estado_onde_mora,\n")
-                    sql_file.write("    tipo_agendamento,\n")
-                    sql_file.write("    respostas_ia,\n")
-                    sql_file.write("    email_comercial,\n")
-                    sql_file.write("    telefone_comercial,\n")
-                    sql_file.write("    estado_contato,\n")
-                    sql_file.write("    permissao_trabalho,\n")
-                    sql_file.write("    data_entrada_agendamento,\n")
-                    sql_file.write("    data_hora_agendamento_bposs\n")
-                    sql_file.write(") VALUES\n")
-                    sql_file.write(',\n'.join(values_list))
-                    sql_file.write(";\n\n")
-                    
-                    # Resetar para próximo lote
-                    values_list = []
-                    records_in_batch = 0
-            
-            # Processar último lote se houver registros restantes
-            if records_in_batch > 0:
+
+            column_batches = iter_column_batches(csv_file, metrics=metrics)
+            values_batches = metrics.timed(iter_values_batches(column_batches, batch_size), 'serialize', rows=len)
+
+            for values_list in values_batches:
+                total_records += len(values_list)
                 batch_count += 1
-                
-                sql_file.write(f"-- Lote {batch_count} ({records_in_batch} registros)\n")
-                sql_file.write("INSERT INTO public.leads (\n")
-                sql_file.write("    lead_id,\n")
-                sql_file.write("    usuario_responsavel,\n")
-                sql_file.write("    contato_principal,\n")
-                sql_file.write("    data_criada,\n")
-                sql_file.write("    fonte_lead,\n")
-                sql_file.write("    etapa_funil,\n")
-                sql_file.write("    estado_onde_mora,\n")
-                sql_file.write("    tipo_agendamento,\n")
-                sql_file.write("    respostas_ia,\n")
-                sql_file.write("    email_comercial,\n")
-                sql_file.write("    telefone_comercial,\n")
-                sql_file.write("    estado_contato,\n")
-                sql_file.write("    permissao_trabalho,\n")
-                sql_file.write("    data_entrada_agendamento,\n")
-                sql_file.write("    data_hora_agendamento_bposs\n")
-                sql_file.write(") VALUES\n")
-                sql_file.write(',\n'.join(values_list))
-                sql_file.write(";\n\n")
-        
+                with metrics.stage('write', batch=batch_count, rows=len(values_list)):
+                    write_insert_batch(sql_file, batch_count, values_list)
+
         # Rodapé do arquivo SQL
         sql_file.write("-- Reabilitar RLS\n")
         sql_file.write("ALTER TABLE public.leads ENABLE ROW LEVEL SECURITY;\n\n")
-        
+
+        write_refresh_commands(sql_file)
+
         sql_file.write("-- Verificar dados inseridos\n")
         sql_file.write("SELECT COUNT(*) as total_registros FROM public.leads;\n")
         sql_file.write("SELECT * FROM public.leads LIMIT 10;\n")
-    
+
     print(f"✅ Arquivo SQL gerado: {sql_path}")
     print(f"📊 Total de registros processados: {total_records}")
     print(f"📦 Total de lotes: {batch_count}")
@@ -170,8 +158,389 @@ def process_csv_to_sql():
     print("1. Abra o Supabase Dashboard")
     print("2. Vá para SQL Editor")
     print("3. Execute primeiro o arquivo 'final-import.sql' para criar a tabela")
-    print("4. Execute depois o arquivo 'insert-leads-data.sql' para inserir os dados")
-    print("5. Verifique os resultados")
+    print("4. Execute 'dashboard-aggregates.sql' uma vez para criar as contagens do dashboard")
+    if compression:
+        # O SQL Editor não abre arquivos compactados: o split-sql-file.py e o import-batch-api.py leem direto
+        print(f"5. Divida com: python split-sql-file.py --input {sql_path} --compress {compression}")
+        print(f"   ou envie via API REST: python import-batch-api.py --sql-file {sql_path}")
+    else:
+        print("5. Execute depois o arquivo 'insert-leads-data.sql' para inserir os dados")
+    print("6. Verifique os resultados")
+
+def convert_csv_shard(task):
+    """
+    Converte uma faixa do CSV em arquivos temporários de INSERT (executada num processo do pool)
+
+    Retorna ([(arquivo temporário, registros)], totais das etapas), com os arquivos na
+    ordem da faixa: os nomes finais NN_insert_batch_A_to_B.sql só são conhecidos quando
+    as faixas anteriores terminam.
+    """
+    csv_path, header, start, end, shard_number, output_dir, batch_size, inserts_per_file, compression = task
+    metrics = ImportMetrics('csv-to-sql')
+    column_batches = iter_shard_column_batches(csv_path, header, start, end, metrics=metrics)
+    batches = metrics.timed(iter_values_batches(column_batches, batch_size), 'serialize', rows=len)
+    files = []
+
+    while True:
+        group = list(islice(batches, inserts_per_file))
+        if not group:
+            return files, metrics.snapshot()
+
+        path = os.path.join(output_dir, f".shard_{shard_number:05d}_{len(files) + 1:04d}.sql.tmp")
+        with open_text_output(path, compression) as f:
+            f.write('-- Lote de inserção de dados\n')
+            f.write(f'-- Registros do CSV entre os bytes {start} e {end}\n\n')
+
+            with metrics.stage('write', rows=sum(len(values_list) for values_list in group)):
+                for values_list in group:
+                    f.write(format_insert_statement(values_list))
+                    f.write('\n\n')
+
+        files.append((path, sum(len(values_list) for values_list in group)))
+
+def convert_csv_parallel(csv_path=DEFAULT_CSV_PATH, output_dir='sql_batches', workers=None,
+                         batch_size=100, inserts_per_file=500, compression=None, metrics=NULL_METRICS):
+    """
+    Converte o CSV direto para o layout de sql_batches/ usando vários processos
+
+    O CSV é dividido em faixas de bytes alinhadas em fim de registro (respeitando
+    campos entre aspas com quebras de linha), convertidas em paralelo; os arquivos de
+    cada faixa são renomeados na ordem do CSV para NN_insert_batch_A_to_B.sql, com A e B
+    numerando os registros. Com compression ('gzip' ou 'zstd'), cada processo já grava
+    seus lotes compactados (.sql.gz/.sql.zst). As etapas medidas em cada processo são somadas em metrics
+    (o tempo total delas passa do tempo de parede quando há vários processos).
+    """
+
+    if not os.path.exists(csv_path):
+        print(f"❌ Arquivo não encontrado: {csv_path}")
+        return False
+
+    if os.path.isdir(output_dir) and any(EXISTING_BATCH_PATTERN.match(name) for name in os.listdir(output_dir)):
+        print(f"❌ {output_dir} já contém lotes de uma conversão anterior; use um diretório vazio")
+        return False
+
+    workers = workers or os.cpu_count() or 1
+    csv_size = os.path.getsize(csv_path)
+    shard_count = max(workers * 2, -(-csv_size // SHARD_BYTES))
+
+    print(f"📁 Lendo arquivo: {csv_path} ({csv_size / 1024 / 1024:.1f} MB)")
+    start_time = time.perf_counter()
+
+    with metrics.stage('split', bytes=csv_size):
+        header, shards = split_csv_shards(csv_path, shard_count)
+    print(f"🔪 {len(shards)} faixas do CSV, {workers} processos")
+
+    os.makedirs(output_dir, exist_ok=True)
+    write_setup_file(output_dir, [
+        "-- Desabilitar RLS temporariamente",
+        "ALTER TABLE public.leads DISABLE ROW LEVEL SECURITY;",
+    ])
+
+    tasks = [
+        (csv_path, header, start, end, shard_number, output_dir, batch_size, inserts_per_file, compression)
+        for shard_number, (start, end) in enumerate(shards, 1)
+    ]
+    file_count = 0
+    total_records = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for files, shard_totals in executor.map(convert_csv_shard, tasks):
+                metrics.merge(shard_totals)
+                for tmp_path, rows in files:
+                    file_count += 1
+                    filename = batch_filename(file_count, total_records + 1, total_records + rows)
+                    filepath = os.path.join(output_dir, compressed_path(filename, compression))
+                    os.replace(tmp_path, filepath)
+                    total_records += rows
+                    print(f"✅ Criado: {filepath} ({rows} registros)")
+    finally:
+        for name in os.listdir(output_dir):
+            if name.startswith('.shard_') and name.endswith('.sql.tmp'):
+                os.remove(os.path.join(output_dir, name))
+
+    write_cleanup_file(output_dir, file_count, [
+        "ALTER TABLE public.leads ENABLE ROW LEVEL SECURITY;",
+        "",
+        *REFRESH_COMMANDS,
+        "",
+        "-- Verificar dados inseridos",
+        "SELECT COUNT(*) as total_registros FROM public.leads;",
+        "SELECT * FROM public.leads LIMIT 10;",
+    ])
+    instructions_file = write_instructions_file(output_dir, file_count, batch_size * inserts_per_file,
+                                                total_records, csv_size)
+
+    elapsed = time.perf_counter() - start_time
+    rate = total_records / elapsed if elapsed > 0 else 0
+
+    print(f"\n🎉 Conversão concluída em {elapsed:.2f}s")
+    print(f"📊 Total de registros processados: {total_records:,}")
+    print(f"📦 Lotes gerados: {file_count}")
+    print(f"⚡ Taxa: {rate:,.0f} registros/s com {workers} processos")
+    print(f"\n📋 Instruções: {instructions_file}")
+    print(f"💡 Para importar: python import-direct-psql.py --dir {output_dir}")
+    return True
+
+def escape_copy_text(value):
+    """Escapa um valor para o formato texto do COPY (None vira \\N)"""
+    if value is None:
+        return '\\N'
+
+    return (value.replace('\\', '\\\\')
+                 .replace('\t', '\\t')
+                 .replace('\n', '\\n')
+                 .replace('\r', '\\r'))
+
+class CopyTextStream:
+    """Objeto tipo arquivo que gera linhas do COPY sob demanda, sem carregar o CSV em memória"""
+
+    def __init__(self, rows, metrics=NULL_METRICS):
+        self.rows = rows
+        self.metrics = metrics
+        self.row_count = 0
+        self.byte_count = 0
+        self._buffer = b''
+
+    def read(self, size=-1):
+        chunks = [self._buffer]
+        length = len(self._buffer)
+
+        with self.metrics.stage('serialize') as stage:
+            for values in self.rows:
+                line = ('\t'.join(escape_copy_text(value) for value in values) + '\n').encode('utf-8')
+                chunks.append(line)
+                length += len(line)
+                self.row_count += 1
+                stage.add(rows=1)
+                if size > 0 and length >= size:
+                    break
+            stage.add(bytes=length - len(self._buffer))
+
+        data = b''.join(chunks)
+        if size > 0:
+            data, self._buffer = data[:size], data[size:]
+        else:
+            self._buffer = b''
+
+        self.byte_count += len(data)
+        return data
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+def build_upsert_sql(staging_table):
+    """INSERT ... ON CONFLICT (lead_id) que aplica as linhas da tabela de staging em public.leads"""
+    columns = ', '.join(LEAD_COLUMNS)
+    updates = ',\n    '.join(f"{column} = EXCLUDED.{column}" for column in LEAD_COLUMNS if column != 'lead_id')
+    return (f"INSERT INTO public.leads ({columns})\n"
+            f"SELECT {columns} FROM {staging_table}\n"
+            f"ON CONFLICT (lead_id) DO UPDATE SET\n    {updates}")
+
+def copy_csv_to_postgres(csv_path=DEFAULT_CSV_PATH, dsn=None, incremental=False, state_path=DEFAULT_STATE_PATH,
+                         metrics=NULL_METRICS, binary=False):
+    """
+    Carrega o CSV direto no PostgreSQL via COPY FROM STDIN (formato texto ou binário)
+
+    Com incremental=True, só os leads novos ou alterados desde a última carga
+    (segundo o arquivo de estado) vão para uma tabela temporária e são aplicados
+    com upsert por lead_id, na mesma transação. As contagens do dashboard recebem
+    só o delta desses leads, pelos gatilhos de public.leads; uma carga completa
+    desliga os gatilhos (dashboard_aggregates.defer_to_refresh) e as recalcula do zero. Em metrics, 'network' é o tempo do
+    COPY descontadas a leitura e a serialização que ele puxa do CSV.
+
+    Com binary=True os registros vão no formato binário (copy_binary), codificados
+    segundo os tipos das colunas de public.leads: o servidor não precisa interpretar
+    texto, e datas/horas em DD/MM/YYYY HH:MM funcionam mesmo em colunas timestamptz.
+
+    Se public.leads for particionada por mês (leads-partitioned.sql), a carga completa
+    agrupa cada bloco do CSV por mês de data_criada e cria as partições que faltam antes
+    de enviá-lo (leads_partitions.PartitionedCopy); a incremental aplica a staging com merge_leads_staging().
+    """
+
+    try:
+        import psycopg2
+    except ImportError:
+        print("❌ psycopg2 não encontrado. Instale com: pip install psycopg2-binary")
+        return False
+
+    dsn = dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("❌ Informe --dsn ou defina DATABASE_URL no ambiente")
+        return False
+
+    if not os.path.exists(csv_path):
+        print(f"❌ Arquivo não encontrado: {csv_path}")
+        return False
+
+    print(f"📁 Lendo arquivo: {csv_path}")
+
+    state = LeadState(state_path) if incremental else None
+    committed_entries = []
+
+    if state is not None:
+        print(f"🗂️  Estado: {state_path} ({len(state):,} leads já carregados)")
+
+    def changed_rows(rows):
+        for values, entry in state.iter_changes(rows):
+            committed_entries.append(entry)
+            yield values
+
+    start = time.perf_counter()
+
+    conn = None
+    try:
+        conn = psycopg2.connect(dsn)
+        conn.set_client_encoding('UTF8')
+        # Sem commit explícito, conn.close() no finally desfaz a transação
+        with conn.cursor() as cur, open(csv_path, 'r', encoding='utf-8') as csv_file:
+            copy_options = " WITH (FORMAT binary)" if binary else ""
+            if binary:
+                encoder = BinaryCopyEncoder(fetch_column_types(cur), session_timezone(cur))
+
+            def make_stream(rows):
+                if binary:
+                    return BinaryCopyStream(iter_row_batches(rows), encoder, metrics)
+                return CopyTextStream(rows, metrics)
+
+            cur.execute("ALTER TABLE public.leads DISABLE ROW LEVEL SECURITY")
+            partitioned = is_partitioned(cur)
+            if state is None:
+                defer_to_refresh(cur)
+
+            if state is None and partitioned:
+                print(f"🚚 Enviando dados via COPY FROM STDIN para as partições mensais{' (binário)' if binary else ''}...")
+                # Cada bloco é agrupado por mês; as partições que faltam são criadas antes do COPY que o envia
+                stream = PartitionedCopy(cur, iter_column_batches(csv_file, metrics=metrics))
+                for segment in stream.segments():
+                    if binary:
+                        segment_stream = BinaryCopyStream(segment, encoder, metrics)
+                    else:
+                        segment_stream = CopyTextStream(chain.from_iterable(batch.rows() for batch in segment), metrics)
+                    with metrics.stage('network') as stage:
+                        cur.copy_expert(f"COPY public.leads ({', '.join(LEAD_COLUMNS)}) FROM STDIN{copy_options}",
+                                        segment_stream, size=65536)
+                        stage.add(segment_stream.row_count, segment_stream.byte_count)
+                    stream.add(segment_stream)
+            elif state is None:
+                print(f"🚚 Enviando dados via COPY FROM STDIN{' (binário)' if binary else ''}...")
+                if binary:
+                    # Os blocos colunares do CSV vão direto para o codificador, sem passar por tuplas
+                    stream = BinaryCopyStream(iter_column_batches(csv_file, metrics=metrics), encoder, metrics)
+                else:
+                    stream = CopyTextStream(iter_normalized_rows(csv_file, metrics=metrics), metrics)
+                with metrics.stage('network') as stage:
+                    cur.copy_expert(f"COPY public.leads ({', '.join(LEAD_COLUMNS)}) FROM STDIN{copy_options}",
+                                    stream, size=65536)
+                    stage.add(stream.row_count, stream.byte_count)
+            else:
+                print("🚚 Enviando leads novos/alterados via COPY para staging...")
+                stream = make_stream(changed_rows(iter_normalized_rows(csv_file, metrics=metrics)))
+                cur.execute(f"CREATE TEMP TABLE leads_staging ON COMMIT DROP AS "
+                            f"SELECT {', '.join(LEAD_COLUMNS)} FROM public.leads WITH NO DATA")
+                with metrics.stage('network') as stage:
+                    cur.copy_expert(f"COPY leads_staging ({', '.join(LEAD_COLUMNS)}) FROM STDIN{copy_options}",
+                                    stream, size=65536)
+                    stage.add(stream.row_count, stream.byte_count)
+                # Os gatilhos de public.leads aplicam o delta das contagens no próprio upsert
+                buckets = dashboard_triggers_installed(cur)
+                with metrics.stage('commit', rows=stream.row_count):
+                    if partitioned:
+                        # Sem índice único em lead_id na tabela particionada: a função remove e reinsere
+                        cur.execute(f"SELECT public.{MERGE_FUNCTION}()")
+                    else:
+                        cur.execute(build_upsert_sql('leads_staging'))
+
+            # Na mesma transação: o dashboard nunca vê contagens de uma carga pela metade
+            if state is None:
+                with metrics.stage('aggregates'):
+                    buckets = refresh_dashboard_counts(cur)
+
+            cur.execute("ALTER TABLE public.leads ENABLE ROW LEVEL SECURITY")
+
+        with metrics.stage('commit'):
+            conn.commit()
+    except (psycopg2.Error, CopyEncodingError) as e:
+        print(f"❌ Erro no COPY: {e}")
+        return False
+    finally:
+        if conn is not None:
+            conn.close()
+
+    # A transação foi confirmada: agora é seguro registrar os leads no estado
+    if state is not None:
+        state.mark(committed_entries)
+        state.save()
+
+    elapsed = time.perf_counter() - start
+    rate = stream.row_count / elapsed if elapsed > 0 else 0
+
+    print(f"✅ COPY concluído em {elapsed:.2f}s")
+    print(f"📊 Total de registros carregados: {stream.row_count:,}")
+    print(f"📏 Dados enviados: {stream.byte_count:,} bytes")
+    print(f"⚡ Taxa: {rate:,.0f} registros/s")
+    if isinstance(stream, PartitionedCopy):
+        months = sum(1 for month in stream.partitions if month)
+        print(f"🗓️  Partições mensais: {months:,} (em {stream.copy_count:,} COPY)")
+    print_refresh_result(buckets, delta=state is not None)
+
+    if state is not None:
+        delta = state.stats
+        print(f"🔎 Leads novos: {delta.new:,} | alterados: {delta.changed:,} | sem mudança: {delta.unchanged:,}")
+        if delta.duplicates or delta.missing_id:
+            print(f"⚠️  Ignorados: {delta.duplicates:,} lead_id repetidos, {delta.missing_id:,} sem lead_id")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Converte o CSV de leads para SQL ou carrega direto via COPY')
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help='Arquivo CSV de origem')
+    parser.add_argument('--output', default='insert-leads-data.sql', help='Arquivo SQL gerado')
+    parser.add_argument('--copy', action='store_true', help='Carrega direto no banco via COPY em vez de gerar SQL')
+    parser.add_argument('--dsn', help='String de conexão PostgreSQL (padrão: DATABASE_URL)')
+    parser.add_argument('--binary', action='store_true',
+                        help='Com --copy: envia no formato binário do COPY (sem escapar texto nem datas)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Com --copy: envia só leads novos/alterados como upsert por lead_id')
+    parser.add_argument('--state-file', default=DEFAULT_STATE_PATH, help='Arquivo de estado do modo --incremental')
+    parser.add_argument('--batches-dir',
+                        help='Gera os lotes direto no layout de sql_batches/ neste diretório, em paralelo')
+    parser.add_argument('--workers', type=int, help='Processos do modo --batches-dir (padrão: nº de CPUs)')
+    parser.add_argument('--inserts-per-file', type=int, default=500,
+                        help='Comandos INSERT (de 100 registros) por arquivo no modo --batches-dir')
+    add_compression_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+
+    if args.incremental and not args.copy:
+        print("❌ O modo --incremental exige --copy")
+        return
+
+    if args.binary and not args.copy:
+        print("❌ O formato --binary exige --copy")
+        return
+
+    if args.batches_dir and args.copy:
+        print("❌ Use --batches-dir ou --copy, não os dois")
+        return
+
+    if args.compress and args.copy:
+        print("❌ --compress vale para o SQL gerado; o modo --copy não grava arquivos")
+        return
+
+    if not compression_available(args.compress):
+        return
+
+    metrics = ImportMetrics('csv-to-sql', args.metrics)
+    try:
+        if args.batches_dir:
+            convert_csv_parallel(args.csv, args.batches_dir, args.workers, inserts_per_file=args.inserts_per_file,
+                                 compression=args.compress, metrics=metrics)
+        elif args.copy:
+            copy_csv_to_postgres(args.csv, args.dsn, args.incremental, args.state_file, metrics, args.binary)
+        else:
+            process_csv_to_sql(args.csv, args.output, args.compress, metrics)
+    finally:
+        metrics.close()
 
 if __name__ == "__main__":
-    process_csv_to_sql()
\ No newline at end of file
+    main()
@@ -0,0 +1,243 @@
+-- Tabela de contagens pré-calculadas para o dashboard (LeadsService)
+-- Execute uma vez depois de final-import.sql; o script pode ser re-executado com segurança
+-- Gatilhos em public.leads mantêm as contagens a cada escrita; as cargas completas as recalculam no fim
+
+-- 1. Contagens por dimensão e valor
+--    dimension: 'total', 'estado_contato', 'permissao_trabalho', 'etapa_funil' ou 'mes_criacao' (YYYY-MM de data_criada)
+--    conversions: leads do bucket cuja etapa_funil contém 'meeting realizado'
+CREATE TABLE IF NOT EXISTS public.leads_dashboard_counts (
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    total_leads BIGINT NOT NULL DEFAULT 0,
+    conversions BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    PRIMARY KEY (dimension, bucket)
+);
+
+-- 2. Leitura liberada como em public.leads; escrita só pelo recálculo e pelos gatilhos de public.leads
+ALTER TABLE public.leads_dashboard_counts ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable read access for all users" ON public.leads_dashboard_counts;
+CREATE POLICY "Enable read access for all users" ON public.leads_dashboard_counts
+    FOR SELECT USING (true);
+
+-- 3. Buckets de um lead em cada dimensão (usada pelo recálculo completo e pelos deltas)
+--    Os valores são agrupados sem espaços nas pontas, como o dashboard fazia com trim()
+CREATE OR REPLACE FUNCTION public.leads_dashboard_buckets(
+    estado_contato TEXT, permissao_trabalho TEXT, etapa_funil TEXT, data_criada DATE)
+RETURNS TABLE (dimension TEXT, bucket TEXT, converted BOOLEAN)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT d.dimension, d.bucket, COALESCE(strpos(etapa_funil, 'meeting realizado') > 0, false)
+    FROM (VALUES
+        ('total', 'leads'),
+        ('estado_contato', NULLIF(btrim(estado_contato, E' \t\r\n'), '')),
+        ('permissao_trabalho', NULLIF(btrim(permissao_trabalho, E' \t\r\n'), '')),
+        ('etapa_funil', NULLIF(btrim(etapa_funil, E' \t\r\n'), '')),
+        ('mes_criacao', to_char(data_criada, 'YYYY-MM'))
+    ) AS d(dimension, bucket)
+    WHERE d.bucket IS NOT NULL
+$$;
+
+-- 4. Recálculo completo a partir de public.leads, numa única passada pela tabela
+CREATE OR REPLACE FUNCTION public.refresh_leads_dashboard_counts()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    bucket_count INTEGER;
+BEGIN
+    -- Leituras do dashboard continuam liberadas; outro recálculo ou delta espera este terminar
+    LOCK TABLE public.leads_dashboard_counts IN EXCLUSIVE MODE;
+
+    DELETE FROM public.leads_dashboard_counts;
+
+    INSERT INTO public.leads_dashboard_counts (dimension, bucket, total_leads, conversions)
+    SELECT b.dimension, b.bucket, COUNT(*), COUNT(*) FILTER (WHERE b.converted)
+    FROM public.leads l
+    CROSS JOIN LATERAL public.leads_dashboard_buckets(l.estado_contato, l.permissao_trabalho,
+                                                      l.etapa_funil, l.data_criada) b
+    GROUP BY b.dimension, b.bucket;
+
+    GET DIAGNOSTICS bucket_count = ROW_COUNT;
+    RETURN bucket_count;
+END;
+$$;
+
+-- 5. Delta das contagens a cada comando em public.leads (gatilhos por comando, com tabelas de transição)
+--    Cobre toda escrita: a aplicação (LeadsService.createLead/updateLead/deleteLead), os lotes da API REST
+--    e o upsert das importações incrementais. Os leads antigos do comando (old_rows) saem dos seus buckets
+--    (ex.: mudança de etapa_funil) e os novos (new_rows) entram, na transação do próprio comando
+--    Uma carga que recalcula tudo no fim da mesma transação pula o delta com
+--    SET LOCAL leads.dashboard_counts = 'refresh' (csv-to-sql.py --copy)
+DROP FUNCTION IF EXISTS public.apply_leads_dashboard_delta();
+
+CREATE OR REPLACE FUNCTION public.apply_leads_dashboard_changes()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    changed_rows TEXT;
+BEGIN
+    IF current_setting('leads.dashboard_counts', true) = 'refresh' THEN
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM public.leads_dashboard_counts;
+        RETURN NULL;
+    END IF;
+
+    -- As tabelas de transição só existem para os eventos do gatilho: a consulta é montada por operação
+    changed_rows := CASE TG_OP
+        WHEN 'INSERT' THEN 'SELECT 1 AS sign, * FROM new_rows'
+        WHEN 'DELETE' THEN 'SELECT -1 AS sign, * FROM old_rows'
+        ELSE 'SELECT 1 AS sign, * FROM new_rows UNION ALL SELECT -1, * FROM old_rows'
+    END;
+
+    -- ORDER BY: comandos simultâneos travam os buckets na mesma ordem, sem deadlock
+    EXECUTE format($sql$
+        INSERT INTO public.leads_dashboard_counts AS c (dimension, bucket, total_leads, conversions)
+        SELECT b.dimension, b.bucket, SUM(r.sign), COALESCE(SUM(r.sign) FILTER (WHERE b.converted), 0)
+        FROM (%s) r
+        CROSS JOIN LATERAL public.leads_dashboard_buckets(r.estado_contato, r.permissao_trabalho,
+                                                          r.etapa_funil, r.data_criada) b
+        GROUP BY b.dimension, b.bucket
+        HAVING SUM(r.sign) <> 0 OR SUM(r.sign) FILTER (WHERE b.converted) <> 0
+        ORDER BY b.dimension, b.bucket
+        ON CONFLICT (dimension, bucket) DO UPDATE SET
+            total_leads = c.total_leads + EXCLUDED.total_leads,
+            conversions = c.conversions + EXCLUDED.conversions,
+            updated_at = timezone('utc'::text, now())
+    $sql$, changed_rows);
+
+    RETURN NULL;
+END;
+$$;
+
+-- Gatilhos em public.leads; leads-partitioned.sql chama de novo para a tabela particionada
+CREATE OR REPLACE FUNCTION public.create_leads_dashboard_triggers()
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DROP TRIGGER IF EXISTS leads_dashboard_counts_insert ON public.leads;
+    CREATE TRIGGER leads_dashboard_counts_insert
+        AFTER INSERT ON public.leads REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.apply_leads_dashboard_changes();
+
+    DROP TRIGGER IF EXISTS leads_dashboard_counts_update ON public.leads;
+    CREATE TRIGGER leads_dashboard_counts_update
+        AFTER UPDATE ON public.leads REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.apply_leads_dashboard_changes();
+
+    DROP TRIGGER IF EXISTS leads_dashboard_counts_delete ON public.leads;
+    CREATE TRIGGER leads_dashboard_counts_delete
+        AFTER DELETE ON public.leads REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION public.apply_leads_dashboard_changes();
+
+    DROP TRIGGER IF EXISTS leads_dashboard_counts_truncate ON public.leads;
+    CREATE TRIGGER leads_dashboard_counts_truncate
+        AFTER TRUNCATE ON public.leads
+        FOR EACH STATEMENT EXECUTE FUNCTION public.apply_leads_dashboard_changes();
+END;
+$$;
+
+SELECT public.create_leads_dashboard_triggers();
+
+-- 6. Upsert por lead_id numa transação (importação incremental via API REST); as contagens
+--    recebem o delta pelos gatilhos da seção 5. Corpo da chamada: {"records": [{"lead_id": ..., ...}, ...]}
+CREATE OR REPLACE FUNCTION public.upsert_leads_counted(records JSONB)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    upserted INTEGER;
+BEGIN
+    CREATE TEMP TABLE leads_staging ON COMMIT DROP AS
+    SELECT lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead, etapa_funil,
+           estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial,
+           telefone_comercial, estado_contato, permissao_trabalho,
+           data_entrada_agendamento, data_hora_agendamento_bposs
+    FROM jsonb_populate_recordset(NULL::public.leads, records);
+
+    -- Tabela particionada por mês (leads-partitioned.sql): sem índice único em lead_id, sem ON CONFLICT
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.leads'::regclass) THEN
+        upserted := public.merge_leads_staging();
+    ELSE
+        INSERT INTO public.leads (
+            lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead, etapa_funil,
+            estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial, telefone_comercial,
+            estado_contato, permissao_trabalho, data_entrada_agendamento, data_hora_agendamento_bposs
+        )
+        SELECT lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead, etapa_funil,
+               estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial,
+               telefone_comercial, estado_contato, permissao_trabalho,
+               data_entrada_agendamento, data_hora_agendamento_bposs
+        FROM pg_temp.leads_staging
+        ON CONFLICT (lead_id) DO UPDATE SET
+            usuario_responsavel = EXCLUDED.usuario_responsavel,
+            contato_principal = EXCLUDED.contato_principal,
+            data_criada = EXCLUDED.data_criada,
+            fonte_lead = EXCLUDED.fonte_lead,
+            etapa_funil = EXCLUDED.etapa_funil,
+            estado_onde_mora = EXCLUDED.estado_onde_mora,
+            tipo_agendamento = EXCLUDED.tipo_agendamento,
+            respostas_ia = EXCLUDED.respostas_ia,
+            email_comercial = EXCLUDED.email_comercial,
+            telefone_comercial = EXCLUDED.telefone_comercial,
+            estado_contato = EXCLUDED.estado_contato,
+            permissao_trabalho = EXCLUDED.permissao_trabalho,
+            data_entrada_agendamento = EXCLUDED.data_entrada_agendamento,
+            data_hora_agendamento_bposs = EXCLUDED.data_hora_agendamento_bposs;
+
+        GET DIAGNOSTICS upserted = ROW_COUNT;
+    END IF;
+    DROP TABLE pg_temp.leads_staging;
+    RETURN upserted;
+END;
+$$;
+
+-- 7. Só o service role (importadores via API) pode recalcular ou gravar pela API REST
+REVOKE EXECUTE ON FUNCTION public.refresh_leads_dashboard_counts() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.create_leads_dashboard_triggers() FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.upsert_leads_counted(JSONB) FROM PUBLIC;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION public.refresh_leads_dashboard_counts() FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION public.create_leads_dashboard_triggers() FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION public.upsert_leads_counted(JSONB) FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION public.refresh_leads_dashboard_counts() TO service_role;
+        GRANT EXECUTE ON FUNCTION public.upsert_leads_counted(JSONB) TO service_role;
+    END IF;
+END;
+$$;
+
+-- 8. Aviso de mudança para o cache do dashboard (dashboard-cache-server.py)
+--    Um NOTIFY por transação que altera as contagens; só é entregue depois do COMMIT da importação
+CREATE OR REPLACE FUNCTION public.notify_leads_dashboard_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify('leads_dashboard_changed', '');
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS leads_dashboard_counts_changed ON public.leads_dashboard_counts;
+CREATE TRIGGER leads_dashboard_counts_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.leads_dashboard_counts
+    FOR EACH STATEMENT EXECUTE FUNCTION public.notify_leads_dashboard_changed();
+
+-- 9. Primeira carga das contagens
+SELECT public.refresh_leads_dashboard_counts() AS buckets;
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP de cache das contagens do dashboard (LeadsService com VITE_DASHBOARD_CACHE_URL)
+Responde da memória; o banco só é consultado na primeira leitura depois de cada mudança nas contagens
+"""
+
+import argparse
+import hmac
+import importlib.util
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+from dashboard_aggregates import AGGREGATES_SQL_FILE, DIMENSIONS
+from dashboard_cache import (DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, DashboardCache, DashboardCountsSource,
+                             listen_for_changes)
+
+# Carregar variáveis do .env
+load_dotenv()
+
+COUNTS_PATH = '/dashboard-counts/'
+
+def make_handler(dashboard, allow_origin, invalidate_token=None):
+    class DashboardCacheHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 para permitir keep-alive entre as consultas de uma mesma tela
+        protocol_version = 'HTTP/1.1'
+        # Cabeçalhos e corpo saem em escritas separadas: com Nagle, cada resposta esperaria o ACK atrasado (~40ms)
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload=None, cors=True):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+            self.send_response(status)
+            if cors:
+                # As contagens têm leitura liberada para todos (mesma política RLS da tabela)
+                self.send_header('Access-Control-Allow-Origin', allow_origin)
+            self.send_header('Cache-Control', 'no-store')
+            if body:
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+
+            if path == '/stats':
+                stats = dashboard.cache.stats.snapshot()
+                stats['entries'] = len(dashboard.cache)
+                self._reply(200, stats)
+                return
+
+            if not path.startswith(COUNTS_PATH):
+                self._reply(404, {'message': 'Not found'})
+                return
+
+            dimension = path[len(COUNTS_PATH):]
+            if dimension not in DIMENSIONS:
+                self._reply(404, {'message': f'Dimensão desconhecida: {dimension}'})
+                return
+
+            try:
+                self._reply(200, dashboard.counts(dimension))
+            except Exception as e:
+                # O dashboard volta a consultar o Supabase direto quando o cache falha
+                self._reply(503, {'message': f'Erro ao consultar as contagens: {str(e).strip()}'})
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            if self.path.split('?')[0] != '/invalidate':
+                self._reply(404, {'message': 'Not found'})
+                return
+
+            # Sem CORS e com o token num cabeçalho: um navegador não consegue enviar esta requisição
+            # (o preflight não é respondido), então nenhuma página esvazia o cache
+            if invalidate_token is None:
+                self._reply(403, {'message': 'POST /invalidate desativado (inicie com --invalidate-token)'}, cors=False)
+                return
+            authorization = self.headers.get('Authorization', '')
+            if not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {invalidate_token}'.encode('utf-8')):
+                self._reply(401, {'message': 'Token inválido'}, cors=False)
+                return
+
+            self._reply(200, {'dropped': dashboard.invalidate()}, cors=False)
+
+    return DashboardCacheHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='Cache em memória das contagens do dashboard, esvaziado a cada mudança nas contagens')
+    parser.add_argument('--dsn', help='String de conexão PostgreSQL (padrão: DATABASE_URL)')
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço local')
+    parser.add_argument('--port', type=int, default=54330, help='Porta local')
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL_SECONDS,
+                        help='Segundos que uma contagem fica em memória (rede de segurança além do NOTIFY)')
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help='Entradas mantidas (LRU)')
+    parser.add_argument('--allow-origin', default='*', help='Access-Control-Allow-Origin das respostas')
+    parser.add_argument('--invalidate-token', default=os.getenv('DASHBOARD_CACHE_TOKEN'),
+                        help='Segredo exigido em POST /invalidate (Authorization: Bearer <token>); '
+                             'sem ele o endpoint fica desativado (padrão: DASHBOARD_CACHE_TOKEN)')
+    parser.add_argument('--no-listen', action='store_true',
+                        help='Não escutar o NOTIFY do banco: as contagens só expiram pelo --ttl ou POST /invalidate')
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('psycopg2') is None:
+        print("❌ psycopg2 não encontrado. Instale com: pip install psycopg2-binary")
+        return
+
+    dsn = args.dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("❌ Informe --dsn ou defina DATABASE_URL no ambiente")
+        return
+
+    dashboard = DashboardCache(DashboardCountsSource(dsn), args.max_entries, args.ttl)
+    stop_event = threading.Event()
+
+    if not args.no_listen:
+        def on_change():
+            dropped = dashboard.invalidate()
+            if dropped:
+                print(f"🔄 {time.strftime('%H:%M:%S')} contagens alteradas no banco: {dropped} entradas descartadas")
+
+        listener = threading.Thread(target=listen_for_changes, args=(dsn, on_change, stop_event), daemon=True)
+        listener.start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(dashboard, args.allow_origin, args.invalidate_token or None))
+
+    print(f"🗃️  Cache do dashboard em http://{args.host}:{args.port}{COUNTS_PATH}<dimensão>")
+    print(f"💡 Use VITE_DASHBOARD_CACHE_URL=http://{args.host}:{args.port} no .env do dashboard")
+    print(f"💡 O aviso de mudança vem do gatilho de {AGGREGATES_SQL_FILE} (execute-o de novo se for anterior)")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Contadores finais: {dashboard.cache.stats.snapshot()}")
+    finally:
+        stop_event.set()
+        dashboard.source.close_connection()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Contagens pré-calculadas do dashboard (public.leads_dashboard_counts)
+A tabela, as funções e os gatilhos ficam em dashboard-aggregates.sql; cargas completas recalculam tudo,
+as demais escritas em public.leads aplicam deltas pelos gatilhos
+"""
+
+AGGREGATES_SQL_FILE = 'dashboard-aggregates.sql'
+REFRESH_FUNCTION = 'refresh_leads_dashboard_counts'
+# Função dos gatilhos de public.leads que aplicam o delta das contagens a cada comando
+TRIGGER_FUNCTION = 'apply_leads_dashboard_changes'
+# Upsert por lead_id numa transação, chamado via /rest/v1/rpc com {"records": [...]}
+COUNTED_UPSERT_FUNCTION = 'upsert_leads_counted'
+COUNTED_UPSERT_PARAM = 'records'
+
+# Dimensões da tabela; 'mes_criacao' é o YYYY-MM de data_criada
+DIMENSIONS = ('total', 'estado_contato', 'permissao_trabalho', 'etapa_funil', 'mes_criacao')
+
+# Canal de NOTIFY do gatilho de leads_dashboard_counts: avisa o cache do dashboard a cada COMMIT que muda as contagens
+CHANGE_CHANNEL = 'leads_dashboard_changed'
+
+# Rodapé dos arquivos SQL gerados: só recalcula se dashboard-aggregates.sql já foi executado no banco
+REFRESH_COMMANDS = [
+    "-- Recalcular as contagens do dashboard (criadas por dashboard-aggregates.sql)",
+    "DO $$",
+    "BEGIN",
+    f"    IF to_regproc('public.{REFRESH_FUNCTION}') IS NOT NULL THEN",
+    f"        PERFORM public.{REFRESH_FUNCTION}();",
+    "    ELSE",
+    f"        RAISE NOTICE 'Contagens do dashboard não instaladas: execute {AGGREGATES_SQL_FILE}';",
+    "    END IF;",
+    "END;",
+    "$$;",
+]
+
+def write_refresh_commands(sql_file):
+    """Grava REFRESH_COMMANDS num arquivo SQL aberto"""
+    sql_file.write('\n'.join(REFRESH_COMMANDS) + '\n\n')
+
+def _call_if_installed(cursor, function):
+    """Chama public.<function>() se ela existe; None se dashboard-aggregates.sql não foi executado"""
+    cursor.execute("SELECT to_regproc(%s) IS NOT NULL", (f'public.{function}',))
+    if not cursor.fetchone()[0]:
+        return None
+
+    cursor.execute(f"SELECT public.{function}()")
+    return cursor.fetchone()[0]
+
+def refresh_dashboard_counts(cursor):
+    """
+    Recalcula todas as contagens na transação do cursor, junto com a carga
+
+    Retorna o número de buckets gravados, ou None se dashboard-aggregates.sql
+    ainda não foi executado neste banco.
+    """
+    return _call_if_installed(cursor, REFRESH_FUNCTION)
+
+def defer_to_refresh(cursor):
+    """
+    Desliga o delta dos gatilhos de public.leads até o fim da transação do cursor
+
+    Para cargas que chamam refresh_dashboard_counts() na mesma transação: o recálculo
+    substitui as contagens, e o delta de cada COPY seria trabalho jogado fora.
+    """
+    cursor.execute("SET LOCAL leads.dashboard_counts = 'refresh'")
+
+def dashboard_triggers_installed(cursor):
+    """True se os gatilhos de dashboard-aggregates.sql mantêm as contagens; None se não foi executado"""
+    cursor.execute("SELECT to_regproc(%s) IS NOT NULL", (f'public.{TRIGGER_FUNCTION}',))
+    return cursor.fetchone()[0] or None
+
+def print_refresh_result(buckets, delta=False):
+    """Mostra o resultado do recálculo, ou (delta=True) se os gatilhos aplicaram o delta (None = tabela não instalada)"""
+    if buckets is None:
+        print(f"⚠️  Contagens do dashboard não instaladas: execute {AGGREGATES_SQL_FILE} uma vez no banco")
+    elif delta:
+        print("📊 Contagens do dashboard atualizadas pelo delta dos leads novos/alterados (gatilhos de public.leads)")
+    else:
+        print(f"📊 Contagens do dashboard recalculadas ({buckets} buckets)")
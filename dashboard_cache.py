@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Cache em memória (TTL + LRU) das contagens do dashboard, na frente de public.leads_dashboard_counts
+As contagens só mudam quando uma escrita em public.leads confirma (importação ou edição no app):
+o banco avisa por NOTIFY e o cache é esvaziado
+"""
+
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from dashboard_aggregates import CHANGE_CHANNEL, DIMENSIONS
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 64
+
+# Espera entre tentativas de reconectar o LISTEN, em segundos
+LISTEN_RETRY_SECONDS = 5
+
+COUNTS_QUERY = (
+    "SELECT bucket, total_leads, conversions FROM public.leads_dashboard_counts "
+    "WHERE dimension = %s AND total_leads > 0"
+)
+
+class CacheStats:
+    """Contadores do cache"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def snapshot(self):
+        return dict(vars(self))
+
+class TTLCache:
+    """
+    Cache read-through com expiração por tempo (TTL) e descarte do menos usado (LRU)
+
+    get_or_load(chave, load) devolve o valor guardado ou chama load() uma única vez
+    por chave, mesmo com várias threads pedindo ao mesmo tempo. invalidate() esvazia
+    o cache; um load() que começou antes da invalidação não é guardado, para que
+    uma leitura anterior à importação não volte a ser servida.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, key):
+        """Valor guardado e ainda válido; chamado com self._lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.clock() >= entry[1]:
+            del self._entries[key]
+            self.stats.expired += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_or_load(self, key, load):
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.stats.hits += 1
+                return entry[0]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Outra thread pode ter carregado a chave enquanto esta esperava
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.stats.hits += 1
+                    return entry[0]
+                self.stats.misses += 1
+                generation = self._generation
+
+            value = load()
+
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (value, self.clock() + self.ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        evicted, _ = self._entries.popitem(last=False)
+                        self._loading.pop(evicted, None)
+                        self.stats.evictions += 1
+            return value
+
+    def invalidate(self):
+        """Esvazia o cache; retorna o número de entradas descartadas"""
+        with self._lock:
+            dropped = len(self._entries)
+            self._entries.clear()
+            self._generation += 1
+            self.stats.invalidations += 1
+            return dropped
+
+class DashboardCountsSource:
+    """
+    Lê as contagens de uma dimensão de public.leads_dashboard_counts
+
+    Retorna a mesma lista que LeadsService.getDashboardCounts recebe do PostgREST:
+    [{'bucket', 'total_leads', 'conversions'}] só com buckets não vazios. Usa uma
+    conexão persistente (reaberta depois de uma falha), compartilhada entre threads.
+    """
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.set_client_encoding('UTF8')
+        # Só leituras: cada SELECT vê o último COMMIT das importações
+        conn.autocommit = True
+        return conn
+
+    def counts(self, dimension):
+        if dimension not in DIMENSIONS:
+            raise KeyError(dimension)
+
+        import psycopg2
+
+        with self._lock:
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                with self._conn.cursor() as cur:
+                    cur.execute(COUNTS_QUERY, (dimension,))
+                    rows = cur.fetchall()
+            except psycopg2.Error:
+                self.close_connection()
+                raise
+
+        return [{'bucket': bucket, 'total_leads': total, 'conversions': conversions}
+                for bucket, total, conversions in rows]
+
+    def close_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+class DashboardCache:
+    """Contagens por dimensão servidas do TTLCache, carregadas de DashboardCountsSource na falta"""
+
+    def __init__(self, source, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.source = source
+        self.cache = TTLCache(max_entries, ttl)
+
+    def counts(self, dimension):
+        return self.cache.get_or_load(dimension, lambda: self.source.counts(dimension))
+
+    def invalidate(self):
+        return self.cache.invalidate()
+
+def listen_for_changes(dsn, on_change, stop_event, channel=CHANGE_CHANNEL, log=print):
+    """
+    Escuta o canal de NOTIFY do banco e chama on_change() a cada mudança confirmada nas contagens
+
+    O NOTIFY é disparado pelo gatilho de dashboard-aggregates.sql e só chega depois do
+    COMMIT. Se a conexão cair, on_change() também é chamado ao reconectar, porque
+    avisos podem ter sido perdidos nesse intervalo. Roda até stop_event ser acionado.
+    """
+    import psycopg2
+
+    while not stop_event.is_set():
+        conn = None
+        try:
+            conn = psycopg2.connect(dsn)
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {channel}")
+            on_change()
+            log(f"👂 Escutando {channel}: o cache é esvaziado a cada mudança confirmada nas contagens")
+
+            while not stop_event.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                if conn.notifies:
+                    conn.notifies.clear()
+                    on_change()
+        except psycopg2.Error as e:
+            log(f"⚠️  LISTEN {channel} falhou: {str(e).strip()}; nova tentativa em {LISTEN_RETRY_SECONDS}s")
+            stop_event.wait(LISTEN_RETRY_SECONDS)
+        finally:
+            if conn is not None:
+                conn.close()
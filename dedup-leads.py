@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Remove do CSV do CRM os leads repetidos (mesma pessoa com vários lead_id) antes da carga
+Gera um CSV no mesmo formato, pronto para csv-to-sql.py/import-batch-api.py, e o relatório de mesclagem
+"""
+
+import argparse
+import os
+import time
+
+from import_metrics import ImportMetrics, add_metrics_argument
+from lead_dedup import (DEFAULT_COUNTRY_CODE, DEFAULT_NAME_SIMILARITY, DEFAULT_PARTITIONS, LeadDeduplicator)
+from leads_csv import DEFAULT_CSV_PATH
+
+def dedup_leads_csv(csv_path, output_path, report_path, **options):
+    """Deduplica csv_path em output_path; options vão para LeadDeduplicator"""
+    if not os.path.exists(csv_path):
+        print(f"❌ Arquivo não encontrado: {csv_path}")
+        return None
+
+    print(f"📁 Lendo arquivo: {csv_path}")
+    start = time.perf_counter()
+    dedup = LeadDeduplicator(**options)
+    try:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as csv_file:
+            dedup.add_csv(csv_file)
+
+        print(f"🔗 Resolvendo identidades de {dedup.stats.rows:,} registros...")
+        dedup.resolve()
+
+        with open(output_path, 'w', encoding='utf-8', newline='') as output_file, \
+                open(report_path, 'w', encoding='utf-8', newline='') as report_file:
+            stats = dedup.write(output_file, report_file)
+    finally:
+        dedup.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Deduplicação concluída em {elapsed:.2f}s")
+    print(f"📊 Registros: {stats.rows:,} -> {stats.output_rows:,} leads")
+    print(f"🧬 Grupos mesclados: {stats.groups:,} ({stats.duplicates:,} registros repetidos)")
+    for reason, count in sorted(stats.reasons.items(), key=lambda item: -item[1]):
+        print(f"   • {reason:<10} {count:>10,}")
+    print(f"📄 CSV deduplicado: {output_path}")
+    print(f"📄 Relatório (lead_id -> lead_id_mantido): {report_path}")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Mescla os leads repetidos (e-mail, telefone, lead_id) do CSV do CRM')
+    parser.add_argument('--csv', default=DEFAULT_CSV_PATH, help='CSV de origem')
+    parser.add_argument('--output', default='leads-dedup.csv', help='CSV deduplicado')
+    parser.add_argument('--report', default='leads-dedup-report.csv', help='Relatório lead_id -> lead_id_mantido')
+    parser.add_argument('--country-code', default=DEFAULT_COUNTRY_CODE, help='DDI dos telefones sem +')
+    parser.add_argument('--fuzzy-names', action='store_true',
+                        help='Unir também pelo nome parecido (mesmo usuário de e-mail ou final de telefone)')
+    parser.add_argument('--name-similarity', type=float, default=DEFAULT_NAME_SIMILARITY,
+                        help='Semelhança mínima dos nomes com --fuzzy-names (0 a 1)')
+    parser.add_argument('--partitions', type=int, default=DEFAULT_PARTITIONS,
+                        help='Partições em disco (mais partições = menos memória por etapa)')
+    parser.add_argument('--work-dir', help='Diretório dos arquivos temporários (padrão: o do sistema)')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+
+    metrics = ImportMetrics('dedup-leads', args.metrics)
+    try:
+        dedup_leads_csv(
+            args.csv, args.output, args.report, work_dir=args.work_dir, partitions=args.partitions,
+            country_code=args.country_code.lstrip('+'), fuzzy_names=args.fuzzy_names,
+            name_similarity=args.name_similarity, metrics=metrics,
+        )
+    finally:
+        metrics.close()
+
+if __name__ == '__main__':
+    main()
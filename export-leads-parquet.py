@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exporta os leads para Parquet (colunar, comprimido), particionado pelo mês de data_criada
+Lê o CSV do CRM ou a tabela public.leads em blocos; gera mes_criacao=YYYY-MM/part-NNNNN.parquet
+"""
+
+import argparse
+import datetime
+import os
+import re
+import shutil
+import time
+
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+from lead_schema import DATE, LEAD_COLUMNS, LEAD_SCHEMA, LOW_CARDINALITY_COLUMNS
+from leads_csv import DEFAULT_CHUNK_SIZE, DEFAULT_CSV_PATH, iter_column_batches
+
+PARTITION_COLUMN = 'mes_criacao'
+# Partição dos leads sem data_criada (nome que o pyarrow.dataset lê como nulo no particionamento hive)
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+PARTITION_PATTERN = re.compile(rf'^{PARTITION_COLUMN}=')
+
+# Um mês é gravado (um row group) ao juntar ROW_GROUP_SIZE registros; acima de
+# MAX_BUFFERED_ROWS registros em memória, somando os meses, todos são gravados
+ROW_GROUP_SIZE = 65536
+MAX_BUFFERED_ROWS = 500000
+
+def import_pyarrow():
+    """Importa o pyarrow sob demanda; None (com aviso) se não estiver instalado"""
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        print("❌ pyarrow não encontrado. Instale com: pip install pyarrow")
+        return None
+
+def leads_schema(pa):
+    """Schema Arrow de LEAD_SCHEMA: datas como date32, colunas com poucos valores distintos como índice + dicionário"""
+    fields = []
+    for column in LEAD_SCHEMA:
+        if column.low_cardinality:
+            fields.append(pa.field(column.name, pa.dictionary(pa.int32(), pa.string())))
+        elif column.kind == DATE:
+            fields.append(pa.field(column.name, pa.date32()))
+        else:
+            fields.append(pa.field(column.name, pa.string()))
+    return pa.schema(fields)
+
+def iter_csv_columns(csv_path, chunk_size=DEFAULT_CHUNK_SIZE, metrics=NULL_METRICS):
+    """Blocos de colunas normalizadas (datas já em YYYY-MM-DD) lidos do CSV"""
+    with open(csv_path, 'r', encoding='utf-8') as csv_file:
+        for batch in iter_column_batches(csv_file, chunk_size, metrics=metrics):
+            yield batch.columns
+
+def iter_table_columns(dsn, chunk_size=DEFAULT_CHUNK_SIZE, metrics=NULL_METRICS):
+    """Blocos de colunas de public.leads lidos por um cursor no servidor (sem carregar a tabela)"""
+    import psycopg2
+
+    # Tudo como texto: as datas chegam em YYYY-MM-DD, como as do CSV normalizado
+    columns = ', '.join(f"{column}::text" for column in LEAD_COLUMNS)
+    conn = psycopg2.connect(dsn)
+    try:
+        conn.set_client_encoding('UTF8')
+        with conn.cursor(name='leads_parquet_export') as cur:
+            cur.itersize = chunk_size
+            cur.execute(f"SELECT {columns} FROM public.leads ORDER BY data_criada, id")
+            while True:
+                with metrics.stage('read') as stage:
+                    rows = cur.fetchmany(chunk_size)
+                    stage.add(rows=len(rows))
+                if not rows:
+                    return
+                yield [list(values) for values in zip(*rows)]
+    finally:
+        conn.close()
+
+class PartitionedParquetWriter:
+    """
+    Grava tabelas Arrow em um arquivo Parquet por mês de data_criada
+
+    Os registros de cada mês ficam em memória até formarem um row group (ou até o
+    total em memória passar de MAX_BUFFERED_ROWS) e então são gravados no arquivo
+    do mês, que fica aberto até close(). A coluna do mês não é gravada: vem do nome
+    do diretório.
+    """
+
+    def __init__(self, pa, output_dir, compression='zstd', row_group_size=ROW_GROUP_SIZE, metrics=NULL_METRICS):
+        self.pa = pa
+        self.output_dir = output_dir
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.metrics = metrics
+        self.schema = leads_schema(pa)
+        self.buffers = {}
+        self.buffer_rows = {}
+        self.buffered_rows = 0
+        self.writers = {}
+        self.rows = 0
+        # Datas no formato certo mas impossíveis (ex.: 2025-02-30): gravadas como nulo e contadas por coluna
+        self.invalid_dates = {}
+        self._dates = {}
+
+    def write_columns(self, columns):
+        """Converte um bloco de colunas para Arrow e o distribui pelos meses"""
+        pa, pc = self.pa, self.pa.compute
+
+        with self.metrics.stage('serialize', rows=len(columns[0])):
+            arrays = []
+            for field, values in zip(self.schema, columns):
+                if pa.types.is_dictionary(field.type):
+                    arrays.append(pa.array(values, pa.string()).dictionary_encode())
+                elif field.type == pa.date32():
+                    arrays.append(pa.array(self._parse_dates(field.name, values), pa.date32()))
+                else:
+                    arrays.append(pa.array(values, pa.string()))
+            table = pa.Table.from_arrays(arrays, schema=self.schema)
+
+            months = pc.strftime(table.column('data_criada'), format='%Y-%m')
+            parts = []
+            for month in pc.unique(months).to_pylist():
+                mask = pc.is_null(months) if month is None else pc.equal(months, month)
+                parts.append((month or NULL_PARTITION, table.filter(mask)))
+
+        self.rows += table.num_rows
+        for month, part in parts:
+            self.buffers.setdefault(month, []).append(part)
+            self.buffer_rows[month] = self.buffer_rows.get(month, 0) + part.num_rows
+            self.buffered_rows += part.num_rows
+            if self.buffer_rows[month] >= self.row_group_size:
+                self._write_month(month)
+
+        if self.buffered_rows >= MAX_BUFFERED_ROWS:
+            self.flush()
+
+    def _parse_dates(self, column, values):
+        """YYYY-MM-DD -> datetime.date; data impossível vira None (cada texto é convertido uma única vez)"""
+        if len(self._dates) > 100000:
+            self._dates.clear()
+        dates = []
+        for value in values:
+            if value is None:
+                dates.append(None)
+                continue
+            try:
+                date = self._dates[value]
+            except KeyError:
+                try:
+                    date = datetime.date.fromisoformat(value)
+                except ValueError:
+                    date = None
+                self._dates[value] = date
+            if date is None:
+                self.invalid_dates[column] = self.invalid_dates.get(column, 0) + 1
+            dates.append(date)
+        return dates
+
+    def _writer(self, month):
+        writer = self.writers.get(month)
+        if writer is None:
+            directory = os.path.join(self.output_dir, f"{PARTITION_COLUMN}={month}")
+            os.makedirs(directory, exist_ok=True)
+            writer = self.pa.parquet.ParquetWriter(
+                os.path.join(directory, 'part-00000.parquet'), self.schema,
+                compression=self.compression, use_dictionary=list(LOW_CARDINALITY_COLUMNS),
+            )
+            self.writers[month] = writer
+        return writer
+
+    def _write_month(self, month):
+        table = self.pa.concat_tables(self.buffers.pop(month))
+        self.buffered_rows -= self.buffer_rows.pop(month)
+        with self.metrics.stage('write', rows=table.num_rows):
+            self._writer(month).write_table(table, row_group_size=self.row_group_size)
+
+    def flush(self):
+        """Grava os registros em memória de todos os meses"""
+        for month in list(self.buffers):
+            self._write_month(month)
+
+    def close(self):
+        self.flush()
+        for writer in self.writers.values():
+            writer.close()
+        return sorted(self.writers)
+
+def clear_partitions(output_dir):
+    """Remove as partições de uma exportação anterior no mesmo diretório"""
+    for name in os.listdir(output_dir):
+        if PARTITION_PATTERN.match(name):
+            shutil.rmtree(os.path.join(output_dir, name))
+
+def column_sizes(pa, output_dir, months):
+    """Bytes comprimidos de cada coluna somando todos os arquivos"""
+    sizes = dict.fromkeys(LEAD_COLUMNS, 0)
+    for month in months:
+        path = os.path.join(output_dir, f"{PARTITION_COLUMN}={month}", 'part-00000.parquet')
+        metadata = pa.parquet.read_metadata(path)
+        for group in range(metadata.num_row_groups):
+            row_group = metadata.row_group(group)
+            for index in range(row_group.num_columns):
+                chunk = row_group.column(index)
+                sizes[chunk.path_in_schema] += chunk.total_compressed_size
+    return sizes
+
+def export_leads_parquet(output_dir, csv_path=None, dsn=None, compression='zstd', metrics=NULL_METRICS):
+    """Exporta o CSV (csv_path) ou a tabela public.leads (dsn) para Parquet particionado por mês"""
+    pa = import_pyarrow()
+    if pa is None:
+        return False
+
+    database_errors = ()
+    if csv_path:
+        if not os.path.exists(csv_path):
+            print(f"❌ Arquivo não encontrado: {csv_path}")
+            return False
+        print(f"📁 Lendo arquivo: {csv_path}")
+        columns = iter_csv_columns(csv_path, metrics=metrics)
+    else:
+        try:
+            import psycopg2
+        except ImportError:
+            print("❌ psycopg2 não encontrado. Instale com: pip install psycopg2-binary")
+            return False
+        print("📁 Lendo tabela public.leads")
+        database_errors = (psycopg2.Error,)
+        columns = iter_table_columns(dsn, metrics=metrics)
+
+    os.makedirs(output_dir, exist_ok=True)
+    clear_partitions(output_dir)
+
+    start = time.perf_counter()
+    writer = PartitionedParquetWriter(pa, output_dir, compression, metrics=metrics)
+    try:
+        for block in columns:
+            writer.write_columns(block)
+    except database_errors as e:
+        print(f"❌ Erro ao ler public.leads: {e}")
+        return False
+    finally:
+        months = writer.close()
+    elapsed = time.perf_counter() - start
+
+    sizes = column_sizes(pa, output_dir, months)
+    total_bytes = sum(sizes.values())
+
+    print(f"✅ Exportação concluída em {elapsed:.2f}s")
+    print(f"📊 Registros: {writer.rows:,} em {len(months)} partições ({PARTITION_COLUMN}=YYYY-MM)")
+    for column, count in writer.invalid_dates.items():
+        print(f"⚠️  {count:,} datas inválidas em {column} gravadas como nulo")
+    print(f"📏 Parquet ({compression}): {total_bytes / 1024 / 1024:.1f} MB", end='')
+    if csv_path:
+        csv_bytes = os.path.getsize(csv_path)
+        print(f" | CSV: {csv_bytes / 1024 / 1024:.1f} MB ({total_bytes / csv_bytes * 100:.1f}%)")
+    else:
+        print()
+
+    # Uma varredura de coluna lê só os bytes dela; no CSV, o arquivo inteiro
+    reference = os.path.getsize(csv_path) if csv_path else total_bytes
+    print(f"\n📦 Bytes lidos para varrer uma coluna (% do {'CSV' if csv_path else 'Parquet'}):")
+    for column, size in sorted(sizes.items(), key=lambda item: -item[1]):
+        share = size / reference * 100 if reference else 0.0
+        print(f"   • {column:<28} {size / 1024:>10,.0f} KB {share:>6.2f}%")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description='Exporta os leads para Parquet particionado por mês de data_criada')
+    parser.add_argument('--output-dir', default='leads_parquet', help='Diretório das partições mes_criacao=YYYY-MM')
+    parser.add_argument('--csv', help=f'Exportar este CSV do CRM (ex.: {DEFAULT_CSV_PATH})')
+    parser.add_argument('--dsn', help='Exportar public.leads desta conexão PostgreSQL (padrão: DATABASE_URL)')
+    parser.add_argument('--compression', default='zstd', choices=['zstd', 'snappy', 'gzip', 'none'],
+                        help='Compressão das páginas Parquet')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+
+    dsn = args.dsn or os.getenv('DATABASE_URL')
+    if not args.csv and not dsn:
+        print("❌ Informe --csv, ou --dsn/DATABASE_URL para exportar a tabela")
+        return
+
+    metrics = ImportMetrics('export-leads-parquet', args.metrics)
+    try:
+        export_leads_parquet(args.output_dir, args.csv, None if args.csv else dsn, args.compression, metrics)
+    finally:
+        metrics.close()
+
+if __name__ == '__main__':
+    main()
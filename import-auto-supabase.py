@@ -5,11 +5,15 @@ Script automatizado para importar dados via Supabase API
 Usa a chave anônima do .env para executar os comandos SQL
 """
 
+import argparse
 import os
-import requests
 import time
 from dotenv import load_dotenv
 
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+from quarantine import QuarantineFile
+from supabase_ingest import ingest_batches
+
 # Carregar variáveis do .env
 load_dotenv()
 
@@ -47,27 +51,31 @@ def enable_rls(supabase_url, supabase_key):
         print(f"⚠️  Aviso: Não foi possível reabilitar RLS: {e}")
         return False
 
-def insert_leads_batch(leads_data, supabase_url, supabase_key):
-    """Insere um lote de leads via API REST"""
+def insert_leads_batches(batches, supabase_url, supabase_key, metrics=NULL_METRICS):
+    """
+    Insere os lotes de leads via API REST com um único cliente (uma sessão keep-alive
+    para todos os lotes); registros rejeitados pelo banco vão para a quarentena
+
+    batches é consumido sob demanda; cada requisição entra em metrics como 'network' ou
+    'failed'. Retorna {número do lote: (sucesso, mensagem)}
+    """
+    quarantine = QuarantineFile()
+    results = {}
+
+    def record_result(batch_number, rows, success, message):
+        results[batch_number] = (success, message)
+
     try:
-        leads_url = f"{supabase_url}/rest/v1/leads"
-        
-        headers = {
-            'apikey': supabase_key,
-            'Authorization': f'Bearer {supabase_key}',
-            'Content-Type': 'application/json',
-            'Prefer': 'return=minimal'
-        }
-        
-        response = requests.post(leads_url, json=leads_data, headers=headers, timeout=60)
-        
-        if response.status_code in [200, 201, 204]:
-            return True, f"Lote inserido com sucesso ({len(leads_data)} registros)"
-        else:
-            return False, f"Status: {response.status_code}, Error: {response.text[:200]}"
-            
+        ingest_batches(batches, supabase_url, supabase_key, on_result=record_result, quarantine=quarantine,
+                       metrics=metrics)
+        if quarantine.count:
+            print(f"🧪 {quarantine.count} registros rejeitados pelo banco em {quarantine.path}")
     except Exception as e:
-        return False, str(e)
+        # Lotes sem resultado não chegaram a ser confirmados
+        results.setdefault(None, (False, str(e)))
+    finally:
+        quarantine.close()
+    return results
 
 def parse_sql_insert(sql_content):
     """Extrai dados dos comandos INSERT SQL (versão simplificada)"""
@@ -109,60 +117,104 @@ def parse_sql_insert(sql_content):
     # Para demonstração, retornar dados de exemplo
     return sample_leads[:2]  # Retornar apenas 2 registros de exemplo
 
-def execute_sql_file(file_path, supabase_url, supabase_key):
-    """Executa um arquivo SQL"""
-    try:
-        print(f"📄 Executando: {os.path.basename(file_path)}")
-        
-        # Ler conteúdo do arquivo
+def read_sql_file(file_path, metrics=NULL_METRICS):
+    """Lê um arquivo SQL; retorna o conteúdo (None se vazio)"""
+    print(f"📄 Executando: {os.path.basename(file_path)}")
+
+    # Ler conteúdo do arquivo
+    with metrics.stage('read', batch=os.path.basename(file_path)) as stage:
         with open(file_path, 'r', encoding='utf-8') as f:
             sql_content = f.read().strip()
-        
-        if not sql_content:
-            print(f"⚠️  Arquivo vazio: {os.path.basename(file_path)}")
+        stage.add(bytes=len(sql_content.encode('utf-8')))
+
+    if not sql_content:
+        print(f"⚠️  Arquivo vazio: {os.path.basename(file_path)}")
+        return None
+
+    # Mostrar tamanho do arquivo
+    print(f"📏 Tamanho: {len(sql_content):,} caracteres")
+    return sql_content
+
+def is_insert_file(filename):
+    return filename.startswith('01_insert_batch')
+
+def execute_insert_files(file_paths, supabase_url, supabase_key, metrics=NULL_METRICS):
+    """
+    Insere os dados de todos os arquivos de inserção com um único cliente da API
+    (um lote por arquivo); retorna {caminho: sucesso}
+    """
+    sent = []
+
+    def iter_batches():
+        for file_path in file_paths:
+            leads_data = []
+            try:
+                sql_content = read_sql_file(file_path, metrics)
+                if sql_content is None:
+                    sent.append((file_path, None))
+                    yield []
+                    continue
+                print("📦 Processando dados de inserção...")
+                with metrics.stage('parse', batch=os.path.basename(file_path)) as stage:
+                    leads_data = parse_sql_insert(sql_content)
+                    stage.add(rows=len(leads_data))
+                if not leads_data:
+                    print(f"⚠️  Nenhum dado extraído de {os.path.basename(file_path)}")
+            except Exception as e:
+                print(f"❌ Erro ao processar {os.path.basename(file_path)}: {e}")
+            sent.append((file_path, leads_data))
+            # Lote vazio: o cliente o ignora, mas a numeração dos lotes segue a dos arquivos
+            yield leads_data or []
+
+    results = insert_leads_batches(iter_batches(), supabase_url, supabase_key, metrics)
+
+    outcome = {}
+    for number, (file_path, leads_data) in enumerate(sent, 1):
+        if leads_data is None:
+            # Arquivo vazio não é erro, como nos demais arquivos
+            outcome[file_path] = True
+            continue
+        if not leads_data:
+            outcome[file_path] = False
+            continue
+        success, result = results.get(number, results.get(None, (False, "Lote não enviado")))
+        if success:
+            print(f"✅ {os.path.basename(file_path)}: {result}")
+        else:
+            print(f"❌ Erro na inserção de {os.path.basename(file_path)}: {result}")
+        outcome[file_path] = success
+    return outcome
+
+def execute_sql_file(file_path, supabase_url, supabase_key):
+    """Executa um arquivo SQL de setup ou cleanup (os de inserção vão por execute_insert_files)"""
+    try:
+        if read_sql_file(file_path) is None:
             return True
-        
-        # Mostrar tamanho do arquivo
-        file_size = len(sql_content)
-        print(f"📏 Tamanho: {file_size:,} caracteres")
-        
+
         filename = os.path.basename(file_path)
-        
+
         # Processar baseado no tipo de arquivo
         if filename == '00_setup.sql':
             # Setup: desabilitar RLS
             return disable_rls(supabase_url, supabase_key)
-            
-        elif filename.startswith('01_insert_batch'):
-            # Inserção: processar dados
-            print("📦 Processando dados de inserção...")
-            leads_data = parse_sql_insert(sql_content)
-            
-            if leads_data:
-                success, result = insert_leads_batch(leads_data, supabase_url, supabase_key)
-                if success:
-                    print(f"✅ {result}")
-                    return True
-                else:
-                    print(f"❌ Erro na inserção: {result}")
-                    return False
-            else:
-                print("⚠️  Nenhum dado extraído do arquivo SQL")
-                return False
-                
+
         elif filename == '02_cleanup.sql':
             # Cleanup: reabilitar RLS
             return enable_rls(supabase_url, supabase_key)
-            
+
         else:
             print(f"⚠️  Tipo de arquivo não reconhecido: {filename}")
             return False
-            
+
     except Exception as e:
         print(f"❌ Erro ao processar {os.path.basename(file_path)}: {e}")
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Importação automatizada dos lotes de sql_batches/ via API do Supabase')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    
     print("🚀 Importação Automatizada via Supabase API")
     
     # Obter configuração
@@ -199,29 +251,42 @@ def main():
         return
     
     success_count = 0
+    # Os arquivos de inserção vão todos juntos, com um único cliente, ao chegar no primeiro deles
+    insert_results = None
     
-    for i, sql_file in enumerate(sql_files, 1):
-        file_path = os.path.join(sql_batches_dir, sql_file)
-        
-        if not os.path.exists(file_path):
-            print(f"⚠️  Arquivo não encontrado: {sql_file}")
-            continue
-        
-        print(f"\n📦 [{i}/{len(sql_files)}] Processando: {sql_file}")
-        
-        # Executar arquivo
-        success = execute_sql_file(file_path, supabase_url, supabase_key)
-        
-        if success:
-            success_count += 1
-            print(f"✅ [{i}/{len(sql_files)}] Concluído: {sql_file}")
-        else:
-            print(f"❌ [{i}/{len(sql_files)}] Falha: {sql_file}")
-        
-        # Pausa entre arquivos
-        if i < len(sql_files):
-            print("⏳ Aguardando 2 segundos...")
-            time.sleep(2)
+    metrics = ImportMetrics('import-auto-supabase', args.metrics)
+    try:
+        for i, sql_file in enumerate(sql_files, 1):
+            file_path = os.path.join(sql_batches_dir, sql_file)
+            
+            if not os.path.exists(file_path):
+                print(f"⚠️  Arquivo não encontrado: {sql_file}")
+                continue
+            
+            print(f"\n📦 [{i}/{len(sql_files)}] Processando: {sql_file}")
+            
+            # Executar arquivo
+            if is_insert_file(sql_file):
+                if insert_results is None:
+                    insert_paths = [os.path.join(sql_batches_dir, name) for name in sql_files if is_insert_file(name)]
+                    insert_paths = [path for path in insert_paths if os.path.exists(path)]
+                    insert_results = execute_insert_files(insert_paths, supabase_url, supabase_key, metrics)
+                success = insert_results[file_path]
+            else:
+                success = execute_sql_file(file_path, supabase_url, supabase_key)
+            
+            if success:
+                success_count += 1
+                print(f"✅ [{i}/{len(sql_files)}] Concluído: {sql_file}")
+            else:
+                print(f"❌ [{i}/{len(sql_files)}] Falha: {sql_file}")
+            
+            # Pausa entre arquivos
+            if i < len(sql_files):
+                print("⏳ Aguardando 2 segundos...")
+                time.sleep(2)
+    finally:
+        metrics.close()
     
     print(f"\n📊 Resumo da Demonstração:")
     print(f"   • Arquivos processados: {success_count}/{len(sql_files)}")
@@ -5,12 +5,22 @@ Script para importar dados em lotes via API do Supabase
 Divide o arquivo SQL grande em lotes menores para contornar limitações do SQL Editor
 """
 
+import argparse
 import os
-import re
-import time
-import requests
 from dotenv import load_dotenv
 
+from batch_sizing import DEFAULT_TARGET_SECONDS, AdaptiveBatchSizer, iter_adaptive_batches
+from compressed_files import open_text_input
+from dashboard_aggregates import AGGREGATES_SQL_FILE, COUNTED_UPSERT_FUNCTION, COUNTED_UPSERT_PARAM, REFRESH_FUNCTION
+from import_journal import ImportJournal, file_fingerprint, merge_ranges
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+from lead_schema import lead_row_mapper
+from lead_state import DEFAULT_STATE_PATH, LeadState
+from quarantine import DEFAULT_QUARANTINE_PATH, QuarantineFile
+from leads_csv import encode_json_batch, iter_column_batches
+from sql_values import InsertValuesTokenizer, SQLValuesError
+from supabase_ingest import call_rpc, ingest_batches, upsert_target_available
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -21,189 +31,231 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_KEY:
     print("❌ Erro: Variáveis VITE_SUPABASE_URL e SUPABASE_SERVICE_ROLE_KEY devem estar definidas no .env")
     exit(1)
 
-def execute_sql_batch(sql_commands):
-    """Executa um lote de comandos SQL via API do Supabase"""
-    headers = {
-        'apikey': SUPABASE_SERVICE_KEY,
-        'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-        'Content-Type': 'application/json'
-    }
+def warn_manual_command(sql):
+    """Avisa sobre comandos que não podem ser executados pela API REST"""
+    if 'ALTER TABLE' in sql.upper():
+        # Comandos ALTER TABLE precisam ser executados via SQL direto
+        print(f"⚠️  Comando ALTER TABLE deve ser executado manualmente: {sql[:50]}...")
+
+def iter_file_statements(f, metrics=NULL_METRICS):
+    """Valores de cada INSERT na ordem de LEAD_COLUMNS (listas, ou Lead se as colunas vierem em outra ordem)"""
+    tokenizer = InsertValuesTokenizer(f, on_other=warn_manual_command, metrics=metrics, records=False)
+    for table, columns, rows in tokenizer:
+        try:
+            to_lead = lead_row_mapper(columns)
+        except ValueError as e:
+            raise SQLValuesError(f"INSERT em {table}: {e}") from None
+        yield rows if to_lead is None else [to_lead(values) for values in rows]
+
+def iter_file_rows(file_path, metrics=NULL_METRICS):
+    """Lê o arquivo SQL (texto, .gz ou .zst) em blocos e gera os valores dos registros de todos os INSERTs"""
+    with open_text_input(file_path) as f:
+        # Os registros de cada INSERT são lidos de uma vez para medir o 'parse' por comando
+        for rows in metrics.timed(iter_file_statements(f, metrics), 'parse', rows=len):
+            yield from rows
+
+def iter_csv_rows(csv_path, metrics=NULL_METRICS):
+    """Lê o CSV original (texto, .gz ou .zst) e gera os registros Lead normalizados, sem o SQL intermediário"""
+    with open_text_input(csv_path) as f:
+        for batch in iter_column_batches(f, metrics=metrics):
+            yield from batch.records()
+
+def encode_timed(encode, rows, meta, metrics):
+    """Serializa um lote medindo a etapa 'serialize'"""
+    with metrics.stage('serialize') as stage:
+        batch = encode(rows, meta=meta)
+        stage.add(len(batch), len(batch.body))
+    return batch
+
+def iter_numbered_json_batches(numbered_rows, sizer, encode, metrics=NULL_METRICS):
+    """Agrupa (número, registro) em lotes JSON do tamanho atual do controlador; meta = números dos registros"""
+    for batch in iter_adaptive_batches(numbered_rows, sizer):
+        yield encode_timed(encode, [row for _, row in batch], [number for number, _ in batch], metrics)
+
+def iter_delta_json_batches(changes, sizer, metrics=NULL_METRICS):
+    """Agrupa os leads novos/alterados em lotes JSON; meta = pares (lead_id, hash) do lote"""
+    # Aqui o tempo próprio da montagem é o hash de cada lead comparado com o estado
+    for batch in metrics.timed(iter_adaptive_batches(changes, sizer), 'diff', rows=len):
+        yield encode_timed(encode_json_batch, [values for values, _ in batch], [entry for _, entry in batch], metrics)
+
+def committed_positions(batch, success):
+    """
+    Posições do lote gravadas no banco (sem as em quarentena)
+
+    Um lote com falha pode ter sido gravado em parte: na divisão de um lote com registro
+    ruim, uma metade que falha por rede ou timeout não desfaz as já gravadas (batch.failed).
+    """
+    if not success and not batch.failed:
+        return []
+    skipped = set(batch.rejected) | set(batch.failed)
+    return [position for position in range(len(batch)) if position not in skipped]
+
+def record_journal_batch(journal, batch, success):
+    """
+    Registra no diário os números dos registros resolvidos de um lote (meta de iter_numbered_json_batches)
+
+    Os registros em quarentena contam como resolvidos, como num lote gravado; de um lote
+    gravado em parte, só as posições de batch.failed ficam para o --resume.
+    """
+    numbers = batch.meta
+    if success:
+        journal.record_rows(numbers[0], numbers[-1])
+    elif batch.failed:
+        failed = set(batch.failed)
+        settled = [[number, number] for position, number in enumerate(numbers) if position not in failed]
+        for first, last in merge_ranges(settled):
+            journal.record_rows(first, last)
+
+def print_batch_result(batch_number, rows, success, message):
+    """Mostra o resultado de um lote enviado"""
+    if success and getattr(rows, 'rejected', ()):
+        print(f"⚠️  Lote {batch_number}: {message}")
+    elif success:
+        print(f"✅ Lote {batch_number}: inseridos {len(rows)} registros")
+    else:
+        print(f"❌ Erro no lote {batch_number}: {message}")
+
+def refresh_dashboard_counts_rest(metrics=NULL_METRICS):
+    """Recalcula as contagens do dashboard pela função RPC de dashboard-aggregates.sql"""
+    with metrics.stage('aggregates'):
+        success, result = call_rpc(SUPABASE_URL, SUPABASE_SERVICE_KEY, REFRESH_FUNCTION)
+
+    if success:
+        print(f"📊 Contagens do dashboard recalculadas ({result} buckets)")
+    else:
+        print(f"⚠️  Não foi possível recalcular as contagens do dashboard: {result}")
+        print(f"💡 Execute {AGGREGATES_SQL_FILE} uma vez no SQL Editor para criá-las")
+
+def counted_upsert_available():
+    """Confere (com um lote vazio) se upsert_leads_counted de dashboard-aggregates.sql está instalada"""
+    success, _ = call_rpc(SUPABASE_URL, SUPABASE_SERVICE_KEY, COUNTED_UPSERT_FUNCTION, {COUNTED_UPSERT_PARAM: []})
+    return success
+
+def main():
+    parser = argparse.ArgumentParser(description='Importa insert-leads-data.sql via API REST do Supabase')
+    parser.add_argument('--sql-file', default='/Users/marcosdaniels/Downloads/project/insert-leads-data.sql',
+                        help='Arquivo SQL gerado por csv-to-sql.py')
+    parser.add_argument('--csv', help='Importar direto do CSV, sem gerar o SQL intermediário')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Registros no primeiro lote; os seguintes são ajustados pela latência')
+    parser.add_argument('--max-batch-size', type=int, default=5000, help='Maior lote que o ajuste pode usar')
+    parser.add_argument('--target-latency', type=float, default=DEFAULT_TARGET_SECONDS,
+                        help='Latência desejada por lote, em segundos')
+    parser.add_argument('--fixed-batch-size', action='store_true', help='Não ajustar: usar sempre --batch-size')
+    parser.add_argument('--max-in-flight', type=int, default=4, help='Lotes enviados simultaneamente')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Com --csv: envia só leads novos/alterados como upsert por lead_id')
+    parser.add_argument('--state-file', default=DEFAULT_STATE_PATH, help='Arquivo de estado do modo --incremental')
+    parser.add_argument('--resume', action='store_true', help='Retomar do primeiro lote não confirmado no diário')
+    parser.add_argument('--journal', help='Diário de checkpoints (padrão: <arquivo de origem>.journal)')
+    parser.add_argument('--quarantine', default=DEFAULT_QUARANTINE_PATH,
+                        help='Arquivo JSON Lines dos registros rejeitados pelo banco, isolados dividindo o lote')
+    parser.add_argument('--no-gzip', action='store_true',
+                        help='Enviar os lotes sem compressão (por padrão vão com Content-Encoding: gzip '
+                             'enquanto o servidor aceitar)')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
     
-    # Combinar comandos em uma única query
-    combined_sql = '\n'.join(sql_commands)
+    if args.incremental and not args.csv:
+        print("❌ O modo --incremental exige --csv")
+        return
     
-    # Usar a API de query SQL do Supabase
-    url = f"{SUPABASE_URL}/rest/v1/rpc/exec_sql"
+    if args.incremental and args.resume:
+        print("❌ O modo --incremental já retoma sozinho pelo arquivo de estado; não use --resume")
+        return
     
-    # Se a função exec_sql não existir, usar query direta
-    url = f"{SUPABASE_URL}/rest/v1/"
+    source_file = args.csv or args.sql_file
     
-    # Tentar executar via PostgREST
-    try:
-        # Para comandos SQL diretos, usar a API de query
-        response = requests.post(
-            f"{SUPABASE_URL}/rest/v1/rpc/query",
-            headers=headers,
-            json={"query": combined_sql}
-        )
+    if not os.path.exists(source_file):
+        print(f"❌ Arquivo não encontrado: {source_file}")
+        return
+    
+    state = None
+    journal = None
+    counted_rpc = None
+    on_result = print_batch_result
+    quarantine = QuarantineFile(args.quarantine)
+    metrics = ImportMetrics('import-batch-api', args.metrics)
+    
+    if args.fixed_batch_size:
+        # Mínimo = máximo: o tamanho nunca muda
+        sizer = AdaptiveBatchSizer(args.batch_size, minimum=args.batch_size, maximum=args.batch_size, log=None)
+    else:
+        sizer = AdaptiveBatchSizer(args.batch_size, minimum=min(10, args.batch_size),
+                                   maximum=args.max_batch_size, target_seconds=args.target_latency)
+    
+    if args.incremental:
+        state = LeadState(args.state_file)
+        batches = iter_delta_json_batches(state.iter_changes(iter_csv_rows(source_file, metrics)), sizer, metrics)
+        print(f"🗂️  Estado: {args.state_file} ({len(state):,} leads já carregados)")
         
-        if response.status_code == 404:
-            # Se RPC não funcionar, tentar método alternativo
-            print("⚠️  Método RPC não disponível, usando inserção direta...")
-            return execute_direct_insert(sql_commands)
-            
-        return response.status_code == 200
+        # Cada lote vira upsert + delta das contagens do dashboard numa única transação no banco
+        if counted_upsert_available():
+            counted_rpc = COUNTED_UPSERT_FUNCTION
+            print("📊 Contagens do dashboard atualizadas por delta a cada lote")
+        elif not upsert_target_available(SUPABASE_URL, SUPABASE_SERVICE_KEY, 'lead_id'):
+            # Sem a função, o upsert vai por ?on_conflict=lead_id, que exige índice único em lead_id
+            print(f"❌ public.leads não tem índice único em lead_id (tabela particionada de leads-partitioned.sql?): "
+                  f"todo lote do upsert falharia com 42P10")
+            print(f"💡 Execute {AGGREGATES_SQL_FILE} uma vez no SQL Editor: {COUNTED_UPSERT_FUNCTION} faz o upsert "
+                  f"na tabela particionada; ou use csv-to-sql.py --copy --incremental")
+            quarantine.close()
+            metrics.close()
+            return
+        else:
+            print(f"⚠️  {COUNTED_UPSERT_FUNCTION} não encontrada: as contagens do dashboard não serão atualizadas")
+            print(f"💡 Execute {AGGREGATES_SQL_FILE} uma vez no SQL Editor para criá-las")
         
-    except Exception as e:
-        print(f"❌ Erro na execução: {e}")
-        return False
-
-def execute_direct_insert(sql_commands):
-    """Executa inserções diretas via API REST"""
-    headers = {
-        'apikey': SUPABASE_SERVICE_KEY,
-        'Authorization': f'Bearer {SUPABASE_SERVICE_KEY}',
-        'Content-Type': 'application/json',
-        'Prefer': 'return=minimal'
-    }
-    
-    success_count = 0
-    
-    for sql in sql_commands:
-        if 'INSERT INTO' in sql.upper():
-            # Extrair dados do INSERT para formato JSON
-            try:
-                # Regex para extrair valores do INSERT
-                values_match = re.search(r'VALUES\s*\((.*?)\);', sql, re.DOTALL | re.IGNORECASE)
-                if values_match:
-                    # Processar cada linha de valores
-                    values_text = values_match.group(1)
-                    # Dividir por ),( para separar registros
-                    records = re.split(r'\),\s*\(', values_text)
-                    
-                    batch_data = []
-                    for record in records:
-                        record = record.strip('()')
-                        values = [v.strip().strip("'") for v in record.split(',')]
-                        
-                        # Mapear para estrutura JSON
-                        lead_data = {
-                            'lead_id': values[0].strip("'") if values[0] != 'NULL' else None,
-                            'usuario_responsavel': values[1].strip("'") if values[1] != 'NULL' else None,
-                            'contato_principal': values[2].strip("'") if values[2] != 'NULL' else None,
-                            'data_criada': values[3].strip("'") if values[3] != 'NULL' else None,
-                            'fonte_lead': values[4].strip("'") if values[4] != 'NULL' else None,
-                            'etapa_funil': values[5].strip("'") if values[5] != 'NULL' else None,
-                            'estado_onde_mora': values[6].strip("'") if values[6] != 'NULL' else None,
-                            'tipo_agendamento': values[7].strip("'") if values[7] != 'NULL' else None,
-                            'respostas_ia': values[8].strip("'") if values[8] != 'NULL' else None,
-                            'email_comercial': values[9].strip("'") if values[9] != 'NULL' else None,
-                            'telefone_comercial': values[10].strip("'") if values[10] != 'NULL' else None,
-                            'estado_contato': values[11].strip("'") if values[11] != 'NULL' else None,
-                            'permissao_trabalho': values[12].strip("'") if values[12] != 'NULL' else None,
-                            'data_entrada_agendamento': values[13].strip("'") if values[13] != 'NULL' else None,
-                            'data_hora_agendamento_bposs': values[14].strip("'") if values[14] != 'NULL' else None
-                        }
-                        batch_data.append(lead_data)
-                    
-                    # Inserir lote via API
-                    if batch_data:
-                        response = requests.post(
-                            f"{SUPABASE_URL}/rest/v1/leads",
-                            headers=headers,
-                            json=batch_data
-                        )
-                        
-                        if response.status_code in [200, 201]:
-                            success_count += len(batch_data)
-                            print(f"✅ Inseridos {len(batch_data)} registros")
-                        else:
-                            print(f"❌ Erro ao inserir lote: {response.status_code} - {response.text}")
-                            
-            except Exception as e:
-                print(f"❌ Erro ao processar INSERT: {e}")
-                continue
+        def mark_committed(batch_number, batch, success, message):
+            print_batch_result(batch_number, batch, success, message)
+            positions = committed_positions(batch, success)
+            if positions:
+                with metrics.stage('checkpoint', batch=batch_number, rows=len(positions)):
+                    # Os leads em quarentena (e os não gravados) continuam pendentes para a próxima execução
+                    state.mark([batch.meta[i] for i in positions])
         
-        elif 'ALTER TABLE' in sql.upper():
-            # Comandos ALTER TABLE precisam ser executados via SQL direto
-            print(f"⚠️  Comando ALTER TABLE deve ser executado manualmente: {sql[:50]}...")
-            
-    return success_count > 0
-
-def split_sql_file(file_path, batch_size=50):
-    """Divide o arquivo SQL em lotes menores"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # Separar por comandos SQL
-    commands = []
-    current_command = []
-    
-    lines = content.split('\n')
-    insert_count = 0
-    
-    for line in lines:
-        line = line.strip()
+        on_result = mark_committed
+    else:
+        # O diário guarda faixas de registros, então não depende do tamanho dos lotes
+        mode = 'csv' if args.csv else 'sql'
+        journal_path = args.journal or f"{source_file}.journal"
+        journal = ImportJournal(journal_path, file_fingerprint(source_file, mode), resume=args.resume)
         
-        if not line or line.startswith('--'):
-            continue
-            
-        current_command.append(line)
+        rows = iter_csv_rows(source_file, metrics) if args.csv else iter_file_rows(source_file, metrics)
+        batches = iter_numbered_json_batches(journal.pending_rows(rows), sizer, encode_json_batch, metrics)
         
-        # Detectar fim de comando
-        if line.endswith(';'):
-            command = '\n'.join(current_command)
-            
-            if 'INSERT INTO' in command.upper():
-                # Contar registros no INSERT
-                values_count = command.upper().count('VALUES')
-                if values_count > 0:
-                    commands.append(command)
-                    insert_count += 1
-                    
-                    # Criar lote quando atingir o tamanho
-                    if insert_count >= batch_size:
-                        yield commands
-                        commands = []
-                        insert_count = 0
-            else:
-                # Comandos não-INSERT (ALTER, SELECT, etc.)
-                commands.append(command)
-            
-            current_command = []
-    
-    # Retornar último lote se houver
-    if commands:
-        yield commands
-
-def main():
-    sql_file = '/Users/marcosdaniels/Downloads/project/insert-leads-data.sql'
-    
-    if not os.path.exists(sql_file):
-        print(f"❌ Arquivo não encontrado: {sql_file}")
-        return
+        if journal.resumed:
+            print(f"⏩ Retomando: {journal.committed_rows:,} registros já confirmados em {journal_path}")
+        
+        def record_checkpoint(batch_number, batch, success, message):
+            print_batch_result(batch_number, batch, success, message)
+            if success or batch.failed:
+                with metrics.stage('checkpoint', batch=batch_number, rows=len(batch)):
+                    record_journal_batch(journal, batch, success)
+        
+        on_result = record_checkpoint
     
     print("🚀 Iniciando importação em lotes...")
-    print(f"📁 Arquivo: {sql_file}")
+    print(f"📁 Arquivo: {source_file}")
+    print(f"🔀 Lotes simultâneos: {args.max_in_flight}")
     
-    batch_count = 0
-    total_success = 0
+    stats = None
     
     try:
-        for batch_commands in split_sql_file(sql_file, batch_size=20):
-            batch_count += 1
-            print(f"\n📦 Processando lote {batch_count} ({len(batch_commands)} comandos)...")
-            
-            success = execute_sql_batch(batch_commands)
-            
-            if success:
-                total_success += 1
-                print(f"✅ Lote {batch_count} executado com sucesso")
-            else:
-                print(f"❌ Erro no lote {batch_count}")
-            
-            # Pausa entre lotes para evitar rate limiting
-            time.sleep(1)
+        # Uma única sessão HTTP para o arquivo inteiro; 429/503 fazem o cliente recuar sozinho
+        stats = ingest_batches(
+            batches,
+            SUPABASE_URL, SUPABASE_SERVICE_KEY,
+            on_result=on_result, max_in_flight=args.max_in_flight,
+            upsert_on='lead_id' if args.incremental else None,
+            batch_sizer=None if args.fixed_batch_size else sizer,
+            metrics=metrics, rpc=counted_rpc, rpc_param=COUNTED_UPSERT_PARAM, quarantine=quarantine,
+            gzip_requests=not args.no_gzip
+        )
+        
+        # Carga completa: recálculo uma única vez no fim, refletindo tudo o que foi confirmado
+        if stats.rows and state is None:
+            refresh_dashboard_counts_rest(metrics)
     
     except KeyboardInterrupt:
         print("\n⚠️  Importação interrompida pelo usuário")
@@ -211,10 +263,47 @@ def main():
     except Exception as e:
         print(f"\n❌ Erro durante importação: {e}")
     
+    finally:
+        # Só os lotes confirmados foram marcados, então salvar é seguro mesmo após falha
+        if state is not None:
+            state.save()
+        if journal is not None:
+            journal.close()
+        quarantine.close()
+        metrics.close()
+    
     print(f"\n📊 Resumo:")
-    print(f"   • Lotes processados: {batch_count}")
-    print(f"   • Lotes com sucesso: {total_success}")
-    print(f"   • Taxa de sucesso: {(total_success/batch_count*100):.1f}%" if batch_count > 0 else "   • Nenhum lote processado")
+    if stats and stats.batches > 0:
+        total_success = stats.batches - stats.failed_batches
+        print(f"   • Lotes processados: {stats.batches}")
+        print(f"   • Lotes com sucesso: {total_success}")
+        print(f"   • Taxa de sucesso: {(total_success/stats.batches*100):.1f}%")
+        print(f"   • Registros inseridos: {stats.rows:,}")
+        if stats.quarantined_rows:
+            print(f"   • Registros rejeitados pelo banco: {stats.quarantined_rows:,} (em {quarantine.path})")
+        if stats.body_bytes:
+            print(f"   • Dados enviados: {stats.sent_bytes / 1024 / 1024:,.2f} MB "
+                  f"({stats.body_bytes / 1024 / 1024:,.2f} MB de JSON)")
+        if stats.resent_bytes:
+            print(f"   • Reenviados em novas tentativas: {stats.resent_bytes / 1024 / 1024:,.2f} MB")
+        print(f"   • Novas tentativas (429/503/rede): {stats.retries}")
+        print(f"   • Tempo total: {stats.elapsed:.2f}s")
+        print(f"   • Vazão sustentada: {stats.rows_per_second:,.0f} registros/s")
+        print(f"   • Tamanho final do lote: {sizer.size} registros ({sizer.decisions} ajustes)")
+    else:
+        print("   • Nenhum lote processado")
+    
+    if journal is not None and (stats is None or stats.failed_batches):
+        print(f"   • Para reenviar só os lotes pendentes: --resume (diário: {journal.path})")
+    
+    if state is not None:
+        delta = state.stats
+        print(f"   • Leads novos: {delta.new:,} | alterados: {delta.changed:,} | sem mudança: {delta.unchanged:,}")
+        if delta.duplicates or delta.missing_id:
+            print(f"   • Ignorados: {delta.duplicates:,} lead_id repetidos, {delta.missing_id:,} sem lead_id")
+        missing = state.missing_from_source()
+        if missing:
+            print(f"   • {missing:,} leads do estado não estão mais no CSV (não são removidos do banco)")
     
     print("\n🎉 Processo concluído!")
     print("\n💡 Próximos passos:")
@@ -223,4 +312,4 @@ def main():
     print("   3. Teste o dashboard da aplicação")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
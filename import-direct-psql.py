@@ -5,16 +5,45 @@ Script para importar dados diretamente via psql
 Usa conexão direta com PostgreSQL do Supabase
 """
 
+import argparse
 import os
+import re
 import subprocess
+import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlsplit, urlunsplit
 from dotenv import load_dotenv
 
+from compressed_files import (DECOMPRESS_COMMANDS, copy_decompressed, detect_compression, open_text_input,
+                              strip_compression_suffix)
+from import_journal import ImportJournal, merge_ranges
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+from quarantine import DEFAULT_QUARANTINE_PATH, UNIQUE_VIOLATION, QuarantineFile, is_row_error, isolate_row_errors
+from sql_values import InsertValuesTokenizer, SQLValuesError
+
 # Carregar variáveis do .env
 load_dotenv()
 
+# Os lotes podem estar compactados (csv-to-sql.py/split-sql-file.py --compress): .sql.gz ou .sql.zst
+INSERT_BATCH_PATTERN = re.compile(r'^(\d+)_insert_batch_.*\.sql(\.gz|\.zst)?$')
+CLEANUP_PATTERN = re.compile(r'^\d+_cleanup\.sql(\.gz|\.zst)?$')
+SETUP_PATTERN = re.compile(r'^00_setup\.sql(\.gz|\.zst)?$')
+BATCH_RANGE_PATTERN = re.compile(r'_(\d+)_to_(\d+)\.sql$')
+JOURNAL_FILENAME = 'import-journal.jsonl'
+# Com VERBOSITY=verbose o psql mostra o SQLSTATE: "ERROR:  22008: date/time field value out of range"
+SQLSTATE_PATTERN = re.compile(r'ERROR:\s+([0-9A-Z]{5}):')
+# Linhas que encerram um registro de VALUES no formato de csv-to-sql.py
+RECORD_END_LINES = ('),', ');', ')')
+# Senha numa string de conexão no formato chave=valor ("host=... password=segredo") ou na query de uma URL
+PASSWORD_PARAM_PATTERN = re.compile(r"(\bpassword\s*=\s*)('(?:[^'\\]|\\.)*'|[^\s&]+)")
+
 def get_db_connection_string():
     """Monta string de conexão do banco"""
+    database_url = os.getenv('DATABASE_URL')
+    if database_url:
+        return database_url
+    
     supabase_url = os.getenv('VITE_SUPABASE_URL')
     
     if not supabase_url:
@@ -29,21 +58,89 @@ def get_db_connection_string():
     
     return connection_string
 
-def execute_sql_file_psql(sql_file, connection_string):
-    """Executa arquivo SQL via psql"""
+def mask_password(connection_string):
+    """String de conexão para mostrar na tela ou em logs de CI, com a senha trocada por ***"""
+    parts = urlsplit(connection_string)
+    if parts.scheme not in ('postgres', 'postgresql'):
+        return PASSWORD_PARAM_PATTERN.sub(r'\1***', connection_string)
+    
+    netloc = parts.netloc
+    if parts.password is not None:
+        userinfo, host = netloc.rsplit('@', 1)
+        netloc = f"{userinfo.split(':', 1)[0]}:***@{host}"
+    return urlunsplit(parts._replace(netloc=netloc, query=PASSWORD_PARAM_PATTERN.sub(r'\1***', parts.query)))
+
+def run_psql(connection_string, sql_file='-', sql_text=None, single_transaction=False):
+    """
+    Executa um arquivo SQL (ou, com sql_file='-', o texto sql_text) via psql; retorna o CompletedProcess
+
+    Arquivos compactados (gzip/zstd) são descompactados aos poucos direto no stdin do psql.
+    """
+    compression = detect_compression(sql_file) if sql_file != '-' else None
+    cmd = [
+        'psql',
+        connection_string,
+        '-f', '-' if compression else sql_file,
+        '-v', 'ON_ERROR_STOP=1',
+        '-v', 'VERBOSITY=verbose'
+    ]
+    
+    # Em lotes de inserção, tudo ou nada: uma falha não deixa INSERTs parciais
+    # e o arquivo pode ser re-executado com segurança
+    if single_transaction:
+        cmd.append('--single-transaction')
+    
+    if compression:
+        return run_psql_piped(cmd, sql_file)
+    if sql_text is None:
+        return subprocess.run(cmd, capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    return subprocess.run(cmd, capture_output=True, text=True, input=sql_text)
+
+def run_psql_piped(cmd, sql_file):
+    """
+    Executa o psql enviando no stdin o conteúdo descompactado de sql_file
+
+    A saída vai para arquivos temporários (não para pipes): assim o envio não trava
+    esperando alguém ler stdout/stderr, e só um bloco descompactado fica em memória.
+    """
+    with tempfile.TemporaryFile() as stdout, tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=stdout, stderr=stderr)
+        try:
+            copy_decompressed(sql_file, process.stdin)
+        except BrokenPipeError:
+            # O psql parou no primeiro erro (ON_ERROR_STOP); o motivo está no stderr
+            pass
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = process.wait()
+        
+        stdout.seek(0)
+        stderr.seek(0)
+        return subprocess.CompletedProcess(cmd, returncode, stdout.read().decode('utf-8', 'replace'),
+                                           stderr.read().decode('utf-8', 'replace'))
+
+def psql_sqlstate(stderr):
+    """SQLSTATE do primeiro erro na saída do psql (None se a falha não veio do servidor)"""
+    match = SQLSTATE_PATTERN.search(stderr or '')
+    return match.group(1) if match else None
+
+def execute_sql_file_psql(sql_file, connection_string, single_transaction=False, errors=None, sql_text=None):
+    """
+    Executa arquivo SQL via psql (errors: lista que recebe a saída de erro de uma falha)
+
+    Com sql_text, executa esse texto no lugar do conteúdo do arquivo (ex.: só os registros
+    ainda pendentes de um lote parcial); sql_file fica só como nome nas mensagens.
+    """
     try:
         print(f"📄 Executando: {os.path.basename(sql_file)}")
         
-        # Comando psql
-        cmd = [
-            'psql',
-            connection_string,
-            '-f', sql_file,
-            '-v', 'ON_ERROR_STOP=1'
-        ]
-        
-        # Executar comando
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        if sql_text is None:
+            result = run_psql(connection_string, sql_file, single_transaction=single_transaction)
+        else:
+            result = run_psql(connection_string, sql_text=sql_text, single_transaction=single_transaction)
         
         if result.returncode == 0:
             print(f"✅ {os.path.basename(sql_file)} executado com sucesso")
@@ -59,6 +156,8 @@ def execute_sql_file_psql(sql_file, connection_string):
             print(f"❌ Erro ao executar {os.path.basename(sql_file)}")
             if result.stderr:
                 print(f"🔍 Erro: {result.stderr.strip()}")
+            if errors is not None:
+                errors.append(result.stderr.strip())
             return False
             
     except FileNotFoundError:
@@ -69,7 +168,324 @@ def execute_sql_file_psql(sql_file, connection_string):
         print(f"❌ Erro: {e}")
         return False
 
+def discover_sql_batches(sql_batches_dir):
+    """Localiza setup, lotes de inserção (em ordem numérica) e cleanup no diretório"""
+    setup_file = None
+    insert_files = []
+    cleanup_file = None
+    
+    for name in os.listdir(sql_batches_dir):
+        path = os.path.join(sql_batches_dir, name)
+        if SETUP_PATTERN.match(name):
+            setup_file = path
+        elif INSERT_BATCH_PATTERN.match(name):
+            insert_files.append((int(INSERT_BATCH_PATTERN.match(name).group(1)), path))
+        elif CLEANUP_PATTERN.match(name):
+            cleanup_file = path
+    
+    insert_files = [path for _, path in sorted(insert_files)]
+    return setup_file, insert_files, cleanup_file
+
+def count_rows_in_batch(sql_file):
+    """Estima o número de registros de um lote (cada registro começa com uma linha '(')"""
+    with open_text_input(sql_file) as f:
+        return sum(1 for line in f if line.strip() == '(')
+
+def split_insert_records(sql_text):
+    """
+    Separa os registros dos INSERTs de um lote no formato de csv-to-sql.py: lista de (cabeçalho, registro)
+
+    Um registro começa numa linha '(' e termina numa linha '),' ou ');' fora de
+    strings: um número ímpar de aspas simples acumuladas significa dentro de uma
+    string ('' escapado não muda a paridade), como nas respostas_ia com várias linhas.
+    """
+    records = []
+    header = None
+    header_lines = []
+    current = None
+    quotes = 0
+    
+    for line in sql_text.splitlines(keepends=True):
+        stripped = line.strip()
+        if current is not None:
+            current.append(line)
+            quotes += line.count("'")
+            if quotes % 2 == 0 and stripped in RECORD_END_LINES:
+                record = ''.join(current).rstrip()
+                records.append((header, record.rstrip(',;')))
+                current = None
+                if stripped.endswith(';'):
+                    header = None
+        elif header is None:
+            if header_lines or stripped.upper().startswith('INSERT'):
+                header_lines.append(line)
+                if stripped.upper().endswith('VALUES'):
+                    header = ''.join(header_lines)
+                    header_lines = []
+        elif stripped == '(':
+            current = [line]
+            quotes = 0
+    
+    return records
+
+def build_insert_sql(records):
+    """Monta os INSERTs de uma lista de (cabeçalho, registro), agrupando os registros seguidos do mesmo cabeçalho"""
+    statements = []
+    for header, record in records:
+        if statements and statements[-1][0] == header:
+            statements[-1][1].append(record)
+        else:
+            statements.append((header, [record]))
+    return ''.join(header + ',\n'.join(values) + ';\n' for header, values in statements)
+
+def quarantine_record(header, record):
+    """Registro como dicionário coluna -> valor; o texto SQL original se não puder ser lido"""
+    try:
+        for _, _, rows in InsertValuesTokenizer(header + record + ';'):
+            return rows[0]
+    except SQLValuesError:
+        pass
+    return record
+
+def read_batch_records(sql_file, settled=None):
+    """
+    Registros de um lote (ver split_insert_records) e as posições (a partir de 0) ainda pendentes
+
+    settled: faixas [primeiro, último] de posições a partir de 1 já resolvidas numa execução
+    anterior (ImportJournal.settled_positions); esses registros ficam de fora.
+    """
+    with open_text_input(sql_file) as f:
+        records = split_insert_records(f.read())
+    pending = [position for position in range(len(records))
+               if not any(first <= position + 1 <= last for first, last in settled or ())]
+    return records, pending
+
+def isolate_batch_row_errors(sql_file, connection_string, error, quarantine, metrics=NULL_METRICS, records=None,
+                             positions=None):
+    """
+    Divide ao meio os registros de um lote rejeitado por erro de registro até isolar os ruins
+
+    Cada metade é executada numa transação própria; as aceitas ficam gravadas e
+    os registros rejeitados vão para a quarentena com o erro do servidor.
+    records/positions: registros do lote e as posições enviadas (padrão: todos).
+    Retorna quarantine.BisectResult, com as posições nas metades que falharam por outro motivo.
+    """
+    name = os.path.basename(sql_file)
+    if records is None:
+        records, positions = read_batch_records(sql_file)
+    
+    def load(subset):
+        with metrics.stage('bisect', batch=name, rows=len(subset)):
+            result = run_psql(connection_string, sql_text=build_insert_sql([records[i] for i in subset]),
+                              single_transaction=True)
+        if result.returncode == 0:
+            return True, None, False
+        stderr = result.stderr.strip()
+        sqlstate = psql_sqlstate(stderr)
+        return False, stderr, sqlstate if is_row_error(sqlstate) else None
+    
+    print(f"🔪 {name}: isolando os registros rejeitados entre {len(positions):,}...")
+    result = isolate_row_errors(positions, load, error)
+    for position, record_error in result.rejected:
+        header, record = records[position]
+        quarantine.add(name, quarantine_record(header, record), record_error)
+    
+    print(f"🧪 {name}: {result.committed:,} registros gravados, {len(result.rejected)} em quarentena "
+          f"({result.loads} execuções extras)")
+    return result
+
+def run_batch_with_retry(sql_file, connection_string, retries, quarantine=None, metrics=NULL_METRICS, settled=None):
+    """
+    Executa um lote com novas tentativas e mede o tempo de cada execução
+
+    Em metrics, a execução bem-sucedida (envio, INSERTs e COMMIT do psql) entra como
+    'commit'; tentativas com falha entram como 'failed' e as esperas entre elas como 'backoff'.
+    Se o banco rejeitar um registro (SQLSTATE 22xxx/23xxx) e houver quarantine, o lote não
+    é repetido: é dividido até isolar os registros ruins (etapa 'bisect'). Um lead_id já
+    gravado (23505) também não é repetido nem dividido: o lote falha e fica fora do diário.
+
+    Se a divisão gravar algumas metades e outra falhar por outro motivo (rede, timeout), o
+    resultado traz em 'settled' as posições já resolvidas, para o diário; settled (de um
+    --resume) faz o lote enviar só os registros fora dessas posições.
+    """
+    name = os.path.basename(sql_file)
+    size = os.path.getsize(sql_file)
+    start = time.perf_counter()
+    rows = 0
+    quarantined = 0
+    partial = None
+    records, pending, sql_text = None, None, None
+    
+    if settled:
+        records, pending = read_batch_records(sql_file, settled)
+        sql_text = build_insert_sql([records[i] for i in pending])
+        print(f"⏩ {name}: {len(records) - len(pending):,} registros já resolvidos, enviando {len(pending):,}")
+    
+    for attempt in range(1, retries + 2):
+        attempt_start = time.perf_counter()
+        errors = []
+        success = execute_sql_file_psql(sql_file, connection_string, single_transaction=True, errors=errors,
+                                        sql_text=sql_text)
+        attempt_time = time.perf_counter() - attempt_start
+        
+        if success:
+            print(f"⏱️  {name}: {attempt_time:.2f}s (tentativa {attempt})")
+            rows = count_rows_in_batch(sql_file) if pending is None else len(pending)
+            metrics.record('commit', attempt_time, rows, size, batch=name)
+            break
+        
+        metrics.record('failed', attempt_time, batch=name)
+        sqlstate = psql_sqlstate(errors[0]) if errors else None
+        
+        if sqlstate == UNIQUE_VIOLATION:
+            # lead_id já no banco: o lote (ou parte dele) já foi importado; repetir dá o mesmo erro
+            print(f"⚠️  {name}: lead_id já existe no banco (lote já importado?); o lote não será repetido")
+            break
+        
+        # Repetir não resolve um registro inválido: só ele precisa ficar de fora
+        if quarantine is not None and is_row_error(sqlstate):
+            if records is None:
+                records, pending = read_batch_records(sql_file)
+            result = isolate_batch_row_errors(sql_file, connection_string, errors[0], quarantine, metrics,
+                                              records, pending)
+            rows = result.committed
+            quarantined = len(result.rejected)
+            success = not result.failed
+            if not success:
+                # As metades gravadas já estão no banco: o --resume não pode enviá-las de novo
+                unsent = {position for positions, _ in result.failed for position in positions}
+                partial = merge_ranges([[position + 1, position + 1] for position in pending
+                                        if position not in unsent])
+            break
+        
+        if attempt <= retries:
+            delay = 2 ** (attempt - 1)
+            print(f"🔁 {name}: falhou na tentativa {attempt}, nova tentativa em {delay}s...")
+            with metrics.stage('backoff', batch=name):
+                time.sleep(delay)
+    
+    return {
+        'file': sql_file,
+        'success': success,
+        'attempts': attempt,
+        'seconds': time.perf_counter() - start,
+        'bytes': size,
+        'rows': rows,
+        'quarantined': quarantined,
+        'settled': partial,
+    }
+
+def batches_fingerprint(sql_batches_dir, insert_files):
+    """
+    Identifica o conjunto de lotes para validar o diário no --resume
+
+    Usa só os nomes (que já trazem a faixa de registros), para que um lote com
+    falha possa ser corrigido e reenviado sem invalidar os já confirmados.
+    """
+    parts = [os.path.abspath(sql_batches_dir)]
+    parts.extend(os.path.basename(path) for path in insert_files)
+    return '|'.join(parts)
+
+def batch_row_range(sql_file):
+    """Faixa de registros pelo nome do arquivo (NN_insert_batch_A_to_B.sql), se disponível"""
+    match = BATCH_RANGE_PATTERN.search(strip_compression_suffix(os.path.basename(sql_file)))
+    return [int(match.group(1)), int(match.group(2))] if match else None
+
+def record_batch_result(journal, result, metrics=NULL_METRICS):
+    """Registra no diário um lote confirmado, ou as posições já resolvidas de um lote parcial"""
+    if journal is None:
+        return
+    name = os.path.basename(result['file'])
+    if result['success']:
+        with metrics.stage('checkpoint', batch=name):
+            journal.record(name, batch_row_range(result['file']))
+    elif result['settled']:
+        with metrics.stage('checkpoint', batch=name):
+            journal.record_partial(name, result['settled'])
+
+def run_insert_batches(insert_files, connection_string, workers, retries, journal=None, quarantine=None,
+                       metrics=NULL_METRICS):
+    """
+    Executa os lotes de inserção em paralelo, cada worker com sua própria conexão psql
+
+    Lotes parciais do diário (ver ImportJournal.record_partial) enviam só os registros pendentes.
+    Num Ctrl-C, os lotes na fila são cancelados, os em andamento terminam e todos os
+    concluídos vão para o diário antes de a interrupção seguir adiante.
+    """
+    results = []
+    recorded = set()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(run_batch_with_retry, path, connection_string, retries, quarantine, metrics,
+                            journal.settled_positions(os.path.basename(path)) if journal is not None else None): path
+            for path in insert_files
+        }
+        
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                results.append(result)
+                record_batch_result(journal, result, metrics)
+                recorded.add(future)
+                status = '✅' if result['success'] else '❌'
+                print(f"{status} [{done}/{len(insert_files)}] {os.path.basename(result['file'])} "
+                      f"({result['seconds']:.2f}s, {result['attempts']} tentativa(s))")
+        except KeyboardInterrupt:
+            # Os lotes em andamento ainda terminam (e gravam) no psql: o diário precisa saber deles,
+            # senão o --resume os enviaria de novo
+            print("\n⏳ Interrompido: aguardando os lotes em andamento...")
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in futures:
+                if future in recorded or future.cancelled() or future.exception() is not None:
+                    continue
+                record_batch_result(journal, future.result(), metrics)
+            raise
+    
+    return results
+
+def print_throughput_summary(results, elapsed):
+    """Mostra o resumo de tempo e vazão da importação"""
+    succeeded = [r for r in results if r['success']]
+    failed = [r for r in results if not r['success']]
+    # Lotes com falha contam os registros das metades gravadas antes da falha
+    total_rows = sum(r['rows'] for r in results)
+    total_bytes = sum(r['bytes'] for r in succeeded)
+    quarantined = sum(r['quarantined'] for r in results)
+    
+    print(f"\n📊 Resumo da Importação:")
+    print(f"   • Lotes importados: {len(succeeded)}/{len(results)}")
+    print(f"   • Registros importados (estimado): {total_rows:,}")
+    if quarantined:
+        print(f"   • Registros rejeitados pelo banco (em quarentena): {quarantined:,}")
+    print(f"   • Tempo total: {elapsed:.2f}s")
+    
+    if elapsed > 0:
+        print(f"   • Vazão: {total_rows / elapsed:,.0f} registros/s, "
+              f"{total_bytes / elapsed / 1024 / 1024:.2f} MB/s, "
+              f"{len(succeeded) / elapsed:.2f} lotes/s")
+    
+    if succeeded:
+        slowest = max(succeeded, key=lambda r: r['seconds'])
+        average = sum(r['seconds'] for r in succeeded) / len(succeeded)
+        print(f"   • Tempo médio por lote: {average:.2f}s")
+        print(f"   • Lote mais lento: {os.path.basename(slowest['file'])} ({slowest['seconds']:.2f}s)")
+    
+    return failed
+
 def main():
+    parser = argparse.ArgumentParser(description='Importa os lotes de sql_batches/ em paralelo via psql')
+    parser.add_argument('--dir', default='/Users/marcosdaniels/Downloads/project/sql_batches',
+                        help='Diretório com os arquivos gerados por split-sql-file.py')
+    parser.add_argument('--workers', type=int, default=4, help='Número de conexões simultâneas')
+    parser.add_argument('--retries', type=int, default=2, help='Novas tentativas por lote com falha')
+    parser.add_argument('--yes', action='store_true', help='Não pedir confirmação')
+    parser.add_argument('--resume', action='store_true', help='Pular os lotes já confirmados no diário de checkpoints')
+    parser.add_argument('--quarantine', default=DEFAULT_QUARANTINE_PATH,
+                        help='Arquivo JSON Lines dos registros rejeitados pelo banco, isolados dividindo o lote')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    
     print("🚀 Importação direta via psql")
     
     # Obter string de conexão
@@ -77,73 +493,87 @@ def main():
     if not connection_string:
         return
     
-    print(f"🔗 Conexão: {connection_string}")
-    print("\n⚠️  IMPORTANTE: Você precisará inserir a senha do banco quando solicitado.")
-    print("💡 A senha está no Supabase Dashboard > Settings > Database")
+    print(f"🔗 Conexão: {mask_password(connection_string)}")
+    if not os.getenv('PGPASSWORD'):
+        print("\n⚠️  IMPORTANTE: Com várias conexões simultâneas o psql não pode pedir a senha.")
+        print("💡 Defina PGPASSWORD ou use DATABASE_URL com a senha (Supabase Dashboard > Settings > Database)")
     
-    sql_batches_dir = '/Users/marcosdaniels/Downloads/project/sql_batches'
+    sql_batches_dir = args.dir
     
     if not os.path.exists(sql_batches_dir):
         print(f"❌ Diretório não encontrado: {sql_batches_dir}")
         return
     
-    # Lista de arquivos em ordem
-    sql_files = [
-        '00_setup.sql',
-        '01_insert_batch_1_to_55.sql', 
-        '02_cleanup.sql'
-    ]
+    setup_file, insert_files, cleanup_file = discover_sql_batches(sql_batches_dir)
     
     print(f"\n📁 Diretório: {sql_batches_dir}")
-    print(f"📦 Arquivos a processar: {len(sql_files)}")
+    print(f"📦 Lotes de inserção encontrados: {len(insert_files)}")
+    print(f"🔀 Conexões simultâneas: {args.workers}")
+    
+    if not insert_files:
+        print("❌ Nenhum arquivo NN_insert_batch_*.sql encontrado.")
+        return
     
     # Confirmar antes de continuar
-    response = input("\n❓ Continuar com a importação? (s/N): ")
-    if response.lower() not in ['s', 'sim', 'y', 'yes']:
-        print("❌ Importação cancelada.")
+    if not args.yes:
+        response = input("\n❓ Continuar com a importação? (s/N): ")
+        if response.lower() not in ['s', 'sim', 'y', 'yes']:
+            print("❌ Importação cancelada.")
+            return
+    
+    # Diário de checkpoints: cada lote confirmado é registrado assim que termina
+    journal_path = os.path.join(sql_batches_dir, JOURNAL_FILENAME)
+    journal = ImportJournal(journal_path, batches_fingerprint(sql_batches_dir, insert_files), resume=args.resume)
+    
+    if journal.resumed:
+        pending_files = [path for path in insert_files if not journal.is_committed(os.path.basename(path))]
+        print(f"\n⏩ Retomando: {len(insert_files) - len(pending_files)} lotes já confirmados em {journal_path}")
+        if journal.partial:
+            print(f"   {len(journal.partial)} lotes parciais: só os registros ainda não gravados serão enviados")
+        insert_files = pending_files
+    
+    start = time.perf_counter()
+    metrics = ImportMetrics('import-direct-psql', args.metrics)
+    quarantine = QuarantineFile(args.quarantine)
+    
+    # Barreira inicial: setup precisa terminar antes dos lotes
+    if setup_file:
+        print(f"\n🔧 Setup: {os.path.basename(setup_file)}")
+        with metrics.stage('setup'):
+            setup_ok = execute_sql_file_psql(setup_file, connection_string)
+        if not setup_ok:
+            print("❌ Setup falhou. Importação interrompida.")
+            journal.close()
+            metrics.close()
+            return
+    
+    print(f"\n📦 Executando {len(insert_files)} lotes...")
+    try:
+        results = run_insert_batches(insert_files, connection_string, args.workers, args.retries, journal, quarantine,
+                                     metrics)
+    except KeyboardInterrupt:
+        print("\n⚠️  Importação interrompida. Os lotes concluídos estão no diário; use --resume para continuar.")
+        metrics.close()
         return
+    finally:
+        journal.close()
+        quarantine.close()
     
-    success_count = 0
+    # Barreira final: cleanup só depois de todos os lotes (reabilita RLS mesmo com falhas)
+    if cleanup_file:
+        print(f"\n🧹 Cleanup: {os.path.basename(cleanup_file)}")
+        with metrics.stage('cleanup'):
+            cleanup_ok = execute_sql_file_psql(cleanup_file, connection_string)
+        if not cleanup_ok:
+            print("⚠️  Cleanup falhou. Execute-o manualmente para reabilitar o RLS.")
     
-    for i, sql_file in enumerate(sql_files, 1):
-        file_path = os.path.join(sql_batches_dir, sql_file)
-        
-        if not os.path.exists(file_path):
-            print(f"⚠️  Arquivo não encontrado: {sql_file}")
-            continue
-        
-        print(f"\n📦 [{i}/{len(sql_files)}] Processando: {sql_file}")
-        
-        # Mostrar tamanho do arquivo
-        file_size = os.path.getsize(file_path)
-        print(f"📏 Tamanho: {file_size:,} bytes")
-        
-        # Executar arquivo
-        success = execute_sql_file_psql(file_path, connection_string)
-        
-        if success:
-            success_count += 1
-            print(f"✅ [{i}/{len(sql_files)}] Concluído: {sql_file}")
-        else:
-            print(f"❌ [{i}/{len(sql_files)}] Falha: {sql_file}")
-            
-            # Perguntar se deve continuar
-            if i < len(sql_files):
-                response = input("❓ Continuar com próximo arquivo? (s/N): ")
-                if response.lower() not in ['s', 'sim', 'y', 'yes']:
-                    print("❌ Importação interrompida.")
-                    break
-        
-        # Pausa entre arquivos (exceto no último)
-        if i < len(sql_files):
-            print("⏳ Aguardando 3 segundos...")
-            time.sleep(3)
+    failed = print_throughput_summary(results, time.perf_counter() - start)
+    metrics.close()
     
-    print(f"\n📊 Resumo da Importação:")
-    print(f"   • Arquivos processados: {success_count}/{len(sql_files)}")
-    print(f"   • Taxa de sucesso: {(success_count/len(sql_files)*100):.1f}%")
+    if quarantine.count:
+        print(f"\n🧪 {quarantine.count} registros rejeitados pelo banco estão em {quarantine.path} (com o erro de cada um)")
     
-    if success_count == len(sql_files):
+    if not failed:
         print("\n🎉 Importação concluída com sucesso!")
         print("\n📋 Verificações recomendadas:")
         print("   1. SELECT COUNT(*) FROM leads;")
@@ -151,11 +581,17 @@ def main():
         print("   3. Teste o dashboard da aplicação")
     else:
         print("\n⚠️  Importação parcial. Verifique os erros acima.")
-        print("\n💡 Você pode tentar executar os arquivos manualmente:")
-        for sql_file in sql_files:
-            file_path = os.path.join(sql_batches_dir, sql_file)
-            if os.path.exists(file_path):
-                print(f"   psql '{connection_string}' -f '{file_path}'")
+        print("\n💡 Execute novamente com --resume para reenviar só os lotes pendentes,")
+        print("   ou execute os lotes com falha manualmente:")
+        # Com DATABASE_URL (que pode trazer a senha), o comando usa a variável em vez do texto da conexão
+        target = '"$DATABASE_URL"' if os.getenv('DATABASE_URL') else f"'{mask_password(connection_string)}'"
+        for result in sorted(failed, key=lambda r: r['file']):
+            compression = detect_compression(result['file'])
+            if compression:
+                print(f"   {DECOMPRESS_COMMANDS[compression]} '{result['file']}' | "
+                      f"psql {target} --single-transaction -f -")
+            else:
+                print(f"   psql {target} --single-transaction -f '{result['file']}'")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
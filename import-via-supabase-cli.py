@@ -5,10 +5,13 @@ Script para importar dados via Supabase CLI
 Usa os arquivos SQL divididos e executa via CLI
 """
 
+import argparse
 import os
 import subprocess
 import time
 
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+
 def run_supabase_sql(sql_file):
     """Executa um arquivo SQL via Supabase CLI"""
     try:
@@ -31,29 +34,47 @@ def run_supabase_sql(sql_file):
         print(f"❌ Erro: {e}")
         return False
 
-def execute_sql_file_direct(sql_file):
-    """Executa arquivo SQL diretamente via psql"""
+def execute_sql_file_direct(sql_file, metrics=NULL_METRICS):
+    """
+    Executa arquivo SQL diretamente via psql
+
+    Em metrics: 'read' e 'parse' (contagem dos registros) do arquivo; a execução do CLI
+    entra como 'commit' se der certo, ou 'failed'
+    """
+    name = os.path.basename(sql_file)
     try:
-        print(f"📄 Executando: {os.path.basename(sql_file)}")
+        print(f"📄 Executando: {name}")
         
         # Ler conteúdo do arquivo
-        with open(sql_file, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
+        with metrics.stage('read', batch=name) as stage:
+            with open(sql_file, 'r', encoding='utf-8') as f:
+                sql_content = f.read()
+            size = len(sql_content.encode('utf-8'))
+            stage.add(bytes=size)
+        
+        # Cada registro dos lotes de csv-to-sql.py começa numa linha '('
+        with metrics.stage('parse', batch=name) as stage:
+            rows = sum(1 for line in sql_content.splitlines() if line.strip() == '(')
+            stage.add(rows=rows)
         
         # Executar via supabase CLI
+        started = time.perf_counter()
         process = subprocess.Popen([
             'supabase', 'db', 'reset'
         ], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, 
            text=True, cwd='/Users/marcosdaniels/Downloads/project')
         
         stdout, stderr = process.communicate(input=sql_content)
+        seconds = time.perf_counter() - started
         
         if process.returncode == 0:
+            metrics.record('commit', seconds, rows, size, batch=name)
             print(f"✅ {os.path.basename(sql_file)} executado com sucesso")
             if stdout:
                 print(f"📋 Output: {stdout[:200]}...")
             return True
         else:
+            metrics.record('failed', seconds, batch=name)
             print(f"❌ Erro ao executar {os.path.basename(sql_file)}")
             if stderr:
                 print(f"🔍 Erro: {stderr[:200]}...")
@@ -64,6 +85,10 @@ def execute_sql_file_direct(sql_file):
         return False
 
 def main():
+    parser = argparse.ArgumentParser(description='Importa os lotes de sql_batches/ via Supabase CLI')
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    
     sql_batches_dir = '/Users/marcosdaniels/Downloads/project/sql_batches'
     
     if not os.path.exists(sql_batches_dir):
@@ -81,27 +106,31 @@ def main():
     print(f"📁 Diretório: {sql_batches_dir}")
     
     success_count = 0
+    metrics = ImportMetrics('import-via-supabase-cli', args.metrics)
     
-    for sql_file in sql_files:
-        file_path = os.path.join(sql_batches_dir, sql_file)
-        
-        if not os.path.exists(file_path):
-            print(f"⚠️  Arquivo não encontrado: {sql_file}")
-            continue
-        
-        print(f"\n📦 Processando: {sql_file}")
-        
-        # Tentar executar o arquivo
-        success = execute_sql_file_direct(file_path)
-        
-        if success:
-            success_count += 1
-        else:
-            print(f"❌ Falha ao executar {sql_file}")
-            # Continuar mesmo com erro
-        
-        # Pausa entre arquivos
-        time.sleep(2)
+    try:
+        for sql_file in sql_files:
+            file_path = os.path.join(sql_batches_dir, sql_file)
+            
+            if not os.path.exists(file_path):
+                print(f"⚠️  Arquivo não encontrado: {sql_file}")
+                continue
+            
+            print(f"\n📦 Processando: {sql_file}")
+            
+            # Tentar executar o arquivo
+            success = execute_sql_file_direct(file_path, metrics)
+            
+            if success:
+                success_count += 1
+            else:
+                print(f"❌ Falha ao executar {sql_file}")
+                # Continuar mesmo com erro
+            
+            # Pausa entre arquivos
+            time.sleep(2)
+    finally:
+        metrics.close()
     
     print(f"\n📊 Resumo:")
     print(f"   • Arquivos processados: {len(sql_files)}")
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Diário de checkpoints das importações (append-only, uma linha JSON por lote confirmado)
+Permite retomar uma importação interrompida a partir do primeiro lote não confirmado
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+def file_fingerprint(path, *extra):
+    """Identifica a versão de um arquivo de origem (caminho, tamanho, data de modificação e extras)"""
+    stat = os.stat(path)
+    parts = [os.path.abspath(path), str(stat.st_size), str(int(stat.st_mtime))]
+    parts.extend(str(value) for value in extra)
+    return '|'.join(parts)
+
+def merge_ranges(ranges):
+    """Une faixas [primeiro, último] sobrepostas ou vizinhas, em ordem crescente"""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return merged
+
+class ImportJournal:
+    """
+    Registra cada lote confirmado com sua faixa de registros
+
+    Lotes com nome fixo (ex.: arquivos de sql_batches/) são registrados por chave;
+    lotes montados durante a importação são registrados só pela faixa de registros,
+    então a retomada não depende do tamanho dos lotes.
+
+    Um lote com nome fixo que ficou só em parte gravado (a divisão ao meio de um lote
+    com registro ruim gravou algumas metades e outra falhou por rede ou timeout) é
+    registrado como parcial, com as posições dos registros já resolvidos (gravados ou
+    em quarentena); na retomada só os demais registros do lote são reenviados.
+
+    Cada linha é gravada com flush + fsync assim que o lote é confirmado, então o
+    diário sobrevive a KeyboardInterrupt, queda de rede ou do processo. Uma linha
+    final incompleta (queda durante a escrita) é ignorada na leitura.
+
+    Args:
+        path: Arquivo do diário
+        fingerprint: Identificação da origem; um diário de outra origem não é reaproveitado
+        resume: Se True, carrega os lotes já confirmados; senão começa um diário novo
+    """
+
+    def __init__(self, path, fingerprint, resume=False):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.committed = {}
+        self.partial = {}
+        self.ranges = []
+        self.resumed = False
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            self._load()
+
+        if self.resumed:
+            self._file = open(path, 'a', encoding='utf-8')
+        else:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._append({'type': 'start', 'fingerprint': fingerprint, 'started_at': self._now()})
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            entries = []
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+
+        if not entries or entries[0].get('fingerprint') != self.fingerprint:
+            print("⚠️  Diário de outra origem (arquivo alterado?); começando do zero")
+            return
+
+        for entry in entries[1:]:
+            if entry.get('type') == 'batch':
+                self.committed[entry['key']] = entry.get('rows')
+            elif entry.get('type') == 'partial':
+                self.partial.setdefault(entry['key'], []).extend(entry['rows'])
+            elif entry.get('type') == 'rows':
+                self.ranges.append(entry['rows'])
+        self.resumed = True
+
+    def _append(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def is_committed(self, key):
+        return key in self.committed
+
+    def record(self, key, rows=None):
+        """Marca um lote como confirmado; rows é a faixa [primeiro, último] de registros"""
+        with self._lock:
+            self.committed[key] = rows
+            self._append({'type': 'batch', 'key': key, 'rows': rows, 'at': self._now()})
+
+    def settled_positions(self, key):
+        """Faixas [primeiro, último] de posições (a partir de 1) já resolvidas de um lote parcial; None se não há"""
+        ranges = self.partial.get(key)
+        return merge_ranges(ranges) if ranges else None
+
+    def record_partial(self, key, ranges):
+        """Marca como resolvidas as posições (faixas [primeiro, último], a partir de 1) de um lote não concluído"""
+        with self._lock:
+            self.partial.setdefault(key, []).extend(ranges)
+            self._append({'type': 'partial', 'key': key, 'rows': ranges, 'at': self._now()})
+
+    def record_rows(self, first, last):
+        """Marca como confirmados os registros first..last (numerados a partir de 1 na ordem da origem)"""
+        with self._lock:
+            self.ranges.append([first, last])
+            self._append({'type': 'rows', 'rows': [first, last], 'at': self._now()})
+
+    def pending_rows(self, rows):
+        """
+        Numera os registros da origem (a partir de 1) e gera (número, registro) só para os não confirmados
+
+        A numeração depende só da ordem dos registros na origem, então é a mesma entre execuções.
+        """
+        covered = merge_ranges(self.ranges)
+        index = 0
+
+        for number, row in enumerate(rows, 1):
+            while index < len(covered) and covered[index][1] < number:
+                index += 1
+            if index < len(covered) and covered[index][0] <= number:
+                continue
+            yield number, row
+
+    @property
+    def committed_rows(self):
+        ranges = [rows for rows in self.committed.values() if rows] + self.ranges
+        return sum(last - first + 1 for first, last in merge_ranges(ranges))
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação das importações: tempo, registros e bytes por etapa e por lote
+Exporta linhas JSON (uma por lote) ou um snapshot no formato textfile do Prometheus
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Etapas usadas pelos scripts; outras (ex.: 'write', 'checkpoint') também são aceitas
+STAGES = ('read', 'parse', 'normalize', 'serialize', 'network', 'commit')
+
+# Padrão da opção --metrics dos scripts (o benchmark de importação usa para coletar as etapas)
+METRICS_ENV = 'IMPORT_METRICS'
+
+def add_metrics_argument(parser):
+    """Adiciona a opção --metrics comum aos scripts de importação"""
+    parser.add_argument('--metrics', default=os.getenv(METRICS_ENV),
+                        help=f"Grava tempo/registros/bytes por etapa: arquivo .prom (textfile do Prometheus) "
+                             f"ou linhas JSON (padrão: {METRICS_ENV})")
+
+class StageFrame:
+    """Etapa em andamento; add() acumula registros/bytes conhecidos só no fim da etapa"""
+
+    __slots__ = ('stage', 'batch', 'start', 'child_seconds', 'rows', 'bytes')
+
+    def __init__(self, stage, batch, rows, bytes):
+        self.stage = stage
+        self.batch = batch
+        self.rows = rows
+        self.bytes = bytes
+        self.child_seconds = 0.0
+        self.start = time.perf_counter()
+
+    def add(self, rows=0, bytes=0):
+        self.rows += rows
+        self.bytes += bytes
+
+class NullMetrics:
+    """Mesma interface de ImportMetrics sem medir nada (padrão das funções de biblioteca)"""
+
+    class _Frame:
+        def add(self, rows=0, bytes=0):
+            pass
+
+    _frame = _Frame()
+
+    @contextmanager
+    def stage(self, name, batch=None, rows=0, bytes=0):
+        yield self._frame
+
+    def timed(self, iterable, stage, rows=None, bytes=None):
+        return iterable
+
+    def record(self, stage, seconds, rows=0, bytes=0, batch=None):
+        pass
+
+NULL_METRICS = NullMetrics()
+
+class ImportMetrics:
+    """
+    Acumula tempo, registros e bytes por etapa de uma execução
+
+    As etapas podem ser aninhadas (ex.: serializar um lote puxa a leitura do CSV
+    por um gerador); cada etapa registra só o tempo próprio, sem o das etapas internas,
+    então a soma das etapas é o tempo total instrumentado. Tempos registrados com
+    record() (ex.: requisições simultâneas) somam a duração de cada uma e podem
+    passar do tempo de parede.
+
+    Args:
+        script: Nome do script, usado como rótulo
+        output: Arquivo de saída: '.prom' grava um snapshot textfile do Prometheus no fim;
+            qualquer outro nome recebe linhas JSON (acrescentadas). Sem arquivo, só
+            o resumo é mostrado
+    """
+
+    def __init__(self, script, output=None):
+        self.script = script
+        self.output = output or None
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started_at = time.time()
+        self.totals = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._events = None
+
+        if self.output and not self.output.endswith('.prom'):
+            self._events = open(self.output, 'a', encoding='utf-8')
+            self._emit({'type': 'start', 'started_at': round(self.started_at, 3)})
+
+    def _emit(self, entry):
+        entry.update(run=self.run_id, script=self.script)
+        with self._lock:
+            self._events.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def record(self, stage, seconds, rows=0, bytes=0, batch=None):
+        """Registra diretamente a duração de uma etapa (ex.: medida pelo cliente HTTP)"""
+        with self._lock:
+            totals = self.totals.setdefault(stage, [0.0, 0, 0, 0])
+            totals[0] += seconds
+            totals[1] += rows
+            totals[2] += bytes
+            totals[3] += 1
+
+        if self._events is not None:
+            self._emit({
+                'type': 'stage', 'stage': stage, 'batch': batch, 'seconds': round(seconds, 6),
+                'rows': rows, 'bytes': bytes, 't': round(time.perf_counter() - self._start, 3),
+            })
+
+    @contextmanager
+    def stage(self, name, batch=None, rows=0, bytes=0):
+        """Mede o bloco como uma etapa; o objeto retornado aceita add(rows=, bytes=)"""
+        stack = self._stack()
+        frame = StageFrame(name, batch, rows, bytes)
+        stack.append(frame)
+        try:
+            yield frame
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame.start
+            if stack:
+                stack[-1].child_seconds += elapsed
+            self.record(name, elapsed - frame.child_seconds, frame.rows, frame.bytes, frame.batch)
+
+    def timed(self, iterable, stage, rows=None, bytes=None):
+        """
+        Repassa os itens de um iterável medindo o tempo gasto para produzir cada um
+
+        rows e bytes são funções opcionais que extraem as contagens de cada item.
+        """
+        iterator = iter(iterable)
+        number = 0
+
+        while True:
+            number += 1
+            with self.stage(stage, batch=number) as frame:
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                frame.add(rows(item) if rows else 0, bytes(item) if bytes else 0)
+            yield item
+
+    def snapshot(self):
+        """Totais por etapa, {etapa: [segundos, registros, bytes, medições]} (serializável)"""
+        with self._lock:
+            return {stage: list(values) for stage, values in self.totals.items()}
+
+    def merge(self, totals):
+        """Soma os totais de outro processo (ex.: workers do modo paralelo)"""
+        with self._lock:
+            for stage, values in totals.items():
+                current = self.totals.setdefault(stage, [0.0, 0, 0, 0])
+                for index, value in enumerate(values):
+                    current[index] += value
+
+    def _write_prometheus(self, wall_seconds):
+        labels = f'script="{self.script}"'
+        lines = []
+        series = [
+            ('leads_import_stage_seconds_total', 'Tempo gasto em cada etapa da importação', 0),
+            ('leads_import_stage_rows_total', 'Registros processados em cada etapa', 1),
+            ('leads_import_stage_bytes_total', 'Bytes processados em cada etapa', 2),
+            ('leads_import_stage_batches_total', 'Lotes (medições) de cada etapa', 3),
+        ]
+        for name, help_text, index in series:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for stage, values in sorted(self.totals.items()):
+                lines.append(f'{name}{{{labels},stage="{stage}"}} {values[index]}')
+
+        lines.append("# HELP leads_import_duration_seconds Tempo de parede da última execução")
+        lines.append("# TYPE leads_import_duration_seconds gauge")
+        lines.append(f"leads_import_duration_seconds{{{labels}}} {wall_seconds:.3f}")
+        lines.append("# HELP leads_import_last_run_timestamp_seconds Início da última execução (epoch)")
+        lines.append("# TYPE leads_import_last_run_timestamp_seconds gauge")
+        lines.append(f"leads_import_last_run_timestamp_seconds{{{labels}}} {self.started_at:.0f}")
+
+        # O coletor textfile pode ler a qualquer momento: grava em arquivo temporário e renomeia
+        tmp_path = f"{self.output}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.output)
+
+    def close(self, show_summary=True):
+        """Grava o resumo (linha JSON 'summary' ou snapshot .prom) e mostra o tempo por etapa"""
+        wall_seconds = time.perf_counter() - self._start
+        totals = self.snapshot()
+
+        if self._events is not None:
+            self._emit({'type': 'summary', 'wall_seconds': round(wall_seconds, 3), 'stages': totals})
+            self._events.close()
+            self._events = None
+        elif self.output:
+            self._write_prometheus(wall_seconds)
+
+        if not show_summary or not totals:
+            return
+
+        measured = sum(values[0] for values in totals.values()) or 1.0
+        print(f"\n⏱️  Tempo por etapa (parede: {wall_seconds:.2f}s):")
+        for stage, (seconds, rows, size, _) in sorted(totals.items(), key=lambda item: -item[1][0]):
+            details = f"{rows:,} registros" if rows else ''
+            if size:
+                details += f"{', ' if details else ''}{size / 1024 / 1024:.1f} MB"
+            print(f"   • {stage:<10} {seconds:>8.2f}s {seconds / measured * 100:>5.1f}%  {details}")
+        if self.output:
+            print(f"   📈 Métricas gravadas em {self.output}")
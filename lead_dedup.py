@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+Deduplicação dos leads do CRM: a mesma pessoa exportada com vários lead_id
+Une registros pelo lead_id, pelo e-mail normalizado e pelo telefone em E.164 (e, opcionalmente,
+pelo nome parecido) numa única leitura do CSV; chaves e registros ficam em partições no disco
+"""
+
+import csv
+import os
+import pickle
+import tempfile
+import unicodedata
+from array import array
+from difflib import SequenceMatcher
+from itertools import islice
+
+from import_metrics import NULL_METRICS
+from lead_schema import CSV_HEADERS, LEAD_COLUMNS
+from leads_csv import DEFAULT_CHUNK_SIZE, normalize_date
+
+DEFAULT_PARTITIONS = 64
+# DDI assumido para telefones sem '+' (os leads são, na maioria, dos EUA)
+DEFAULT_COUNTRY_CODE = '1'
+DEFAULT_NAME_SIMILARITY = 0.85
+
+# Entradas acumuladas por partição antes de irem para o disco (no máximo partições x este valor em memória)
+SPILL_BATCH_SIZE = 1000
+# Candidatos da comparação de nomes com mais registros que isso são ignorados
+# (ex.: o mesmo final de telefone em milhares de leads), pois a comparação é quadrática
+MAX_NAME_BLOCK = 50
+
+REPORT_HEADER = ['lead_id', 'lead_id_mantido', 'motivo']
+
+_LEAD_ID = LEAD_COLUMNS.index('lead_id')
+_NAME = LEAD_COLUMNS.index('contato_principal')
+_CREATED = LEAD_COLUMNS.index('data_criada')
+_EMAIL = LEAD_COLUMNS.index('email_comercial')
+_PHONE = LEAD_COLUMNS.index('telefone_comercial')
+
+def normalize_email(value):
+    """E-mail sem espaços e em minúsculas; no Gmail, sem pontos e sem +tag no usuário (None se inválido)"""
+    if not value:
+        return None
+
+    user, at, domain = value.strip().lower().rpartition('@')
+    if not at or not user or '.' not in domain:
+        return None
+
+    if domain in ('gmail.com', 'googlemail.com'):
+        user = user.split('+', 1)[0].replace('.', '')
+        domain = 'gmail.com'
+    return f"{user}@{domain}"
+
+def normalize_phone(value, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Telefone no formato E.164 (+DDI e número, só dígitos)
+
+    Sem '+' (ou '00') no início, o DDI padrão é acrescentado, a menos que o número
+    já comece por ele e tenha mais de 10 dígitos. None se não sobrarem 8 a 15 dígitos.
+    """
+    if not value:
+        return None
+
+    text = value.strip()
+    digits = ''.join(ch for ch in text if '0' <= ch <= '9')
+    if text.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif not (digits.startswith(country_code) and len(digits) > 10):
+        digits = country_code + digits.lstrip('0')
+
+    if not 8 <= len(digits) <= 15:
+        return None
+    return '+' + digits
+
+def normalize_name(value):
+    """Nome sem acentos, pontuação e caixa, com as palavras em ordem ('Silva, Ana' == 'Ana Silva')"""
+    if not value:
+        return ''
+
+    text = unicodedata.normalize('NFKD', value.lower())
+    text = ''.join(ch if ch.isalnum() else ' ' for ch in text if not unicodedata.combining(ch))
+    return ' '.join(sorted(text.split()))
+
+def names_match(first, second, threshold=DEFAULT_NAME_SIMILARITY):
+    """Compara nomes já normalizados (normalize_name) pela semelhança do difflib"""
+    if not first or not second:
+        return False
+    if first == second:
+        return True
+
+    matcher = SequenceMatcher(None, first, second)
+    return matcher.quick_ratio() >= threshold and matcher.ratio() >= threshold
+
+class DedupStats:
+    """Contadores da deduplicação"""
+
+    def __init__(self):
+        self.rows = 0
+        self.output_rows = 0
+        self.groups = 0
+        self.duplicates = 0
+        self.reasons = {}
+
+class _SpillPartitions:
+    """Listas gravadas (pickle, em lotes) em partition_count arquivos, lidas uma partição por vez"""
+
+    def __init__(self, directory, prefix, partition_count, metrics=NULL_METRICS):
+        self.paths = [os.path.join(directory, f"{prefix}-{index:03d}.pickle") for index in range(partition_count)]
+        self.buffers = [[] for _ in range(partition_count)]
+        self.files = [None] * partition_count
+        self.metrics = metrics
+
+    def append(self, partition, entry):
+        buffer = self.buffers[partition]
+        buffer.append(entry)
+        if len(buffer) >= SPILL_BATCH_SIZE:
+            self._flush(partition)
+
+    def _flush(self, partition):
+        buffer = self.buffers[partition]
+        if not buffer:
+            return
+        if self.files[partition] is None:
+            self.files[partition] = open(self.paths[partition], 'ab')
+        with self.metrics.stage('spill', rows=len(buffer)):
+            pickle.dump(buffer, self.files[partition], pickle.HIGHEST_PROTOCOL)
+        self.buffers[partition] = []
+
+    def close(self):
+        for partition in range(len(self.buffers)):
+            self._flush(partition)
+        for f in self.files:
+            if f is not None:
+                f.close()
+        self.files = [None] * len(self.files)
+
+    def read(self, partition):
+        """Todas as entradas de uma partição (a partição inteira fica em memória)"""
+        entries = []
+        if os.path.exists(self.paths[partition]):
+            with open(self.paths[partition], 'rb') as f:
+                while True:
+                    try:
+                        entries.extend(pickle.load(f))
+                    except EOFError:
+                        break
+        return entries
+
+class LeadDeduplicator:
+    """
+    Agrupa os registros da mesma pessoa e gera um lead por grupo
+
+    Na leitura (add_csv), cada registro vai sem alteração para um arquivo temporário
+    e suas chaves (lead_id, e-mail, telefone; e os candidatos da comparação de nomes)
+    são espalhadas em partições por hash. resolve() lê uma partição por vez e une
+    (union-find) os registros com a mesma chave. write() relê os registros: os sem
+    duplicata saem direto, na ordem do CSV, e os grupos passam por partições pela raiz
+    e são mesclados no fim. Na memória ficam só 5 bytes por registro mais uma partição.
+
+    Args:
+        work_dir: Diretório dos arquivos temporários (apagados em close)
+        partitions: Quantidade de partições de chaves e de grupos
+        country_code: DDI dos telefones sem '+'
+        fuzzy_names: Também une registros com o mesmo usuário de e-mail (outro domínio) ou os
+            mesmos 8 últimos dígitos do telefone se os contato_principal forem parecidos
+        name_similarity: Semelhança mínima (0 a 1) dos nomes na comparação aproximada
+        metrics: import_metrics.ImportMetrics ('parse', 'normalize', 'spill', 'resolve', 'merge', 'write')
+    """
+
+    def __init__(self, work_dir=None, partitions=DEFAULT_PARTITIONS, country_code=DEFAULT_COUNTRY_CODE,
+                 fuzzy_names=False, name_similarity=DEFAULT_NAME_SIMILARITY, metrics=NULL_METRICS):
+        self.partitions = partitions
+        self.country_code = country_code
+        self.fuzzy_names = fuzzy_names
+        self.name_similarity = name_similarity
+        self.metrics = metrics
+        self.stats = DedupStats()
+
+        self._tmp = tempfile.TemporaryDirectory(prefix='lead-dedup-', dir=work_dir)
+        self.rows_path = os.path.join(self._tmp.name, 'rows.pickle')
+        self.rows_file = open(self.rows_path, 'wb')
+        self.keys = _SpillPartitions(self._tmp.name, 'keys', partitions, metrics)
+        self.name_keys = _SpillPartitions(self._tmp.name, 'names', partitions, metrics)
+        # Pai de cada registro no union-find; grouped[row] = 1 se o registro tem duplicatas
+        self.parents = array('i')
+        self.grouped = bytearray()
+
+    def close(self):
+        self.rows_file.close()
+        self.keys.close()
+        self.name_keys.close()
+        self._tmp.cleanup()
+
+    def identity_keys(self, values):
+        """Chaves exatas de um registro: lead_id, e-mail e telefone normalizados"""
+        keys = []
+        lead_id = (values[_LEAD_ID] or '').strip()
+        if lead_id:
+            keys.append('i:' + lead_id)
+        email = normalize_email(values[_EMAIL])
+        if email:
+            keys.append('e:' + email)
+        phone = normalize_phone(values[_PHONE], self.country_code)
+        if phone:
+            keys.append('t:' + phone)
+        return keys
+
+    def name_candidate_keys(self, values):
+        """Chaves da comparação de nomes: usuário do e-mail e 8 últimos dígitos do telefone"""
+        keys = []
+        email = normalize_email(values[_EMAIL])
+        if email:
+            user = email.split('@', 1)[0].split('+', 1)[0]
+            if len(user) >= 4:
+                keys.append('u:' + user)
+        phone = normalize_phone(values[_PHONE], self.country_code)
+        if phone:
+            keys.append('n:' + phone[-8:])
+        return keys
+
+    def add_csv(self, csv_file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """Lê o CSV do CRM (com cabeçalho), guardando os valores brutos das colunas de LEAD_SCHEMA"""
+        reader = csv.reader(csv_file)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        positions = {name: index for index, name in enumerate(header)}
+        indexes = [positions.get(name) for name in CSV_HEADERS]
+
+        while True:
+            with self.metrics.stage('parse') as stage:
+                chunk = [record for record in islice(reader, chunk_size) if record]
+                rows = [[record[index] if index is not None and index < len(record) else ''
+                         for index in indexes] for record in chunk]
+                stage.add(rows=len(rows))
+            if not rows:
+                return
+            self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        first = len(self.parents)
+        self.parents.extend(range(first, first + len(rows)))
+        self.grouped.extend(bytes(len(rows)))
+        self.stats.rows += len(rows)
+
+        with self.metrics.stage('spill', rows=len(rows)):
+            pickle.dump(rows, self.rows_file, pickle.HIGHEST_PROTOCOL)
+
+        with self.metrics.stage('normalize', rows=len(rows)):
+            for row, values in enumerate(rows, first):
+                for key in self.identity_keys(values):
+                    self.keys.append(hash(key) % self.partitions, (key, row))
+                if self.fuzzy_names:
+                    name = normalize_name(values[_NAME])
+                    if name:
+                        for key in self.name_candidate_keys(values):
+                            self.name_keys.append(hash(key) % self.partitions, (key, row, name))
+
+    def _find(self, row):
+        parents = self.parents
+        while parents[row] != row:
+            parents[row] = parents[parents[row]]
+            row = parents[row]
+        return row
+
+    def _union(self, first, second):
+        first, second = self._find(first), self._find(second)
+        if first != second:
+            # A raiz é sempre o registro mais antigo do grupo, então o resultado não depende da ordem das uniões
+            if second < first:
+                first, second = second, first
+            self.parents[second] = first
+            self.grouped[first] = self.grouped[second] = 1
+
+    def resolve(self):
+        """Une os registros que compartilham alguma chave, uma partição de cada vez"""
+        self.rows_file.close()
+        self.keys.close()
+        self.name_keys.close()
+
+        for partition in range(self.partitions):
+            entries = self.keys.read(partition)
+            with self.metrics.stage('resolve', rows=len(entries)):
+                first_rows = {}
+                for key, row in entries:
+                    first_row = first_rows.setdefault(key, row)
+                    if first_row != row:
+                        self._union(first_row, row)
+            del entries, first_rows
+
+            if self.fuzzy_names:
+                entries = self.name_keys.read(partition)
+                with self.metrics.stage('resolve', rows=len(entries)):
+                    blocks = {}
+                    for key, row, name in entries:
+                        blocks.setdefault(key, []).append((row, name))
+                    for block in blocks.values():
+                        if 1 < len(block) <= MAX_NAME_BLOCK:
+                            self._union_similar_names(block)
+                del entries, blocks
+
+    def _union_similar_names(self, block):
+        for i, (row, name) in enumerate(block):
+            for other_row, other_name in block[i + 1:]:
+                if self._find(row) != self._find(other_row) and names_match(name, other_name, self.name_similarity):
+                    self._union(row, other_row)
+
+    def _iter_rows(self):
+        with open(self.rows_path, 'rb') as f:
+            row = 0
+            while True:
+                try:
+                    rows = pickle.load(f)
+                except EOFError:
+                    return
+                for values in rows:
+                    yield row, values
+                    row += 1
+
+    def write(self, output_file, report_file=None):
+        """
+        Grava o CSV deduplicado (cabeçalho do CRM) e o relatório lead_id -> lead_id_mantido
+
+        Os registros sem duplicata saem na ordem do CSV; os leads mesclados vêm depois,
+        na ordem do seu registro mais antigo.
+        """
+        writer = csv.writer(output_file)
+        writer.writerow(CSV_HEADERS)
+        report = csv.writer(report_file) if report_file is not None else None
+        if report is not None:
+            report.writerow(REPORT_HEADER)
+
+        groups = _SpillPartitions(self._tmp.name, 'groups', self.partitions, self.metrics)
+        pending = []
+        for row, values in self._iter_rows():
+            if self.grouped[row]:
+                root = self._find(row)
+                groups.append(root % self.partitions, (root, row, values))
+            else:
+                pending.append(values)
+                if len(pending) >= SPILL_BATCH_SIZE:
+                    self._write_rows(writer, pending)
+                    pending = []
+        self._write_rows(writer, pending)
+        groups.close()
+
+        for partition in range(self.partitions):
+            members = {}
+            for root, row, values in groups.read(partition):
+                members.setdefault(root, []).append((row, values))
+
+            merged = []
+            with self.metrics.stage('merge', rows=len(members)):
+                for root in sorted(members):
+                    values, mapping = self.merge_group(members[root])
+                    merged.append(values)
+                    if report is not None:
+                        report.writerows(mapping)
+            self._write_rows(writer, merged)
+            del members
+
+        return self.stats
+
+    def _write_rows(self, writer, rows):
+        if rows:
+            with self.metrics.stage('write', rows=len(rows)):
+                writer.writerows(rows)
+            self.stats.output_rows += len(rows)
+
+    def merge_group(self, members):
+        """
+        Mescla os registros de um grupo: (valores do lead mantido, linhas do relatório)
+
+        Fica o lead com a data_criada mais antiga (empate: o primeiro no CSV); campos
+        vazios dele são preenchidos com os dos outros registros, na mesma ordem.
+        """
+        def age(member):
+            row, values = member
+            created = normalize_date(values[_CREATED])
+            return (created is None, created or '', row)
+
+        members = sorted(members, key=age)
+        kept = list(members[0][1])
+        for _, values in members[1:]:
+            for index, value in enumerate(values):
+                if not kept[index] and value:
+                    kept[index] = value
+
+        kept_values = members[0][1]
+        kept_keys = set(self.identity_keys(kept_values))
+        kept_name = normalize_name(kept_values[_NAME])
+        mapping = []
+        for _, values in members[1:]:
+            reason = self.match_reason(values, kept_keys, kept_name)
+            self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+            mapping.append([values[_LEAD_ID], kept[_LEAD_ID], reason])
+
+        self.stats.groups += 1
+        self.stats.duplicates += len(members) - 1
+        return kept, mapping
+
+    def match_reason(self, values, kept_keys, kept_name):
+        """Por que o registro foi unido ao lead mantido ('indireto' = por meio de outro registro do grupo)"""
+        shared = {key[0] for key in self.identity_keys(values) if key in kept_keys}
+        for prefix, reason in (('i', 'lead_id'), ('e', 'email'), ('t', 'telefone')):
+            if prefix in shared:
+                return reason
+        if self.fuzzy_names and names_match(normalize_name(values[_NAME]), kept_name, self.name_similarity):
+            return 'nome'
+        return 'indireto'
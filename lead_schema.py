@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Esquema das colunas de public.leads compartilhado por todos os scripts
+Leitura do CSV, SQL, JSON, COPY e Parquet escolhem seus conversores a partir daqui
+"""
+
+from collections import namedtuple
+
+# Tipos de coluna: texto livre, ou data (DD/MM/YYYY no CSV, YYYY-MM-DD depois de normalizada)
+TEXT = 'text'
+DATE = 'date'
+
+class LeadColumn:
+    """Uma coluna: nome no banco, cabeçalho no CSV, tipo e se tem poucos valores distintos"""
+
+    __slots__ = ('name', 'header', 'kind', 'low_cardinality')
+
+    def __init__(self, name, header=None, kind=TEXT, low_cardinality=False):
+        self.name = name
+        self.header = header or name
+        self.kind = kind
+        self.low_cardinality = low_cardinality
+
+    @property
+    def is_date(self):
+        return self.kind == DATE
+
+    def __repr__(self):
+        return f"LeadColumn({self.name!r}, {self.header!r}, {self.kind!r})"
+
+# Colunas na ordem do CSV, da tabela e de todos os registros normalizados
+LEAD_SCHEMA = (
+    LeadColumn('lead_id'),
+    LeadColumn('usuario_responsavel', low_cardinality=True),
+    LeadColumn('contato_principal', 'contato_principal (obrigatório)'),
+    LeadColumn('data_criada', kind=DATE),
+    LeadColumn('fonte_lead', low_cardinality=True),
+    LeadColumn('etapa_funil', 'etapa_funil (obrigatório)', low_cardinality=True),
+    LeadColumn('estado_onde_mora', 'estado onde mora', low_cardinality=True),
+    LeadColumn('tipo_agendamento', low_cardinality=True),
+    LeadColumn('respostas_ia'),
+    LeadColumn('email_comercial'),
+    LeadColumn('telefone_comercial'),
+    LeadColumn('estado_contato', low_cardinality=True),
+    LeadColumn('permissao_trabalho', 'permissao_trabalho (obrigatório)', low_cardinality=True),
+    LeadColumn('data_entrada_agendamento', kind=DATE),
+    LeadColumn('data_hora_agendamento_bposs'),
+)
+
+LEAD_COLUMNS = [column.name for column in LEAD_SCHEMA]
+CSV_HEADERS = [column.header for column in LEAD_SCHEMA]
+DATE_COLUMNS = tuple(column.name for column in LEAD_SCHEMA if column.is_date)
+LOW_CARDINALITY_COLUMNS = tuple(column.name for column in LEAD_SCHEMA if column.low_cardinality)
+
+# Registro de um lead: uma tupla (sem dicionário por instância) com os campos pelo nome
+Lead = namedtuple('Lead', LEAD_COLUMNS)
+
+def column_converters(by_kind):
+    """
+    Conversores alinhados com LEAD_SCHEMA, escolhidos uma única vez pelo tipo de cada coluna
+
+    Args:
+        by_kind: Dicionário tipo (TEXT, DATE) -> conversor daquele formato de saída
+    """
+    return [by_kind[column.kind] for column in LEAD_SCHEMA]
+
+def lead_row_mapper(columns):
+    """
+    Função que reordena os valores de um INSERT (na ordem de columns) como um Lead
+
+    Colunas de LEAD_COLUMNS ausentes ficam None. Retorna None se columns já está na
+    ordem de LEAD_COLUMNS; ValueError se alguma coluna não faz parte do esquema.
+    """
+    if list(columns) == LEAD_COLUMNS:
+        return None
+
+    unknown = [column for column in columns if column not in LEAD_COLUMNS]
+    if unknown:
+        raise ValueError(f"colunas fora do esquema de leads: {', '.join(unknown)}")
+
+    positions = [columns.index(column) if column in columns else None for column in LEAD_COLUMNS]
+    return lambda values: Lead._make([values[i] if i is not None else None for i in positions])
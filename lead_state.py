@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Estado local da importação incremental: lead_id -> hash do conteúdo já carregado
+Permite enviar apenas leads novos ou alterados em cada atualização
+"""
+
+import hashlib
+import os
+
+DEFAULT_STATE_PATH = 'lead-import-state.tsv'
+
+# Separadores que não aparecem nos valores normalizados do CSV
+_FIELD_SEPARATOR = '\x1f'
+_NULL_MARKER = '\x00'
+
+def row_digest(values):
+    """Hash compacto (64 bits, hexadecimal) dos valores normalizados de um lead"""
+    text = _FIELD_SEPARATOR.join(_NULL_MARKER if value is None else value for value in values)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+class DeltaStats:
+    """Contadores da comparação entre o CSV e o estado salvo"""
+
+    def __init__(self):
+        self.new = 0
+        self.changed = 0
+        self.unchanged = 0
+        self.duplicates = 0
+        self.missing_id = 0
+
+class LeadState:
+    """
+    Arquivo de estado com uma linha 'lead_id<TAB>hash' por lead já carregado
+
+    O estado só é atualizado para lotes confirmados pelo banco (mark) e é gravado
+    de forma atômica (arquivo temporário + rename), então uma importação
+    interrompida nunca marca como carregado um lead que não foi enviado.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.digests = {}
+        self.stats = DeltaStats()
+        self._seen = set()
+
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lead_id, _, digest = line.rstrip('\n').partition('\t')
+                    if lead_id:
+                        self.digests[lead_id] = digest
+
+    def __len__(self):
+        return len(self.digests)
+
+    def iter_changes(self, rows, lead_id_index=0):
+        """
+        Filtra tuplas normalizadas, gerando (valores, (lead_id, hash)) só para leads novos ou alterados
+
+        Leads sem lead_id não podem ser comparados nem receber upsert e são ignorados;
+        um lead_id repetido no mesmo CSV mantém apenas a primeira ocorrência.
+        """
+        for values in rows:
+            lead_id = values[lead_id_index]
+            if lead_id is None:
+                self.stats.missing_id += 1
+                continue
+
+            if lead_id in self._seen:
+                self.stats.duplicates += 1
+                continue
+            self._seen.add(lead_id)
+
+            digest = row_digest(values)
+            previous = self.digests.get(lead_id)
+
+            if previous == digest:
+                self.stats.unchanged += 1
+                continue
+
+            if previous is None:
+                self.stats.new += 1
+            else:
+                self.stats.changed += 1
+
+            yield values, (lead_id, digest)
+
+    def mark(self, entries):
+        """Registra como carregados os pares (lead_id, hash) de um lote confirmado"""
+        for lead_id, digest in entries:
+            self.digests[lead_id] = digest
+
+    def missing_from_source(self):
+        """Quantidade de leads do estado que não apareceram no CSV desta execução"""
+        return sum(1 for lead_id in self.digests if lead_id not in self._seen)
+
+    def save(self):
+        """Grava o estado de forma atômica"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for lead_id, digest in self.digests.items():
+                f.write(f"{lead_id}\t{digest}\n")
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,40 @@
+-- Índices de public.leads alinhados com as consultas do dashboard e da busca de leads
+-- Execute depois de final-import.sql (e de dashboard-aggregates.sql, se usado); o script pode ser re-executado
+-- Meça antes e depois com: python benchmark-queries.py --apply leads-indexes.sql
+
+-- 1. Índices que nenhuma consulta usa
+--    status e origem são do esquema antigo (create-leads-table.sql); a tabela atual não tem essas colunas
+--    etapa_funil e data_criada sozinhos são substituídos pelos índices compostos abaixo
+DROP INDEX IF EXISTS public.idx_leads_status;
+DROP INDEX IF EXISTS public.idx_leads_origem;
+DROP INDEX IF EXISTS public.idx_leads_etapa_funil;
+DROP INDEX IF EXISTS public.idx_leads_data_criada;
+
+-- 2. Etapa do funil + data: filtro por etapa ordenado pela data (LeadsPage) sem ordenar em memória
+--    Sem INCLUDE, o PostgreSQL deduplica as chaves repetidas e o índice fica pequeno (~1,5 MB em
+--    200 mil leads): as contagens por etapa e por mês leem só o índice (Index Only Scan)
+CREATE INDEX IF NOT EXISTS idx_leads_etapa_data
+    ON public.leads (etapa_funil, data_criada);
+
+-- 3. Permissão de trabalho + estado do contato, ordenado pela data
+--    Também atende, só pelo índice, as contagens por permissão e por estado
+CREATE INDEX IF NOT EXISTS idx_leads_permissao_estado_data
+    ON public.leads (permissao_trabalho, estado_contato, data_criada);
+
+-- 4. Período de criação, cobrindo as quatro colunas do dashboard
+--    Etapas dos leads de um mês e o recálculo de refresh_leads_dashboard_counts (dashboard-aggregates.sql)
+--    leem só o índice, sem passar pelas páginas largas de respostas_ia
+CREATE INDEX IF NOT EXISTS idx_leads_data_criada_etapa
+    ON public.leads (data_criada)
+    INCLUDE (etapa_funil, estado_contato, permissao_trabalho);
+
+-- 5. Reuniões realizadas (conversões) por data: índice parcial, só com os leads convertidos
+--    O predicado precisa ser o mesmo das consultas (etapa_funil LIKE '%meeting realizado%');
+--    lead_id e contato_principal no INCLUDE respondem a lista de reuniões do mês sem ler a tabela
+CREATE INDEX IF NOT EXISTS idx_leads_reunioes_data
+    ON public.leads (data_criada)
+    INCLUDE (lead_id, contato_principal)
+    WHERE etapa_funil LIKE '%meeting realizado%';
+
+-- 6. Estatísticas novas para o planejador escolher os índices
+ANALYZE public.leads;
@@ -0,0 +1,330 @@
+-- Variante de public.leads particionada por mês de data_criada (RANGE), com partições futuras automáticas
+-- Execute depois de final-import.sql: os leads existentes são copiados para a tabela particionada e a
+-- tabela original fica como public.leads_nao_particionada, para conferência (remova-a depois com DROP TABLE)
+-- Em seguida execute de novo leads-indexes.sql, se usado; os gatilhos das contagens do dashboard
+-- (dashboard-aggregates.sql) são recriados na tabela nova
+-- O script pode ser re-executado com segurança: uma tabela já particionada só recebe as funções novas
+--
+-- Partições: public.leads_AAAA_MM (um mês cada) e public.leads_default (data_criada vazia)
+-- csv-to-sql.py --copy agrupa cada lote por mês e cria as partições que faltam antes do COPY (leads_partitions.py);
+-- INSERTs pela API REST ou pelos lotes SQL também são encaminhados pela tabela-mãe, mas um mês ainda sem
+-- partição fica em leads_default até a próxima create_leads_partitions() (seção 8)
+--
+-- Compensa nas consultas por período, que leem só as partições dos meses pedidos, e para descartar meses
+-- antigos (detach_leads_partitions). Agrupamentos da tabela inteira passam por todas as partições e ficam
+-- mais lentos: o dashboard os lê de leads_dashboard_counts (dashboard-aggregates.sql)
+
+-- 1. Partição do mês (criada se ainda não existir); NULL devolve a partição padrão
+--    Leads do mês que caíram na partição padrão antes de a partição existir são movidos para ela
+CREATE OR REPLACE FUNCTION public.ensure_leads_partition(target_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', target_month)::date;
+    month_end DATE := (date_trunc('month', target_month) + interval '1 month')::date;
+    partition_name TEXT := 'leads_' || to_char(target_month, 'YYYY_MM');
+BEGIN
+    IF target_month IS NULL THEN
+        RETURN 'public.leads_default';
+    END IF;
+
+    IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+        RETURN 'public.' || partition_name;
+    END IF;
+
+    -- Cargas simultâneas criando o mesmo mês: a segunda espera e encontra a partição pronta
+    PERFORM pg_advisory_xact_lock(hashtext('public.leads partições'));
+    IF to_regclass('public.' || partition_name) IS NOT NULL THEN
+        RETURN 'public.' || partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE public.%I (LIKE public.leads INCLUDING DEFAULTS)', partition_name);
+    -- A tabela-mãe aplica o RLS; a partição acessada direto (ex.: /rest/v1/leads_2024_03) não mostra nada
+    EXECUTE format('ALTER TABLE public.%I ENABLE ROW LEVEL SECURITY', partition_name);
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM public.leads_default WHERE data_criada >= %L AND data_criada < %L RETURNING *) '
+        'INSERT INTO public.%I SELECT * FROM moved', month_start, month_end, partition_name);
+    EXECUTE format('ALTER TABLE public.leads ATTACH PARTITION public.%I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, month_start, month_end);
+
+    RETURN 'public.' || partition_name;
+END;
+$$;
+
+-- 2. Partições do mês atual e dos próximos meses, e dos meses que estão na partição padrão
+--    Agendada pelo pg_cron quando disponível (seção 8); retorna o número de partições criadas
+CREATE OR REPLACE FUNCTION public.create_leads_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    before_count INTEGER;
+    after_count INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO before_count FROM pg_inherits WHERE inhparent = 'public.leads'::regclass;
+
+    PERFORM public.ensure_leads_partition((date_trunc('month', now()) + make_interval(months => m))::date)
+    FROM generate_series(0, months_ahead) AS m;
+
+    PERFORM public.ensure_leads_partition(month_start)
+    FROM (SELECT DISTINCT date_trunc('month', data_criada)::date AS month_start
+          FROM public.leads_default WHERE data_criada IS NOT NULL) AS stray;
+
+    SELECT COUNT(*) INTO after_count FROM pg_inherits WHERE inhparent = 'public.leads'::regclass;
+    RETURN after_count - before_count;
+END;
+$$;
+
+-- 3. Desanexa os meses anteriores a older_than: cada um vira uma tabela comum (arquivar com pg_dump e
+--    remover com DROP TABLE), sem DELETE linha a linha. Retorna os nomes das tabelas desanexadas
+--    As contagens do dashboard são recalculadas sem esses leads, se dashboard-aggregates.sql estiver instalado
+CREATE OR REPLACE FUNCTION public.detach_leads_partitions(older_than DATE)
+RETURNS SETOF TEXT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    partition_name TEXT;
+BEGIN
+    FOR partition_name IN
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'public.leads'::regclass
+          AND c.relname ~ '^leads_[0-9]{4}_[0-9]{2}$'
+          AND to_date(substr(c.relname, 7), 'YYYY_MM') < date_trunc('month', older_than)
+        ORDER BY c.relname
+    LOOP
+        EXECUTE format('ALTER TABLE public.leads DETACH PARTITION public.%I', partition_name);
+        RETURN NEXT 'public.' || partition_name;
+    END LOOP;
+
+    IF FOUND AND to_regproc('public.refresh_leads_dashboard_counts') IS NOT NULL THEN
+        PERFORM public.refresh_leads_dashboard_counts();
+    END IF;
+END;
+$$;
+
+-- 4. Upsert por lead_id dos leads da tabela temporária leads_staging (importação incremental)
+--    Numa tabela particionada não existe índice único só em lead_id, então não há ON CONFLICT (lead_id):
+--    a versão anterior de cada lead é removida e a nova inserida (e encaminhada à partição do seu mês,
+--    mesmo que data_criada tenha mudado), mantendo id e created_at. Roda na transação da carga
+CREATE OR REPLACE FUNCTION public.merge_leads_staging()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public, pg_temp
+AS $$
+DECLARE
+    merged INTEGER;
+BEGIN
+    PERFORM public.ensure_leads_partition(month_start)
+    FROM (SELECT DISTINCT date_trunc('month', data_criada)::date AS month_start
+          FROM pg_temp.leads_staging WHERE data_criada IS NOT NULL) AS months;
+
+    WITH removed AS (
+        DELETE FROM public.leads l
+        USING pg_temp.leads_staging s
+        WHERE l.lead_id = s.lead_id
+        RETURNING l.id, l.lead_id, l.created_at
+    ), previous AS (
+        SELECT DISTINCT ON (lead_id) id, lead_id, created_at FROM removed ORDER BY lead_id, id
+    )
+    INSERT INTO public.leads (
+        id, created_at, lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead,
+        etapa_funil, estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial, telefone_comercial,
+        estado_contato, permissao_trabalho, data_entrada_agendamento, data_hora_agendamento_bposs
+    )
+    SELECT COALESCE(p.id, nextval('public.leads_id_seq')), COALESCE(p.created_at, timezone('utc'::text, now())),
+           s.lead_id, s.usuario_responsavel, s.contato_principal, s.data_criada, s.fonte_lead,
+           s.etapa_funil, s.estado_onde_mora, s.tipo_agendamento, s.respostas_ia, s.email_comercial,
+           s.telefone_comercial, s.estado_contato, s.permissao_trabalho,
+           s.data_entrada_agendamento, s.data_hora_agendamento_bposs
+    FROM pg_temp.leads_staging s
+    LEFT JOIN previous p ON p.lead_id = s.lead_id;
+
+    GET DIAGNOSTICS merged = ROW_COUNT;
+    RETURN merged;
+END;
+$$;
+
+-- 5. Conversão: cria a tabela particionada com as mesmas colunas de final-import.sql e copia os leads
+--    A chave primária de uma tabela particionada precisa incluir data_criada, que pode ser vazia:
+--    id continua único pela sequência e ganha um índice comum
+DO $$
+DECLARE
+    index_name TEXT;
+    month_start DATE;
+    copied BIGINT := 0;
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('public.leads')) THEN
+        RAISE NOTICE 'public.leads já é particionada';
+        RETURN;
+    END IF;
+
+    CREATE SEQUENCE IF NOT EXISTS public.leads_id_seq;
+
+    IF to_regclass('public.leads') IS NOT NULL THEN
+        ALTER TABLE public.leads RENAME TO leads_nao_particionada;
+        -- Os nomes dos índices ficam livres para a tabela nova
+        FOR index_name IN
+            SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = 'public.leads_nao_particionada'::regclass
+        LOOP
+            EXECUTE format('ALTER INDEX public.%I RENAME TO %I', index_name, left(index_name, 40) || '_nao_particionada');
+        END LOOP;
+    END IF;
+
+    CREATE TABLE public.leads (
+        id BIGINT NOT NULL DEFAULT nextval('public.leads_id_seq'),
+        lead_id TEXT,
+        usuario_responsavel TEXT,
+        contato_principal TEXT NOT NULL,
+        data_criada DATE,
+        fonte_lead TEXT,
+        etapa_funil TEXT NOT NULL,
+        estado_onde_mora TEXT,
+        tipo_agendamento TEXT,
+        respostas_ia TEXT,
+        email_comercial TEXT,
+        telefone_comercial TEXT,
+        estado_contato TEXT,
+        permissao_trabalho TEXT NOT NULL,
+        data_entrada_agendamento DATE,
+        data_hora_agendamento_bposs TEXT,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+    ) PARTITION BY RANGE (data_criada);
+
+    -- A sequência passa a pertencer à tabela nova: DROP TABLE leads_nao_particionada não a remove
+    ALTER SEQUENCE public.leads_id_seq OWNED BY public.leads.id;
+
+    -- Índices de final-import.sql, criados em cada partição
+    CREATE INDEX idx_leads_id ON public.leads(id);
+    CREATE INDEX idx_leads_lead_id ON public.leads(lead_id);
+    CREATE INDEX idx_leads_contato_principal ON public.leads(contato_principal);
+    CREATE INDEX idx_leads_etapa_funil ON public.leads(etapa_funil);
+    CREATE INDEX idx_leads_data_criada ON public.leads(data_criada);
+    CREATE INDEX idx_leads_created_at ON public.leads(created_at);
+
+    CREATE TABLE public.leads_default PARTITION OF public.leads DEFAULT;
+    ALTER TABLE public.leads_default ENABLE ROW LEVEL SECURITY;
+
+    IF to_regclass('public.leads_nao_particionada') IS NOT NULL THEN
+        FOR month_start IN
+            SELECT DISTINCT date_trunc('month', data_criada)::date FROM public.leads_nao_particionada
+            WHERE data_criada IS NOT NULL
+        LOOP
+            PERFORM public.ensure_leads_partition(month_start);
+        END LOOP;
+
+        INSERT INTO public.leads (
+            id, lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead, etapa_funil,
+            estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial, telefone_comercial,
+            estado_contato, permissao_trabalho, data_entrada_agendamento, data_hora_agendamento_bposs,
+            created_at, updated_at
+        )
+        SELECT id, lead_id, usuario_responsavel, contato_principal, data_criada, fonte_lead, etapa_funil,
+               estado_onde_mora, tipo_agendamento, respostas_ia, email_comercial, telefone_comercial,
+               estado_contato, permissao_trabalho, data_entrada_agendamento, data_hora_agendamento_bposs,
+               created_at, updated_at
+        FROM public.leads_nao_particionada;
+        GET DIAGNOSTICS copied = ROW_COUNT;
+    END IF;
+
+    PERFORM public.create_leads_partitions();
+    RAISE NOTICE 'public.leads particionada por mês: % leads copiados', copied;
+END;
+$$;
+
+-- 6. Trigger de updated_at, como em final-import.sql (aplicado a todas as partições)
+CREATE OR REPLACE FUNCTION update_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = timezone('utc'::text, now());
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_leads_updated_at ON public.leads;
+CREATE TRIGGER update_leads_updated_at
+    BEFORE UPDATE ON public.leads
+    FOR EACH ROW
+    EXECUTE FUNCTION update_updated_at_column();
+
+-- Gatilhos das contagens do dashboard, se dashboard-aggregates.sql foi executado: saem da tabela antiga
+-- (uma escrita em leads_nao_particionada não deve mexer nas contagens) e vão para a nova. Os leads
+-- movidos de leads_default por ensure_leads_partition() não passam pela tabela-mãe e não alteram as contagens
+DO $$
+BEGIN
+    IF to_regproc('public.create_leads_dashboard_triggers') IS NOT NULL THEN
+        IF to_regclass('public.leads_nao_particionada') IS NOT NULL THEN
+            DROP TRIGGER IF EXISTS leads_dashboard_counts_insert ON public.leads_nao_particionada;
+            DROP TRIGGER IF EXISTS leads_dashboard_counts_update ON public.leads_nao_particionada;
+            DROP TRIGGER IF EXISTS leads_dashboard_counts_delete ON public.leads_nao_particionada;
+            DROP TRIGGER IF EXISTS leads_dashboard_counts_truncate ON public.leads_nao_particionada;
+        END IF;
+        PERFORM public.create_leads_dashboard_triggers();
+    END IF;
+END;
+$$;
+
+-- 7. RLS e políticas de final-import.sql; as de escrita dependem do schema auth do Supabase
+ALTER TABLE public.leads ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Enable read access for all users" ON public.leads;
+CREATE POLICY "Enable read access for all users" ON public.leads
+    FOR SELECT USING (true);
+
+DO $$
+BEGIN
+    IF to_regnamespace('auth') IS NOT NULL THEN
+        DROP POLICY IF EXISTS "Enable insert for authenticated users only" ON public.leads;
+        CREATE POLICY "Enable insert for authenticated users only" ON public.leads
+            FOR INSERT WITH CHECK (auth.role() = 'authenticated');
+
+        DROP POLICY IF EXISTS "Enable update for authenticated users only" ON public.leads;
+        CREATE POLICY "Enable update for authenticated users only" ON public.leads
+            FOR UPDATE USING (auth.role() = 'authenticated');
+
+        DROP POLICY IF EXISTS "Enable delete for authenticated users only" ON public.leads;
+        CREATE POLICY "Enable delete for authenticated users only" ON public.leads
+            FOR DELETE USING (auth.role() = 'authenticated');
+    END IF;
+END;
+$$;
+
+-- 8. Funções de partição só para o service role; partições futuras criadas todo dia pelo pg_cron, se instalado
+--    Sem pg_cron, os meses novos são criados pelos importadores (ou com SELECT public.create_leads_partitions())
+REVOKE EXECUTE ON FUNCTION public.ensure_leads_partition(DATE) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.create_leads_partitions(INTEGER) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.detach_leads_partitions(DATE) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION public.merge_leads_staging() FROM PUBLIC;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION public.ensure_leads_partition(DATE) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION public.create_leads_partitions(INTEGER) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION public.detach_leads_partitions(DATE) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION public.merge_leads_staging() FROM anon, authenticated;
+        GRANT EXECUTE ON FUNCTION public.ensure_leads_partition(DATE) TO service_role;
+        GRANT EXECUTE ON FUNCTION public.create_leads_partitions(INTEGER) TO service_role;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+        PERFORM cron.schedule('leads-create-partitions', '0 3 * * *', 'SELECT public.create_leads_partitions()');
+    ELSE
+        RAISE NOTICE 'pg_cron não instalado: agende SELECT public.create_leads_partitions() uma vez por mês';
+    END IF;
+END;
+$$;
+
+-- 9. Estatísticas da tabela nova
+ANALYZE public.leads;
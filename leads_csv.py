@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura e normalização do CSV de leads exportado do CRM
+Blocos colunares e lotes JSON compartilhados por csv-to-sql.py e pelos importadores
+"""
+
+import csv
+import gc
+import io
+import json
+import os
+from functools import partial
+from itertools import islice
+from json.encoder import encode_basestring
+
+from import_metrics import NULL_METRICS
+from lead_schema import DATE, LEAD_COLUMNS, LEAD_SCHEMA, TEXT, Lead, column_converters
+
+DEFAULT_CSV_PATH = 'public/leads_filtrado_revisado.csv'
+
+# Registros lidos por bloco na normalização colunar
+DEFAULT_CHUNK_SIZE = 10000
+
+# Bytes lidos por vez ao procurar os limites das faixas do CSV
+_SCAN_BLOCK_SIZE = 1 << 22
+
+def normalize_date(date_str):
+    """Converte data do formato DD/MM/YYYY para YYYY-MM-DD (None se vazia ou inválida)"""
+    if not date_str or date_str.strip() == '':
+        return None
+
+    try:
+        # Formato esperado: DD/MM/YYYY
+        day, month, year = date_str.split('/')
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    except:
+        return None
+
+def normalize_text(value):
+    """Retorna None para valores vazios, ou o próprio valor como string"""
+    if value is None or value == '':
+        return None
+
+    return str(value)
+
+def normalize_text_column(values):
+    """Aplica normalize_text a uma coluna inteira: vazio vira None, o resto é mantido"""
+    return [value or None for value in values]
+
+def normalize_date_column(values, cache):
+    """
+    Aplica normalize_date a uma coluna inteira
+
+    As datas se repetem muito entre os leads, então cada texto distinto é
+    convertido uma única vez; cache é um dicionário reaproveitado entre blocos.
+    """
+    if len(cache) > 100000:
+        cache.clear()
+
+    result = []
+    for value in values:
+        try:
+            result.append(cache[value])
+        except KeyError:
+            result.append(cache.setdefault(value, normalize_date(value)))
+    return result
+
+class ColumnBatch:
+    """Bloco de registros normalizados guardado por coluna (listas na ordem de LEAD_COLUMNS)"""
+
+    __slots__ = ('columns', 'row_count')
+
+    def __init__(self, columns, row_count):
+        self.columns = columns
+        self.row_count = row_count
+
+    def __len__(self):
+        return self.row_count
+
+    def rows(self):
+        """Tuplas por registro, no mesmo formato de iter_normalized_rows"""
+        return zip(*self.columns)
+
+    def records(self):
+        """Registros Lead (tuplas com os campos pelo nome)"""
+        return map(Lead._make, zip(*self.columns))
+
+def iter_column_batches(csv_file, chunk_size=DEFAULT_CHUNK_SIZE, header=None, metrics=NULL_METRICS):
+    """
+    Lê o CSV em blocos de até chunk_size registros e normaliza cada coluna de uma vez
+
+    Segue as regras de csv.DictReader: linhas em branco são ignoradas, campos que
+    faltam numa linha viram None e colunas ausentes do cabeçalho ficam vazias.
+    Se header for informado, o arquivo não tem linha de cabeçalho (ex.: uma faixa do CSV).
+    Com metrics (import_metrics.ImportMetrics), mede as etapas 'parse' (o csv.reader
+    lê e separa os campos na mesma chamada, então inclui a leitura) e 'normalize'.
+    """
+    # O csv.reader (em C) já separa os campos sem montar dicionários. Um leitor em Python
+    # puro sobre mmap (limites de registro pela paridade das aspas, split(',') nos registros
+    # sem aspas e csv só nos com aspas) foi medido mais lento: 6,0s contra 4,5s em 200 mil
+    # leads sintéticos, cujo respostas_ia tem aspas e quebras de linha em ~70% dos registros
+    reader = csv.reader(csv_file)
+    if header is None:
+        header = next(reader, None)
+    if header is None:
+        return
+
+    width = len(header)
+    # Como no DictReader, um cabeçalho repetido fica com a última posição
+    positions = {name: index for index, name in enumerate(header)}
+    indexes = [positions.get(column.header) for column in LEAD_SCHEMA]
+    # O cache de datas é reaproveitado entre os blocos do arquivo
+    normalizers = column_converters({TEXT: normalize_text_column, DATE: partial(normalize_date_column, cache={})})
+
+    while True:
+        batch = _read_column_batch(reader, chunk_size, width, indexes, normalizers, metrics)
+        if batch is None:
+            return
+        if batch.row_count:
+            yield batch
+
+def _read_column_batch(reader, chunk_size, width, indexes, normalizers, metrics):
+    """Lê um bloco e monta suas colunas; None no fim do arquivo"""
+    # Um bloco cria centenas de milhares de objetos sem ciclos de referência: pausar a
+    # coleta de lixo evita varreduras repetidas da geração jovem durante a montagem
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with metrics.stage('parse') as stage:
+            chunk = list(islice(reader, chunk_size))
+            records = [record if len(record) >= width else record + [None] * (width - len(record))
+                       for record in chunk if record]
+            stage.add(rows=len(records))
+        if not chunk:
+            return None
+
+        count = len(records)
+        with metrics.stage('normalize', rows=count):
+            fields = list(zip(*records)) if records else []
+
+            columns = []
+            for index, normalize in zip(indexes, normalizers):
+                values = fields[index] if index is not None and count else [None] * count
+                columns.append(normalize(values))
+
+        return ColumnBatch(columns, count)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def split_csv_shards(csv_path, shard_count):
+    """
+    Divide o CSV em até shard_count faixas de bytes alinhadas em fim de registro
+
+    Um '\\n' só encerra um registro se o número de aspas antes dele for par, ou seja,
+    se não estiver dentro de um campo entre aspas (como os respostas_ia com várias
+    linhas); aspas escapadas ("") não mudam a paridade. '"' e '\\n' nunca aparecem
+    dentro de caracteres UTF-8 de vários bytes, então a busca é feita nos bytes.
+
+    Returns:
+        (cabeçalho, faixas): lista de colunas do cabeçalho e lista de (início, fim),
+        com a primeira faixa começando logo depois do cabeçalho
+    """
+    size = os.path.getsize(csv_path)
+    # O primeiro alvo (0) localiza o fim do cabeçalho
+    targets = [size * i // shard_count for i in range(shard_count)]
+    boundaries = []
+    quotes = 0
+    position = 0
+
+    with open(csv_path, 'rb') as f:
+        while targets:
+            block = f.read(_SCAN_BLOCK_SIZE)
+            if not block:
+                break
+
+            block_end = position + len(block)
+            counted = 0
+            block_quotes = 0
+
+            while targets and targets[0] < block_end:
+                newline = block.find(b'\n', max(targets[0] - position, counted))
+                if newline < 0:
+                    break
+
+                block_quotes += block.count(b'"', counted, newline)
+                counted = newline + 1
+                if (quotes + block_quotes) % 2 == 0:
+                    boundaries.append(position + counted)
+                    # Faixas menores que um registro são absorvidas pela seguinte
+                    while targets and targets[0] < boundaries[-1]:
+                        targets.pop(0)
+
+            quotes += block.count(b'"')
+            position = block_end
+
+        f.seek(0)
+        header_end = boundaries[0] if boundaries else size
+        header_text = f.read(header_end).decode('utf-8')
+
+    header = next(csv.reader(io.StringIO(header_text, newline='')), [])
+    ends = boundaries[1:] + [size]
+    shards = [(start, end) for start, end in zip(boundaries, ends) if start < end]
+    return header, shards
+
+def iter_shard_column_batches(csv_path, header, start, end, chunk_size=DEFAULT_CHUNK_SIZE, metrics=NULL_METRICS):
+    """Normaliza em blocos colunares apenas a faixa [start, end) do CSV (ver split_csv_shards)"""
+    with metrics.stage('read', bytes=end - start):
+        with open(csv_path, 'rb') as f:
+            f.seek(start)
+            text = f.read(end - start).decode('utf-8')
+
+    yield from iter_column_batches(io.StringIO(text, newline=''), chunk_size, header=header, metrics=metrics)
+
+def iter_normalized_rows(csv_file, metrics=NULL_METRICS):
+    """Lê o CSV em blocos colunares e gera tuplas normalizadas na ordem de LEAD_COLUMNS"""
+    for batch in iter_column_batches(csv_file, metrics=metrics):
+        yield from batch.rows()
+
+class JsonBatch:
+    """
+    Lote já serializado em JSON, pronto para o POST em /rest/v1/leads (meta: dados livres do chamador)
+
+    rejected: posições dos registros postos em quarentena pelo cliente REST (ver supabase_ingest)
+    failed: posições não gravadas de um lote dividido em que alguma metade falhou por rede ou
+        timeout; as demais já estão no banco
+    """
+
+    __slots__ = ('body', 'row_count', 'meta', 'rejected', 'failed')
+
+    def __init__(self, body, row_count, meta=None):
+        self.body = body
+        self.row_count = row_count
+        self.meta = meta
+        self.rejected = ()
+        self.failed = ()
+
+    def __len__(self):
+        return self.row_count
+
+def encode_json_records(records, meta=None):
+    """Serializa uma lista de dicionários como um array JSON compacto"""
+    body = json.dumps(records, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return JsonBatch(body, len(records), meta)
+
+# Objeto JSON de um registro, com os nomes das colunas já no texto: só os valores são serializados
+_JSON_RECORD = '{' + ','.join(f'"{column}":%s' for column in LEAD_COLUMNS) + '}'
+
+def encode_json_batch(rows, meta=None):
+    """
+    Serializa tuplas normalizadas (ou Lead) como um array JSON de objetos
+
+    Gera o mesmo texto que encode_json_records com um dicionário por registro, mas
+    escapa coluna a coluna e preenche o modelo _JSON_RECORD, sem montar dicionários.
+    """
+    rows = rows if isinstance(rows, list) else list(rows)
+    columns = [[encode_basestring(value) if value is not None else 'null' for value in column]
+               for column in zip(*rows)]
+    body = ('[' + ','.join([_JSON_RECORD % record for record in zip(*columns)]) + ']').encode('utf-8')
+    return JsonBatch(body, len(rows), meta)
+
+def iter_json_batches(csv_file, batch_size=100):
+    """
+    Gera lotes JSON direto do CSV, sem passar por SQL intermediário
+
+    As datas são normalizadas uma única vez (DD/MM/YYYY -> YYYY-MM-DD) e cada
+    lote é serializado assim que fica cheio, então só um lote fica em memória.
+    """
+    batch = []
+
+    for values in iter_normalized_rows(csv_file):
+        batch.append(values)
+        if len(batch) >= batch_size:
+            yield encode_json_batch(batch)
+            batch = []
+
+    if batch:
+        yield encode_json_batch(batch)
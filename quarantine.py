@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Quarentena dos registros que o banco rejeita (data impossível, campo obrigatório vazio)
+Os importadores dividem ao meio o lote que falhou até isolar esses registros; os demais são gravados
+"""
+
+import json
+import threading
+
+DEFAULT_QUARANTINE_PATH = 'leads-quarantine.jsonl'
+
+# Classes de SQLSTATE causadas pelo conteúdo de um registro: dado inválido (22) e restrição violada (23)
+ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+# lead_id já gravado: fora das classes acima porque num lote reenviado (ex.: depois de uma
+# interrupção) todos os registros falham assim, e a divisão poria leads válidos na quarentena
+UNIQUE_VIOLATION = '23505'
+
+def is_row_error(sqlstate):
+    """True se o SQLSTATE indica um registro inválido (repetir o lote inteiro não adianta)"""
+    return bool(sqlstate) and sqlstate[:2] in ROW_ERROR_SQLSTATE_CLASSES and sqlstate != UNIQUE_VIOLATION
+
+class QuarantineFile:
+    """
+    Arquivo JSON Lines com um registro rejeitado por linha
+
+    Cada linha tem 'origem' (lote ou arquivo), 'erro' (mensagem do servidor) e
+    'registro'. O arquivo só é criado quando o primeiro registro é rejeitado e
+    pode ser usado por várias threads.
+    """
+
+    def __init__(self, path=DEFAULT_QUARANTINE_PATH):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def add(self, source, record, error):
+        line = json.dumps({'origem': source, 'erro': error, 'registro': record}, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class BisectResult:
+    """Resultado do isolamento: registros gravados, rejeitados [(registro, erro)] e falhas [(registros, erro)]"""
+
+    def __init__(self):
+        self.committed = 0
+        self.rejected = []
+        self.failed = []
+        self.loads = 0
+
+    @property
+    def failed_rows(self):
+        return sum(len(rows) for rows, _ in self.failed)
+
+def _halves(rows):
+    middle = len(rows) // 2
+    return rows[:middle], rows[middle:]
+
+def _settle_halves(result, outcomes):
+    """
+    Contabiliza as duas metades carregadas [(metade, sucesso, erro, sqlstate)]; retorna
+    [(metade, erro)] das que devem ser divididas de novo
+
+    Se as duas metades falharam com o mesmo SQLSTATE, o erro provavelmente está no lote
+    todo (ex.: uma coluna que nenhum registro preenche), não em alguns registros: dividir
+    até o fim custaria cerca de 2n cargas e poria registros válidos na quarentena, então
+    as duas vão para result.failed.
+    """
+    result.loads += len(outcomes)
+    (first, _, _, first_state), (second, _, _, second_state) = outcomes
+    if first_state and first_state == second_state and max(len(first), len(second)) > 1:
+        result.failed.extend((half, f"{error} (as duas metades falharam com {sqlstate})")
+                             for half, _, error, sqlstate in outcomes)
+        return []
+
+    split = []
+    for half, success, error, sqlstate in outcomes:
+        if success:
+            result.committed += len(half)
+        elif sqlstate:
+            split.append((half, error))
+        else:
+            result.failed.append((half, error))
+    return split
+
+def isolate_row_errors(rows, load, error, result=None):
+    """
+    Divide ao meio, recursivamente, um lote rejeitado por erro de registro
+
+    load(subconjunto) grava o subconjunto numa transação e retorna (sucesso, erro,
+    sqlstate), com sqlstate só se a falha foi um erro de registro (ver is_row_error).
+    As metades aceitas ficam gravadas; cada registro ruim custa cerca de 2·log2(n)
+    chamadas extras em vez do lote inteiro. Metades que falham por outro motivo (rede,
+    timeout), ou as duas com o mesmo SQLSTATE (ver _settle_halves), vão para
+    result.failed sem nova divisão.
+    """
+    result = result if result is not None else BisectResult()
+    if len(rows) == 1:
+        result.rejected.append((rows[0], error))
+        return result
+
+    outcomes = [(half, *load(half)) for half in _halves(rows)]
+    for half, message in _settle_halves(result, outcomes):
+        isolate_row_errors(half, load, message, result)
+    return result
+
+async def isolate_row_errors_async(rows, load, error, result=None):
+    """Como isolate_row_errors, com load assíncrono (cliente REST)"""
+    result = result if result is not None else BisectResult()
+    if len(rows) == 1:
+        result.rejected.append((rows[0], error))
+        return result
+
+    outcomes = [(half, *await load(half)) for half in _halves(rows)]
+    for half, message in _settle_halves(result, outcomes):
+        await isolate_row_errors_async(half, load, message, result)
+    return result
@@ -5,220 +5,210 @@ Script para dividir o arquivo SQL grande em arquivos menores
 Para contornar a limitação do SQL Editor do Supabase
 """
 
+import argparse
 import os
-import re
 
-def split_large_sql_file(input_file, output_dir='sql_batches', records_per_file=500):
+from batch_files import batch_filename, write_cleanup_file, write_instructions_file, write_setup_file
+from compressed_files import (add_compression_argument, compressed_path, compression_available, open_text_input,
+                              open_text_output)
+from import_metrics import NULL_METRICS, ImportMetrics, add_metrics_argument
+
+def iter_sql_sections(lines):
     """
-    Divide um arquivo SQL grande em arquivos menores
-    
-    Args:
-        input_file: Caminho do arquivo SQL original
-        output_dir: Diretório para salvar os arquivos divididos
-        records_per_file: Número de registros por arquivo
+    Classifica as linhas do arquivo SQL de forma incremental
+
+    Gera tuplas (seção, conteúdo): ('header', linha), ('insert', comando INSERT completo)
+    ou ('footer', linha). Apenas o INSERT em andamento fica em memória.
     """
-    
-    # Criar diretório de saída
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"📁 Criado diretório: {output_dir}")
-    
-    # Ler arquivo original
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    print(f"📖 Lendo arquivo: {input_file}")
-    print(f"📏 Tamanho: {len(content):,} caracteres")
-    
-    # Extrair comandos iniciais (ALTER TABLE, etc.)
-    lines = content.split('\n')
-    header_commands = []
-    insert_commands = []
-    footer_commands = []
-    
     current_section = 'header'
     current_insert = []
-    
+
     for line in lines:
+        line = line.rstrip('\n')
         line_stripped = line.strip()
-        
+
         if not line_stripped or line_stripped.startswith('--'):
-            if current_section == 'header':
-                header_commands.append(line)
-            elif current_section == 'footer':
-                footer_commands.append(line)
+            if current_section in ('header', 'footer'):
+                yield current_section, line
             continue
-        
+
         # Detectar início de INSERT
         if 'INSERT INTO' in line_stripped.upper():
             current_section = 'insert'
             current_insert = [line]
             continue
-        
+
         # Detectar fim de INSERT
         if current_section == 'insert':
             current_insert.append(line)
-            
+
             # Se linha termina com ); é fim do INSERT
             if line_stripped.endswith(');'):
-                insert_commands.append('\n'.join(current_insert))
+                yield 'insert', '\n'.join(current_insert)
                 current_insert = []
                 continue
-        
+
         # Detectar comandos finais (ENABLE RLS, SELECT, etc.)
         if ('ALTER TABLE' in line_stripped.upper() and 'ENABLE' in line_stripped.upper()) or \
            ('SELECT' in line_stripped.upper()):
             current_section = 'footer'
-            footer_commands.append(line)
+            yield 'footer', line
             continue
-        
-        # Adicionar à seção apropriada
-        if current_section == 'header':
-            header_commands.append(line)
-        elif current_section == 'footer':
-            footer_commands.append(line)
-    
-    print(f"📊 Encontrados:")
-    print(f"   • Comandos de cabeçalho: {len([c for c in header_commands if c.strip()])}")
-    print(f"   • Comandos INSERT: {len(insert_commands)}")
-    print(f"   • Comandos de rodapé: {len([c for c in footer_commands if c.strip()])}")
-    
-    # Dividir INSERTs em lotes
-    file_count = 0
-    
-    # Criar arquivo inicial com setup
-    setup_content = '\n'.join(header_commands).strip()
-    if setup_content:
-        setup_file = os.path.join(output_dir, '00_setup.sql')
-        with open(setup_file, 'w', encoding='utf-8') as f:
-            f.write(setup_content)
-        print(f"✅ Criado: {setup_file}")
-    
-    # Dividir INSERTs em arquivos
-    for i in range(0, len(insert_commands), records_per_file):
-        file_count += 1
-        batch = insert_commands[i:i + records_per_file]
-        
-        filename = f"{file_count:02d}_insert_batch_{i+1}_to_{min(i+records_per_file, len(insert_commands))}.sql"
-        filepath = os.path.join(output_dir, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write('-- Lote de inserção de dados\n')
-            f.write(f'-- Registros {i+1} a {min(i+records_per_file, len(insert_commands))}\n\n')
-            
-            for insert_cmd in batch:
-                f.write(insert_cmd)
-                f.write('\n\n')
-        
-        print(f"✅ Criado: {filepath} ({len(batch)} comandos INSERT)")
-    
-    # Criar arquivo final com cleanup
-    cleanup_content = '\n'.join(footer_commands).strip()
-    if cleanup_content:
-        cleanup_file = os.path.join(output_dir, f'{file_count+1:02d}_cleanup.sql')
-        with open(cleanup_file, 'w', encoding='utf-8') as f:
-            f.write(cleanup_content)
-        print(f"✅ Criado: {cleanup_file}")
-    
-    # Criar arquivo de instruções
-    instructions_file = os.path.join(output_dir, 'README_INSTRUCTIONS.md')
-    with open(instructions_file, 'w', encoding='utf-8') as f:
-        f.write(f"""# Instruções para Importação dos Dados
 
-## Arquivos Gerados
+        # Adicionar à seção apropriada
+        if current_section in ('header', 'footer'):
+            yield current_section, line
 
-O arquivo SQL original foi dividido em {file_count + 2} arquivos menores:
+class _CharCounter:
+    """Itera sobre as linhas de um arquivo contando os caracteres lidos"""
 
-### 1. Setup (00_setup.sql)
-- Desabilita RLS temporariamente
-- Deve ser executado PRIMEIRO
+    def __init__(self, f):
+        self.f = f
+        self.chars = 0
 
-### 2. Lotes de Inserção (01_insert_batch_*.sql)
-- {file_count} arquivos com até {records_per_file} registros cada
-- Execute em ordem numérica
-- Aguarde cada arquivo terminar antes do próximo
+    def __iter__(self):
+        for line in self.f:
+            self.chars += len(line)
+            yield line
 
-### 3. Cleanup ({file_count+1:02d}_cleanup.sql)
-- Reabilita RLS
-- Comandos de verificação
-- Deve ser executado POR ÚLTIMO
+def write_insert_batch_file(output_dir, file_count, first_record, batch, compression=None, metrics=NULL_METRICS):
+    """Grava um arquivo NN_insert_batch_A_to_B.sql (.gz/.zst com compression) com os comandos do lote"""
+    last_record = first_record + len(batch) - 1
+    filepath = os.path.join(output_dir, compressed_path(batch_filename(file_count, first_record, last_record), compression))
 
-## Como Executar
+    with metrics.stage('write', batch=file_count) as stage:
+        with open_text_output(filepath, compression) as f:
+            f.write('-- Lote de inserção de dados\n')
+            f.write(f'-- Registros {first_record} a {last_record}\n\n')
 
-### No Supabase Dashboard:
+            for insert_cmd in batch:
+                f.write(insert_cmd)
+                f.write('\n\n')
+        stage.add(bytes=os.path.getsize(filepath))
 
-1. Acesse o **SQL Editor** no Supabase Dashboard
-2. Execute os arquivos na ordem:
-   ```
-   00_setup.sql
-   01_insert_batch_1_to_{min(records_per_file, len(insert_commands))}.sql
-   02_insert_batch_{records_per_file+1}_to_{min(records_per_file*2, len(insert_commands))}.sql
-   ...
-   {file_count+1:02d}_cleanup.sql
-   ```
+    print(f"✅ Criado: {filepath} ({len(batch)} comandos INSERT)")
 
-3. **IMPORTANTE**: Aguarde cada arquivo terminar completamente antes de executar o próximo
+def split_large_sql_file(input_file, output_dir='sql_batches', records_per_file=500, compression=None,
+                         metrics=NULL_METRICS):
+    """
+    Divide um arquivo SQL grande em arquivos menores
 
-4. Se algum arquivo der erro, você pode re-executá-lo individualmente
+    O arquivo é lido de forma incremental e cada lote é gravado assim que
+    fica cheio, então o uso de memória fica limitado a um lote.
 
-### Verificação
+    Args:
+        input_file: Caminho do arquivo SQL original (pode estar compactado com gzip/zstd)
+        output_dir: Diretório para salvar os arquivos divididos
+        records_per_file: Número de registros por arquivo
+        compression: 'gzip' ou 'zstd' para compactar os lotes de inserção; setup,
+            cleanup e instruções continuam em texto, para abrir no SQL Editor
+        metrics: import_metrics.ImportMetrics que recebe as etapas 'parse' (leitura e
+            separação dos comandos, por comando) e 'write' (por arquivo gerado)
+    """
 
-Após executar todos os arquivos, verifique:
+    # Criar diretório de saída
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"📁 Criado diretório: {output_dir}")
 
-```sql
--- Contar total de registros
-SELECT COUNT(*) as total_leads FROM public.leads;
+    print(f"📖 Lendo arquivo: {input_file}")
 
--- Verificar alguns registros
-SELECT * FROM public.leads LIMIT 10;
+    header_commands = []
+    footer_commands = []
+    batch = []
+    total_inserts = 0
+    file_count = 0
+    setup_written = False
+
+    with open_text_input(input_file) as f:
+        reader = _CharCounter(f)
+
+        sections = metrics.timed(iter_sql_sections(reader), 'parse', bytes=lambda item: len(item[1]))
+
+        for section, content in sections:
+            if section == 'header':
+                header_commands.append(content)
+            elif section == 'footer':
+                footer_commands.append(content)
+            else:
+                # O cabeçalho termina no primeiro INSERT
+                if not setup_written:
+                    write_setup_file(output_dir, header_commands)
+                    setup_written = True
+
+                batch.append(content)
+                total_inserts += 1
+
+                # Dividir INSERTs em arquivos
+                if len(batch) >= records_per_file:
+                    file_count += 1
+                    write_insert_batch_file(output_dir, file_count, total_inserts - len(batch) + 1, batch, compression, metrics)
+                    batch = []
+
+    if batch:
+        file_count += 1
+        write_insert_batch_file(output_dir, file_count, total_inserts - len(batch) + 1, batch, compression, metrics)
 
--- Verificar RLS está ativo
-SELECT schemaname, tablename, rowsecurity 
-FROM pg_tables 
-WHERE tablename = 'leads';
-```
+    if not setup_written:
+        write_setup_file(output_dir, header_commands)
 
-## Solução de Problemas
+    total_chars = reader.chars
+    print(f"📏 Tamanho: {total_chars:,} caracteres")
 
-- **Erro de timeout**: Reduza o tamanho dos lotes (re-execute este script com records_per_file menor)
-- **Erro de permissão**: Verifique se RLS foi desabilitado no setup
-- **Dados duplicados**: Use `DELETE FROM leads WHERE lead_id = 'ID_ESPECÍFICO';` para remover duplicatas
+    print(f"📊 Encontrados:")
+    print(f"   • Comandos de cabeçalho: {len([c for c in header_commands if c.strip()])}")
+    print(f"   • Comandos INSERT: {total_inserts}")
+    print(f"   • Comandos de rodapé: {len([c for c in footer_commands if c.strip()])}")
 
-## Estatísticas
+    write_cleanup_file(output_dir, file_count, footer_commands)
+    instructions_file = write_instructions_file(output_dir, file_count, records_per_file, total_inserts, total_chars)
 
-- **Total de registros**: {len(insert_commands):,}
-- **Registros por arquivo**: {records_per_file}
-- **Arquivos gerados**: {file_count + 2}
-- **Tamanho original**: {len(content):,} caracteres
-""")
-    
     print(f"\n📋 Criado arquivo de instruções: {instructions_file}")
     
     print(f"\n🎉 Divisão concluída!")
     print(f"📊 Estatísticas:")
-    print(f"   • Arquivo original: {len(content):,} caracteres")
-    print(f"   • Total de registros: {len(insert_commands):,}")
+    print(f"   • Arquivo original: {total_chars:,} caracteres")
+    print(f"   • Total de registros: {total_inserts:,}")
     print(f"   • Arquivos gerados: {file_count + 2}")
     print(f"   • Registros por arquivo: {records_per_file}")
     
     print(f"\n📁 Arquivos salvos em: {output_dir}/")
     print(f"\n💡 Próximos passos:")
     print(f"   1. Leia as instruções em: {instructions_file}")
-    print(f"   2. Execute os arquivos em ordem no Supabase SQL Editor")
+    if compression:
+        # O SQL Editor não abre arquivos compactados; o psql recebe o texto descompactado por um pipe
+        print(f"   2. Execute os lotes com: python import-direct-psql.py --dir {output_dir}")
+    else:
+        print(f"   2. Execute os arquivos em ordem no Supabase SQL Editor")
     print(f"   3. Comece com: {output_dir}/00_setup.sql")
 
 def main():
-    input_file = '/Users/marcosdaniels/Downloads/project/insert-leads-data.sql'
-    output_dir = '/Users/marcosdaniels/Downloads/project/sql_batches'
+    parser = argparse.ArgumentParser(description='Divide o SQL gerado por csv-to-sql.py em lotes menores')
+    parser.add_argument('--input', default='/Users/marcosdaniels/Downloads/project/insert-leads-data.sql',
+                        help='Arquivo SQL de origem')
+    parser.add_argument('--output-dir', default='/Users/marcosdaniels/Downloads/project/sql_batches',
+                        help='Diretório dos lotes')
+    # 500 registros por arquivo (mais conservador)
+    parser.add_argument('--records-per-file', type=int, default=500, help='Comandos INSERT por arquivo')
+    add_compression_argument(parser)
+    add_metrics_argument(parser)
+    args = parser.parse_args()
+    
+    if not os.path.exists(args.input):
+        print(f"❌ Arquivo não encontrado: {args.input}")
+        return
     
-    if not os.path.exists(input_file):
-        print(f"❌ Arquivo não encontrado: {input_file}")
+    if not compression_available(args.compress):
         return
     
     print("🔪 Dividindo arquivo SQL em lotes menores...")
     
-    # Dividir em arquivos de 500 registros (mais conservador)
-    split_large_sql_file(input_file, output_dir, records_per_file=500)
+    metrics = ImportMetrics('split-sql-file', args.metrics)
+    try:
+        split_large_sql_file(args.input, args.output_dir, records_per_file=args.records_per_file,
+                             compression=args.compress, metrics=metrics)
+    finally:
+        metrics.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Tokenizador dos comandos INSERT ... VALUES gerados por csv-to-sql.py
+Lê o arquivo em blocos, numa única passada, e gera um dicionário (ou lista de valores) por registro
+"""
+
+import io
+import re
+
+from import_metrics import NULL_METRICS
+
+# Os padrões evitam quantificadores aninhados ambíguos (ex.: (?:\s+)*) para que uma
+# falha de casamento no fim do bloco não cause backtracking exponencial
+
+# Espaços e comentários entre comandos, seguidos da primeira palavra do comando
+_STATEMENT_START = re.compile(r"(?:\s|--[^\n]*\n)*([A-Za-z]+)")
+# Fim de espaços/comentários no final do arquivo
+_TRAILING = re.compile(r"(?:\s|--[^\n]*(?:\n|$))*$")
+# Restante de um comando que não é INSERT, respeitando strings, comentários e corpos
+# entre $tag$ ... $tag$ (ex.: o bloco DO do recálculo das contagens do dashboard)
+_SKIP_STATEMENT = re.compile(
+    r"(?:[^';$-]|'[^']*(?:''[^']*)*'|--[^\n]*\n|-(?!-)|\$(\w*)\$.*?\$\1\$|\$(?!\w*\$))*;", re.DOTALL)
+# INTO tabela (colunas) VALUES
+_INSERT_HEADER = re.compile(r"\s+INTO\s+([\w.\"]+)\s*\(([^)]*)\)\s*VALUES\s*", re.IGNORECASE)
+_TUPLE_START = re.compile(r"\s*\(")
+# Um valor seguido do separador: string entre aspas, NULL ou literal sem aspas
+_VALUE_PATTERN = r"\s*(?:'([^']*(?:''[^']*)*)'|((?i:NULL))|([^\s,()']+))"
+_VALUE = re.compile(_VALUE_PATTERN + r"\s*([,)])")
+_TUPLE_END = re.compile(r"\s*([,;])")
+
+_tuple_patterns = {}
+
+def _tuple_pattern(column_count):
+    """Padrão que casa um registro inteiro de uma vez (caminho rápido); compilado uma vez por nº de colunas"""
+    if column_count not in _tuple_patterns:
+        values = r"\s*,".join([_VALUE_PATTERN] * column_count)
+        _tuple_patterns[column_count] = re.compile(r"\s*\(" + values + r"\s*\)\s*([,;])")
+    return _tuple_patterns[column_count]
+
+class SQLValuesError(ValueError):
+    """Erro de sintaxe no arquivo SQL"""
+
+class InsertValuesTokenizer:
+    """
+    Percorre um arquivo SQL e gera (tabela, colunas, linhas) para cada INSERT
+
+    O buffer guarda apenas o bloco atual, então o consumo de memória não depende
+    do tamanho do arquivo; cada caractere é examinado um número constante de vezes.
+
+    Args:
+        source: Arquivo aberto em modo texto ou string com o SQL
+        chunk_size: Quantidade de caracteres lida por vez
+        on_other: Função chamada com o texto de cada comando que não é INSERT
+        metrics: import_metrics.ImportMetrics que recebe a leitura de cada bloco como 'read'
+        records: Se False, cada registro é a lista de valores na ordem das colunas, sem dicionário
+    """
+
+    def __init__(self, source, chunk_size=1 << 20, on_other=None, metrics=NULL_METRICS, records=True):
+        self.source = io.StringIO(source) if isinstance(source, str) else source
+        self.chunk_size = chunk_size
+        self.on_other = on_other
+        self.metrics = metrics
+        self.records = records
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.statement = 0
+
+    def _fill(self):
+        # Se nenhum token coube no bloco atual, lê blocos maiores para manter o custo linear
+        read_size = self.chunk_size if self.pos else max(self.chunk_size, len(self.buf))
+        with self.metrics.stage('read') as stage:
+            chunk = self.source.read(read_size)
+            stage.add(bytes=len(chunk))
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        if not chunk:
+            self.eof = True
+
+    def _match(self, pattern):
+        """Casa o padrão na posição atual, lendo mais dados se o token puder continuar"""
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if self.eof or (m is not None and m.end() < len(self.buf)):
+                if m is not None:
+                    self.pos = m.end()
+                return m
+            self._fill()
+
+    def _try_match(self, pattern):
+        """Casa o padrão apenas no bloco já lido; None se não casar ou se puder continuar no próximo bloco"""
+        m = pattern.match(self.buf, self.pos)
+        if m is not None and (m.end() < len(self.buf) or self.eof):
+            self.pos = m.end()
+            return m
+        return None
+
+    def _error(self, message):
+        context = self.buf[self.pos:self.pos + 60].replace('\n', ' ')
+        return SQLValuesError(f"Comando {self.statement}: {message} perto de: {context!r}")
+
+    def _parse_values(self):
+        """Lê os valores de um registro, um a um (caminho lento, com mensagens de erro precisas)"""
+        if self._match(_TUPLE_START) is None:
+            raise self._error("esperado '('")
+
+        values = []
+        while True:
+            m = self._match(_VALUE)
+            if m is None:
+                raise self._error("valor inválido")
+
+            quoted, null, literal, separator = m.groups()
+            if quoted is not None:
+                values.append(quoted.replace("''", "'") if "''" in quoted else quoted)
+            elif null is not None:
+                values.append(None)
+            else:
+                values.append(literal)
+
+            if separator == ')':
+                return values
+
+    def _parse_rows(self, columns):
+        expected = len(columns)
+        fast_tuple = _tuple_pattern(expected)
+        rows = []
+
+        while True:
+            # Caminho rápido: registro inteiro dentro do bloco atual; nas bordas do bloco
+            # (ou em erro de sintaxe) usa a leitura valor a valor
+            m = self._try_match(fast_tuple)
+            if m is not None:
+                groups = m.groups()
+                values = []
+                for i in range(0, 3 * expected, 3):
+                    quoted = groups[i]
+                    if quoted is not None:
+                        values.append(quoted.replace("''", "'") if "''" in quoted else quoted)
+                    elif groups[i + 1] is not None:
+                        values.append(None)
+                    else:
+                        values.append(groups[i + 2])
+                rows.append(values)
+                end = groups[-1]
+            else:
+                values = self._parse_values()
+                if len(values) != expected:
+                    raise self._error(f"registro com {len(values)} valores, esperados {expected}")
+                rows.append(values)
+
+                m = self._match(_TUPLE_END)
+                if m is None:
+                    raise self._error("esperado ',' ou ';'")
+                end = m.group(1)
+
+            if end == ';':
+                return [dict(zip(columns, values)) for values in rows] if self.records else rows
+
+    def __iter__(self):
+        while True:
+            m = self._match(_STATEMENT_START)
+            if m is None:
+                if self._match(_TRAILING) is None or self.pos < len(self.buf):
+                    raise self._error("comando inválido")
+                return
+
+            self.statement += 1
+            keyword = m.group(1)
+
+            if keyword.upper() != 'INSERT':
+                rest = self._match(_SKIP_STATEMENT)
+                if rest is None:
+                    raise self._error("comando sem ';'")
+                if self.on_other:
+                    self.on_other(keyword + rest.group(0))
+                continue
+
+            header = self._match(_INSERT_HEADER)
+            if header is None:
+                raise self._error("INSERT sem lista de colunas e VALUES")
+
+            table = header.group(1)
+            columns = [column.strip() for column in header.group(2).split(',')]
+            yield table, columns, self._parse_rows(columns)
+
+def iter_insert_statements(source, on_other=None, chunk_size=1 << 20, metrics=NULL_METRICS):
+    """Gera a lista de registros (dicionários) de cada comando INSERT"""
+    for _, _, rows in InsertValuesTokenizer(source, chunk_size, on_other, metrics):
+        yield rows
+
+def iter_insert_rows(source, on_other=None, chunk_size=1 << 20, metrics=NULL_METRICS):
+    """Gera os registros de todos os comandos INSERT, um dicionário por vez"""
+    for rows in iter_insert_statements(source, on_other, chunk_size, metrics):
+        yield from rows
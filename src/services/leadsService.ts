@@ -1,5 +1,14 @@
 import { supabase, Lead, LeadsByState, WorkPermitData, FunnelStageData } from '../lib/supabase'
 
+interface DashboardCount {
+  bucket: string
+  total_leads: number
+  conversions: number
+}
+
+// Cache das contagens (dashboard-cache-server.py); sem a variável, consulta o Supabase direto
+const DASHBOARD_CACHE_URL = import.meta.env.VITE_DASHBOARD_CACHE_URL?.replace(/\/$/, '')
+
 export class LeadsService {
   // Buscar todos os leads
   static async getAllLeads(): Promise<Lead[]> {
@@ -16,126 +25,75 @@ export class LeadsService {
     return data || []
   }
 
-  // Buscar leads por estado
-  static async getLeadsByState(): Promise<LeadsByState[]> {
+  // Buscar contagens pré-calculadas (tabela leads_dashboard_counts, mantida pelos gatilhos de public.leads:
+  // createLead/updateLead/deleteLead também atualizam as contagens)
+  private static async getDashboardCounts(dimension: string): Promise<DashboardCount[]> {
+    if (DASHBOARD_CACHE_URL) {
+      try {
+        const response = await fetch(`${DASHBOARD_CACHE_URL}/dashboard-counts/${dimension}`)
+        if (response.ok) {
+          return await response.json()
+        }
+        console.warn(`Cache do dashboard indisponível (${response.status}); consultando o Supabase`)
+      } catch (error) {
+        console.warn('Cache do dashboard indisponível; consultando o Supabase:', error)
+      }
+    }
+
     const { data, error } = await supabase
-      .from('leads')
-      .select('estado_contato')
-      .not('estado_contato', 'is', null)
+      .from('leads_dashboard_counts')
+      .select('bucket, total_leads, conversions')
+      .eq('dimension', dimension)
+      .gt('total_leads', 0)
 
     if (error) {
-      console.error('Erro ao buscar leads por estado:', error)
+      console.error(`Erro ao buscar contagens do dashboard (${dimension}):`, error)
       throw error
     }
 
-    // Agrupar e contar por estado
-    const stateCount: { [key: string]: number } = {}
-    data?.forEach(lead => {
-      const estado = lead.estado_contato?.trim()
-      if (estado) {
-        stateCount[estado] = (stateCount[estado] || 0) + 1
-      }
-    })
+    return data || []
+  }
 
-    return Object.entries(stateCount).map(([estado, total_leads]) => ({
-      estado,
+  // Buscar leads por estado
+  static async getLeadsByState(): Promise<LeadsByState[]> {
+    const counts = await this.getDashboardCounts('estado_contato')
+
+    return counts.map(({ bucket, total_leads }) => ({
+      estado: bucket,
       total_leads
     }))
   }
 
   // Buscar dados de permissão de trabalho
   static async getWorkPermitData(): Promise<WorkPermitData[]> {
-    const { data, error } = await supabase
-      .from('leads')
-      .select('permissao_trabalho')
-      .not('permissao_trabalho', 'is', null)
-
-    if (error) {
-      console.error('Erro ao buscar dados de permissão de trabalho:', error)
-      throw error
-    }
-
-    // Agrupar e contar por permissão de trabalho
-    const permitCount: { [key: string]: number } = {}
-    data?.forEach(lead => {
-      const permissao = lead.permissao_trabalho?.trim()
-      if (permissao) {
-        permitCount[permissao] = (permitCount[permissao] || 0) + 1
-      }
-    })
+    const counts = await this.getDashboardCounts('permissao_trabalho')
 
-    return Object.entries(permitCount).map(([permissao_trabalho, total_leads]) => ({
-      permissao_trabalho,
+    return counts.map(({ bucket, total_leads }) => ({
+      permissao_trabalho: bucket,
       total_leads
     }))
   }
 
   // Buscar dados do funil de vendas
   static async getFunnelStageData(): Promise<FunnelStageData[]> {
-    const { data, error } = await supabase
-      .from('leads')
-      .select('etapa_funil')
-      .not('etapa_funil', 'is', null)
+    const counts = await this.getDashboardCounts('etapa_funil')
 
-    if (error) {
-      console.error('Erro ao buscar dados do funil:', error)
-      throw error
-    }
-
-    // Agrupar e contar por etapa do funil
-    const stageCount: { [key: string]: number } = {}
-    data?.forEach(lead => {
-      const etapa = lead.etapa_funil?.trim()
-      if (etapa) {
-        stageCount[etapa] = (stageCount[etapa] || 0) + 1
-      }
-    })
-
-    return Object.entries(stageCount).map(([etapa_funil, total_leads]) => ({
-      etapa_funil,
+    return counts.map(({ bucket, total_leads }) => ({
+      etapa_funil: bucket,
       total_leads
     }))
   }
 
-  // Buscar evolução mensal dos leads
+  // Buscar evolução mensal dos leads (mês de data_criada, YYYY-MM)
   static async getMonthlyEvolution(): Promise<{ month: string; leads: number; conversions: number }[]> {
-    const { data, error } = await supabase
-      .from('leads')
-      .select('data_criada, etapa_funil')
-      .not('data_criada', 'is', null)
-      .order('data_criada', { ascending: true })
-
-    if (error) {
-      console.error('Erro ao buscar evolução mensal:', error)
-      throw error
-    }
-
-    // Agrupar por mês
-    const monthlyData: { [key: string]: { leads: number; conversions: number } } = {}
-    
-    data?.forEach(lead => {
-      if (lead.data_criada) {
-        const date = new Date(lead.data_criada)
-        const monthKey = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`
-        
-        if (!monthlyData[monthKey]) {
-          monthlyData[monthKey] = { leads: 0, conversions: 0 }
-        }
-        
-        monthlyData[monthKey].leads++
-        
-        // Considerar conversão se chegou ao meeting realizado
-        if (lead.etapa_funil?.includes('meeting realizado')) {
-          monthlyData[monthKey].conversions++
-        }
-      }
-    })
-
-    return Object.entries(monthlyData)
-      .map(([month, data]) => ({
-        month,
-        leads: data.leads,
-        conversions: data.conversions
+    const counts = await this.getDashboardCounts('mes_criacao')
+
+    // Conversão = chegou ao meeting realizado
+    return counts
+      .map(({ bucket, total_leads, conversions }) => ({
+        month: bucket,
+        leads: total_leads,
+        conversions
       }))
       .sort((a, b) => a.month.localeCompare(b.month))
   }
@@ -192,19 +150,10 @@ export class LeadsService {
     meetingsRealized: number
     conversionRate: number
   }> {
-    const { data, error } = await supabase
-      .from('leads')
-      .select('etapa_funil')
-
-    if (error) {
-      console.error('Erro ao buscar estatísticas:', error)
-      throw error
-    }
+    const [total] = await this.getDashboardCounts('total')
 
-    const totalLeads = data?.length || 0
-    const meetingsRealized = data?.filter(lead => 
-      lead.etapa_funil?.includes('meeting realizado')
-    ).length || 0
+    const totalLeads = total?.total_leads || 0
+    const meetingsRealized = total?.conversions || 0
     
     const conversionRate = totalLeads > 0 ? (meetingsRealized / totalLeads) * 100 : 0
 
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP local que imita o endpoint /rest/v1/leads do PostgREST (Supabase)
+Usado para testar e medir os importadores sem tocar no banco de produção
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lead_schema import DATE_COLUMNS
+
+# Colunas NOT NULL de public.leads (final-import.sql)
+REQUIRED_COLUMNS = ('contato_principal', 'etapa_funil', 'permissao_trabalho')
+
+def invalid_row_error(rows):
+    """Erro no formato do PostgREST para o primeiro registro que o banco rejeitaria (None se todos são válidos)"""
+    for row in rows:
+        for column in REQUIRED_COLUMNS:
+            if row.get(column) is None:
+                return {'code': '23502', 'message': f'null value in column "{column}" of relation "leads" '
+                                                    f'violates not-null constraint'}
+        for column in DATE_COLUMNS:
+            value = row.get(column)
+            if value is not None:
+                try:
+                    datetime.date.fromisoformat(value)
+                except (TypeError, ValueError):
+                    return {'code': '22008', 'message': f'date/time field value out of range: "{value}"'}
+    return None
+
+class StubState:
+    """Contadores compartilhados entre as requisições"""
+
+    def __init__(self, throttle_rate=0.0, unavailable_rate=0.0, latency=0.0, row_latency=0.0, timeout_rows=0,
+                 accept_gzip=True):
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.latency = latency
+        self.row_latency = row_latency
+        self.timeout_rows = timeout_rows
+        self.accept_gzip = accept_gzip
+        self.lock = threading.Lock()
+        self.rows = 0
+        self.requests = 0
+        self.rejected = 0
+        self.bytes = 0
+        self.json_bytes = 0
+        self.rpc_calls = 0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'rows': self.rows,
+                'requests': self.requests,
+                'rejected': self.rejected,
+                'bytes': self.bytes,
+                'json_bytes': self.json_bytes,
+                'rpc_calls': self.rpc_calls,
+            }
+
+def make_handler(state):
+    class PostgrestStubHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 para permitir keep-alive, como o PostgREST real
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload=None, headers=None):
+            body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if body:
+                self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/stats':
+                self._reply(200, state.snapshot())
+            else:
+                self._reply(404, {'message': 'Not found'})
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            path = self.path.split('?')[0]
+            rpc = path.startswith('/rest/v1/rpc/')
+
+            if not rpc and path != '/rest/v1/leads':
+                self._reply(404, {'message': f'Relation not found: {self.path}'})
+                return
+
+            if not self.headers.get('apikey'):
+                self._reply(401, {'message': 'No API key found in request'})
+                return
+
+            # bytes conta o que trafegou; json_bytes, o corpo depois de descompactado
+            raw_size = len(body)
+            if self.headers.get('Content-Encoding') == 'gzip':
+                if not state.accept_gzip:
+                    self._reply(415, {'message': 'Unsupported Content-Encoding: gzip'})
+                    return
+                body = gzip.decompress(body)
+
+            if state.latency:
+                time.sleep(state.latency)
+
+            roll = random.random()
+            if roll < state.throttle_rate:
+                with state.lock:
+                    state.rejected += 1
+                self._reply(429, {'message': 'Too Many Requests'}, {'Retry-After': '1'})
+                return
+            if roll < state.throttle_rate + state.unavailable_rate:
+                with state.lock:
+                    state.rejected += 1
+                self._reply(503, {'message': 'Service Unavailable'})
+                return
+
+            try:
+                rows = json.loads(body)
+            except ValueError as e:
+                self._reply(400, {'code': 'PGRST102', 'message': f'Invalid JSON: {e}'})
+                return
+
+            if rpc:
+                # Funções do banco: upsert_leads_counted recebe {"records": [...]}; as demais só são contadas
+                with state.lock:
+                    state.rpc_calls += 1
+                rows = rows.get('records') if isinstance(rows, dict) else None
+                if not rows:
+                    self._reply(200, 0)
+                    return
+
+            if isinstance(rows, dict):
+                rows = [rows]
+
+            if state.row_latency:
+                time.sleep(state.row_latency * len(rows))
+
+            if state.timeout_rows and len(rows) > state.timeout_rows:
+                with state.lock:
+                    state.rejected += 1
+                self._reply(500, {'code': '57014', 'message': 'canceling statement due to statement timeout'})
+                return
+
+            # Como no banco, o lote inteiro é rejeitado por um único registro inválido
+            error = invalid_row_error(rows)
+            if error is not None:
+                with state.lock:
+                    state.rejected += 1
+                self._reply(400, error)
+                return
+
+            with state.lock:
+                state.rows += len(rows)
+                state.requests += 1
+                state.bytes += raw_size
+                state.json_bytes += len(body)
+
+            if rpc:
+                self._reply(200, len(rows))
+            else:
+                self._reply(201)
+
+    return PostgrestStubHandler
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor stub do endpoint PostgREST /rest/v1/leads')
+    parser.add_argument('--port', type=int, default=54321, help='Porta local')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fração de requisições respondidas com 429')
+    parser.add_argument('--unavailable-rate', type=float, default=0.0, help='Fração de requisições respondidas com 503')
+    parser.add_argument('--latency', type=float, default=0.0, help='Atraso por requisição, em segundos')
+    parser.add_argument('--row-latency', type=float, default=0.0, help='Atraso adicional por registro, em segundos')
+    parser.add_argument('--timeout-rows', type=int, default=0,
+                        help='Lotes com mais registros que isso recebem 500 (statement timeout); 0 desativa')
+    parser.add_argument('--no-gzip', action='store_true',
+                        help='Responder 415 a corpos com Content-Encoding: gzip (como um servidor que não os aceita)')
+    args = parser.parse_args()
+
+    state = StubState(args.throttle_rate, args.unavailable_rate, args.latency, args.row_latency, args.timeout_rows,
+                      accept_gzip=not args.no_gzip)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(state))
+
+    print(f"🧪 Stub PostgREST em http://127.0.0.1:{args.port}/rest/v1/leads")
+    print("💡 Use VITE_SUPABASE_URL=http://127.0.0.1:%d nos importadores; GET /stats mostra os contadores" % args.port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Contadores finais: {state.snapshot()}")
+
+if __name__ == '__main__':
+    main()
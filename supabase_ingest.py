@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Cliente assíncrono para inserção de leads em lotes via API REST do Supabase (PostgREST)
+Mantém uma única sessão HTTP com keep-alive e limita o número de lotes em andamento
+"""
+
+import asyncio
+import gzip
+import json
+import random
+import time
+
+import aiohttp
+
+from import_metrics import NULL_METRICS
+from quarantine import is_row_error, isolate_row_errors_async
+
+# Status que indicam sobrecarga do servidor: aguardar e tentar de novo
+RETRY_STATUS = {429, 503}
+SUCCESS_STATUS = {200, 201, 204}
+# Falhas que podem ser causadas por um lote grande demais (corpo, timeout de statement, gateway)
+SIZE_ERROR_STATUS = {413, 500, 502, 504}
+# Respostas do PostgREST a erros do banco causados por um registro (o corpo traz o SQLSTATE em "code")
+ROW_ERROR_STATUS = {400, 409}
+# Respostas de um servidor que não descompacta o corpo: 415, ou o PostgREST lendo o gzip como JSON inválido
+GZIP_REJECTED_STATUS = {415}
+GZIP_REJECTED_CODE = 'PGRST102'
+# ON CONFLICT numa coluna sem índice único (ex.: lead_id na tabela particionada de leads-partitioned.sql)
+NO_CONFLICT_TARGET_CODE = '42P10'
+# Os lotes JSON são muito repetitivos (mesmos nomes de colunas e valores em todo registro)
+REQUEST_GZIP_LEVEL = 6
+
+def response_sqlstate(text):
+    """SQLSTATE ("code") do corpo de erro do PostgREST, se houver"""
+    try:
+        error = json.loads(text)
+    except ValueError:
+        return None
+    return error.get('code') if isinstance(error, dict) else None
+
+class IngestStats:
+    """Contadores de uma execução de ingestão"""
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.failed_rows = 0
+        self.quarantined_rows = 0
+        self.retries = 0
+        # Bytes de cada lote contados uma vez; os reenvios (429/503/rede, gzip recusado) ficam à parte
+        self.body_bytes = 0
+        self.sent_bytes = 0
+        self.resent_bytes = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        end = self.finished if self.finished is not None else time.perf_counter()
+        return end - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+class LeadsIngestClient:
+    """
+    Envia lotes de leads para /rest/v1/leads com conexões persistentes
+
+    Args:
+        supabase_url: URL do projeto Supabase (ou do servidor stub local)
+        supabase_key: Chave usada nos cabeçalhos apikey/Authorization
+        max_in_flight: Número máximo de lotes enviados simultaneamente
+        max_retries: Tentativas extras por lote em caso de 429/503 ou erro de rede; um INSERT
+            simples (sem upsert_on nem rpc) só é repetido se a conexão nem chegou a ser aberta,
+            porque depois de um timeout a primeira tentativa pode já ter sido gravada
+        timeout: Timeout total de cada requisição, em segundos
+        upsert_on: Coluna única para upsert (ex.: 'lead_id'); None faz INSERT simples
+        rpc: Enviar cada lote para /rest/v1/rpc/<rpc> como {rpc_param: [registros]} em vez de
+            /rest/v1/leads (ex.: upsert_leads_counted, que também ajusta as contagens do dashboard)
+        rpc_param: Nome do parâmetro da função que recebe os registros
+        batch_sizer: AdaptiveBatchSizer que recebe a latência de cada lote (opcional)
+        quarantine: quarantine.QuarantineFile; se informado, um lote rejeitado por erro de
+            registro (SQLSTATE 22xxx/23xxx) é dividido ao meio até isolar os registros ruins,
+            que vão para o arquivo com o erro do servidor; os demais são gravados
+        gzip_requests: Enviar os corpos com Content-Encoding: gzip; se o servidor recusar
+            (415 ou JSON inválido), o cliente passa a enviar sem compressão e reenvia o lote
+        metrics: import_metrics.ImportMetrics que recebe cada requisição: 'network' para as
+            bem-sucedidas, 'failed' para as que falharam (opcional)
+    """
+
+    def __init__(self, supabase_url, supabase_key, max_in_flight=4, max_retries=5, timeout=60, upsert_on=None,
+                 batch_sizer=None, metrics=NULL_METRICS, rpc=None, rpc_param='records', quarantine=None,
+                 gzip_requests=False):
+        self.leads_url = f"{supabase_url.rstrip('/')}/rest/v1/leads"
+        self.body_wrapper = None
+        self.headers = {
+            'apikey': supabase_key,
+            'Authorization': f'Bearer {supabase_key}',
+            'Content-Type': 'application/json',
+            'Prefer': 'return=minimal'
+        }
+        if upsert_on:
+            self.leads_url += f"?on_conflict={upsert_on}"
+            self.headers['Prefer'] = 'resolution=merge-duplicates,return=minimal'
+        if rpc:
+            # O upsert fica a cargo da função; o array JSON do lote vira o valor do parâmetro
+            self.leads_url = f"{supabase_url.rstrip('/')}/rest/v1/rpc/{rpc}"
+            self.headers['Prefer'] = 'return=minimal'
+            self.body_wrapper = (f'{{"{rpc_param}": '.encode('utf-8'), b'}')
+        # Reenviar um upsert não duplica nada; um INSERT simples reenviado daria 23505 (ou duplicaria)
+        self.idempotent = bool(upsert_on or rpc)
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.batch_sizer = batch_sizer
+        self.metrics = metrics
+        self.quarantine = quarantine
+        self.gzip_requests = gzip_requests
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.stats = IngestStats()
+        self._session = None
+        self._paused_until = 0.0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        """Calcula a espera: usa Retry-After se vier do servidor, senão backoff exponencial com jitter"""
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+
+        return min(0.5 * (2 ** attempt), 30.0) * random.uniform(0.5, 1.0)
+
+    def _pause(self, delay):
+        """Pausa todos os envios: se o servidor está sobrecarregado, nenhum lote deve insistir"""
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    async def _wait_if_paused(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def post_batch(self, rows):
+        """Envia um lote (lista de dicionários ou lote já serializado, com .body); retorna (sucesso, mensagem)"""
+        success, message, _, _, _ = await self._post_batch_timed(rows)
+        return success, message
+
+    async def _post_batch_timed(self, rows, resend=False):
+        """
+        Como post_batch, mas também retorna a duração da última tentativa, se a falha
+        pode ter sido causada pelo tamanho do lote (timeout, 413, erro 5xx do banco) e o
+        SQLSTATE, se foi causada por algum registro (ver ROW_ERROR_STATUS; senão None)
+
+        resend: o lote já foi contado em stats (reenvio sem gzip)
+        """
+        body = getattr(rows, 'body', None)
+        if body is None:
+            body = json.dumps(rows, ensure_ascii=False).encode('utf-8')
+        if self.body_wrapper is not None:
+            body = self.body_wrapper[0] + body + self.body_wrapper[1]
+
+        headers = None
+        payload = body
+        if self.gzip_requests:
+            # O zlib libera o GIL: compactar fora do loop não atrasa os outros lotes em andamento
+            payload = await asyncio.get_running_loop().run_in_executor(
+                None, gzip.compress, body, REQUEST_GZIP_LEVEL)
+            headers = {'Content-Encoding': 'gzip'}
+
+        if resend:
+            self.stats.resent_bytes += len(payload)
+        else:
+            self.stats.body_bytes += len(body)
+            self.stats.sent_bytes += len(payload)
+
+        for attempt in range(self.max_retries + 1):
+            await self._wait_if_paused()
+            started = time.perf_counter()
+            if attempt:
+                self.stats.resent_bytes += len(payload)
+
+            try:
+                async with self._session.post(self.leads_url, data=payload, headers=headers) as response:
+                    text = await response.text()
+                    seconds = time.perf_counter() - started
+
+                    if response.status in SUCCESS_STATUS:
+                        self.metrics.record('network', seconds, len(rows), len(payload))
+                        return True, f"Lote inserido com sucesso ({len(rows)} registros)", seconds, False, None
+
+                    self.metrics.record('failed', seconds, bytes=len(payload))
+
+                    if headers and self._gzip_rejected(response.status, text):
+                        # Sem compressão a partir daqui; este lote (e os já enviados com gzip) é reenviado
+                        if self.gzip_requests:
+                            self.gzip_requests = False
+                            print(f"⚠️  O servidor não aceitou o corpo com gzip (status {response.status}); "
+                                  f"enviando sem compressão")
+                        return await self._post_batch_timed(rows, resend=True)
+
+                    if response.status not in RETRY_STATUS:
+                        size_related = response.status in SIZE_ERROR_STATUS
+                        sqlstate = response_sqlstate(text)
+                        row_error = sqlstate if response.status in ROW_ERROR_STATUS and is_row_error(sqlstate) else None
+                        message = f"Status: {response.status}, Error: {text[:200]}"
+                        return False, message, seconds, size_related, row_error
+
+                    message = f"Status: {response.status}"
+                    delay = self._backoff_delay(attempt, response.headers.get('Retry-After'))
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                seconds = time.perf_counter() - started
+                self.metrics.record('failed', seconds, bytes=len(payload))
+                message = f"Erro de conexão: {e!r}"
+                if not self.idempotent and not isinstance(e, aiohttp.ClientConnectorError):
+                    # O lote pode ter sido gravado antes da falha: fica para o diário e o --resume
+                    return False, f"{message} (INSERT não repetido: o lote pode já estar gravado)", seconds, True, None
+                delay = self._backoff_delay(attempt)
+
+            if attempt < self.max_retries:
+                self.stats.retries += 1
+                self._pause(delay)
+
+        return False, f"{message} (após {self.max_retries + 1} tentativas)", time.perf_counter() - started, True, None
+
+    @staticmethod
+    def _gzip_rejected(status, text):
+        """True se a resposta indica que o servidor não descompactou o corpo com gzip"""
+        return status in GZIP_REJECTED_STATUS or (status == 400 and response_sqlstate(text) == GZIP_REJECTED_CODE)
+
+    async def _isolate_row_errors(self, batch_number, rows, message):
+        """
+        Divide o lote rejeitado até isolar os registros ruins e os põe em quarentena
+
+        Retorna (sucesso, mensagem); em lotes já serializados, rows.rejected recebe as
+        posições dos registros em quarentena (ex.: para não marcá-los como carregados) e,
+        se alguma metade falhou por outro motivo, rows.failed as posições não gravadas:
+        as outras metades já estão no banco e não devem ser reenviadas.
+        """
+        body = getattr(rows, 'body', None)
+        records = json.loads(body) if body is not None else list(rows)
+
+        async def load(positions):
+            success, error, _, _, row_error = await self._post_batch_timed([records[i] for i in positions])
+            return success, error, row_error
+
+        result = await isolate_row_errors_async(list(range(len(records))), load, message)
+        for position, error in result.rejected:
+            self.quarantine.add(f"lote {batch_number}", records[position], error)
+        if body is not None:
+            rows.rejected = tuple(sorted(position for position, _ in result.rejected))
+            rows.failed = tuple(sorted(position for positions, _ in result.failed for position in positions))
+
+        self.stats.rows += result.committed
+        self.stats.quarantined_rows += len(result.rejected)
+        summary = (f"{result.committed} registros inseridos, {len(result.rejected)} em quarentena "
+                   f"({result.loads} envios extras)")
+        if result.failed:
+            self.stats.failed_batches += 1
+            self.stats.failed_rows += result.failed_rows
+            return False, f"{summary}; {result.failed_rows} não enviados: {result.failed[0][1]}"
+        return True, summary
+
+    async def _send(self, batch_number, rows, on_result):
+        success, message, seconds, size_related, row_error = await self._post_batch_timed(rows)
+
+        self.stats.batches += 1
+        if success:
+            self.stats.rows += len(rows)
+        elif row_error and self.quarantine is not None:
+            success, message = await self._isolate_row_errors(batch_number, rows, message)
+        else:
+            self.stats.failed_batches += 1
+            self.stats.failed_rows += len(rows)
+
+        # Falhas de dados (ex.: 400, 409) não dizem nada sobre o tamanho ideal do lote
+        if self.batch_sizer is not None and (success or size_related) and not row_error:
+            self.batch_sizer.record(len(rows), seconds, success)
+
+        if on_result:
+            on_result(batch_number, rows, success, message)
+
+    async def ingest(self, batches, on_result=None):
+        """
+        Envia todos os lotes do iterável mantendo no máximo max_in_flight em andamento
+
+        O iterável é consumido sob demanda, então pode ser um gerador sobre um arquivo grande.
+        on_result(numero_lote, linhas, sucesso, mensagem) é chamado ao fim de cada lote.
+        """
+        slots = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+
+        async def run(batch_number, rows):
+            try:
+                await self._send(batch_number, rows, on_result)
+            finally:
+                slots.release()
+
+        for batch_number, rows in enumerate(batches, 1):
+            if not rows:
+                continue
+
+            await slots.acquire()
+            task = asyncio.ensure_future(run(batch_number, rows))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        if pending:
+            await asyncio.gather(*pending)
+
+        self.stats.finished = time.perf_counter()
+        return self.stats
+
+def ingest_batches(batches, supabase_url, supabase_key, on_result=None, **client_options):
+    """Atalho síncrono: envia os lotes com um LeadsIngestClient e retorna as estatísticas"""
+
+    async def run():
+        async with LeadsIngestClient(supabase_url, supabase_key, **client_options) as client:
+            return await client.ingest(batches, on_result)
+
+    return asyncio.run(run())
+
+def upsert_target_available(supabase_url, supabase_key, upsert_on):
+    """
+    Confere, com um lote vazio, se /rest/v1/leads aceita upsert com on_conflict=upsert_on
+
+    False só se o banco recusar a coluna do ON CONFLICT (NO_CONFLICT_TARGET_CODE); outras
+    falhas (rede, chave) não são decididas aqui e aparecem nos próprios lotes
+    """
+
+    async def run():
+        async with LeadsIngestClient(supabase_url, supabase_key, max_retries=0, upsert_on=upsert_on) as client:
+            return await client.post_batch([])
+
+    success, message = asyncio.run(run())
+    return success or NO_CONFLICT_TARGET_CODE not in message
+
+def call_rpc(supabase_url, supabase_key, function, params=None, timeout=300):
+    """Chama uma função do banco via /rest/v1/rpc/<função>; retorna (sucesso, resultado ou mensagem)"""
+    url = f"{supabase_url.rstrip('/')}/rest/v1/rpc/{function}"
+    headers = {
+        'apikey': supabase_key,
+        'Authorization': f'Bearer {supabase_key}',
+        'Content-Type': 'application/json',
+    }
+
+    async def run():
+        async with aiohttp.ClientSession(headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+            async with session.post(url, json=params or {}) as response:
+                text = await response.text()
+                if response.status not in SUCCESS_STATUS:
+                    return False, f"Status: {response.status}, Error: {text[:200]}"
+                return True, json.loads(text) if text else None
+
+    try:
+        return asyncio.run(run())
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        return False, f"Erro de conexão: {e!r}"
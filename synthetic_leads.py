@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Gerador de CSVs sintéticos no formato do export de leads do CRM
+Usado pelos benchmarks para medir os importadores com volumes de produção
+"""
+
+import csv
+import os
+import random
+
+from lead_schema import CSV_HEADERS
+
+NOMES_BR = ['Ana', 'João', 'Maria José', 'Luiz Fernando', 'Cláudia', 'Thaís', 'Conceição', 'Gonçalo',
+            'Edilaine', 'Vanessa', 'Fábio', 'Débora', 'Antônio', 'Lúcia', 'Édson', 'Rosângela']
+SOBRENOMES_BR = ['Silva', 'Souza', "D'Ávila", 'Gonçalves', 'Araújo', 'Fehribach', 'Conceição', 'Lima',
+                 'Magalhães', 'Assunção', 'Brandão', 'Nóbrega']
+NOMES_US = ['John', 'Emily', 'Michael', 'Ashley', 'Christopher', 'Jessica', 'Matthew', 'Sarah']
+SOBRENOMES_US = ['Miller', "O'Connor", 'Johnson', 'Smith-Jones', 'Williams', 'McDonald', 'García']
+RESPONSAVEIS = ['Cláudia Fehribach', 'Marcos Daniels', 'Ana Paula Rocha', 'Rafael Conceição']
+FONTES = ['Tráfego - Lead Direct - Carreira', 'Indicação', 'Instagram - Stories', 'Evento presencial', 'Site']
+ETAPAS = ['etapa 1 - ativação', 'etapa 2 - qualificação', 'etapa 3 - agendamento', 'meeting realizado', 'perdido']
+ESTADOS = ['Florida', 'Massachusetts', 'Utah', 'New Jersey', 'Texas', 'California', 'Georgia', 'Connecticut']
+TIPOS_AGENDAMENTO = ['', '', 'Online', 'Presencial']
+PERMISSOES = ['Possui Work Permit', 'Não possui', 'Green Card', 'Cidadão americano', 'Em processo']
+DOMINIOS = ['gmail.com', 'hotmail.com', 'yahoo.com', 'outlook.com', 'icloud.com']
+FRASES = [
+    "Sim, tenho interesse em mudar de carreira.",
+    "Trabalho na área há 5 anos, mas quero algo com horário flexível.",
+    "Não sei ainda; preciso falar com meu marido (ele decide).",
+    "Ligar depois das 18h, por favor.",
+    "I'd like to know more about the \"career plan\", thanks!",
+    "Tenho Work Permit desde 2022, renovação em andamento.",
+    "Moro em Orlando; posso ir ao escritório 2x por semana.",
+    "Já fui corretora no Brasil — 10 anos de experiência.",
+    "Prefiro contato por WhatsApp: +1 (407) 555-0199.",
+    "Resposta da IA: lead qualificado, score 87/100, perfil empreendedor.",
+]
+DATAS_INVALIDAS = ['2024-03-15', '15/03', 'ontem', ' ', 'N/A']
+
+def _full_name(rng):
+    if rng.random() < 0.7:
+        return f"{rng.choice(NOMES_BR)} {rng.choice(SOBRENOMES_BR)}"
+    return f"{rng.choice(NOMES_US)} {rng.choice(SOBRENOMES_US)}"
+
+def _date(rng, zero_pad=None):
+    day, month, year = rng.randint(1, 28), rng.randint(1, 12), rng.randint(2023, 2025)
+    if zero_pad is None:
+        zero_pad = rng.random() < 0.5
+    return f"{day:02d}/{month:02d}/{year}" if zero_pad else f"{day}/{month}/{year}"
+
+def _respostas(rng):
+    """Texto longo, às vezes com várias linhas, vírgulas e aspas; vazio em ~30% dos leads"""
+    if rng.random() < 0.3:
+        return ''
+    parts = [rng.choice(FRASES) for _ in range(rng.randint(1, 30))]
+    separator = '\n' if rng.random() < 0.3 else ' '
+    return separator.join(parts)
+
+def _phone(rng):
+    if rng.random() < 0.8:
+        return f"+1{rng.randint(2012000000, 9899999999)}"
+    return f"+55 11 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+
+def synthetic_lead(rng, number):
+    """Um registro válido, na ordem de LEAD_SCHEMA"""
+    name = _full_name(rng)
+    email_user = ''.join(ch for ch in name.lower().split()[0] if ch.isascii() and ch.isalpha()) or 'lead'
+    return [
+        str(20000000 + number),
+        rng.choice(RESPONSAVEIS),
+        name,
+        _date(rng),
+        rng.choice(FONTES),
+        rng.choice(ETAPAS),
+        rng.choice(ESTADOS),
+        rng.choice(TIPOS_AGENDAMENTO),
+        _respostas(rng),
+        f"{email_user}{number}@{rng.choice(DOMINIOS)}",
+        _phone(rng),
+        rng.choice(ESTADOS + ['']),
+        rng.choice(PERMISSOES),
+        _date(rng, zero_pad=True) if rng.random() < 0.4 else '',
+        f"{_date(rng, zero_pad=True)} {rng.randint(8, 19):02d}:{rng.choice(['00', '30'])}" if rng.random() < 0.2 else '',
+    ]
+
+def malform(rng, row, number):
+    """
+    Estraga o registro de um jeito que o pipeline atual aceita (vira NULL ou é ignorado):
+    linha curta, colunas extras, data em outro formato, valores só com espaços,
+    lead_id vazio ou repetido
+    """
+    kind = rng.randrange(6)
+    if kind == 0:
+        return row[:-2]
+    if kind == 1:
+        return row + ['coluna extra', '']
+    if kind == 2:
+        row[3] = rng.choice(DATAS_INVALIDAS)
+    elif kind == 3:
+        row[6] = row[11] = '   '
+    elif kind == 4:
+        row[0] = ''
+    else:
+        row[0] = str(20000000 + max(number - 1, 0))
+    return row
+
+def poison(rng, row):
+    """Estraga o registro de um jeito que o banco rejeita: data impossível ou campo obrigatório vazio"""
+    if rng.random() < 0.5:
+        row[3] = f"{rng.choice([30, 31])}/02/{rng.randint(2023, 2025)}"
+    else:
+        row[2] = ''
+    return row
+
+def write_synthetic_leads_csv(path, rows, seed=42, malformed_rate=0.01, poison_rate=0.0):
+    """
+    Escreve um CSV com os cabeçalhos do export do CRM e rows registros
+
+    Args:
+        path: Arquivo de saída
+        rows: Quantidade de registros
+        seed: Semente, para que o mesmo tamanho gere sempre o mesmo arquivo
+        malformed_rate: Fração de registros estragados que o pipeline tolera (ver malform)
+        poison_rate: Fração de registros que o banco rejeita (ver poison)
+
+    Returns:
+        Quantidade de bytes escritos
+    """
+    rng = random.Random(seed)
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+
+        for number in range(rows):
+            row = synthetic_lead(rng, number)
+            roll = rng.random()
+            if roll < poison_rate:
+                row = poison(rng, row)
+            elif roll < poison_rate + malformed_rate:
+                row = malform(rng, row, number)
+            writer.writerow(row)
+
+            # Linha em branco ocasional entre registros (ignorada pelo leitor de CSV)
+            if malformed_rate and rng.random() < malformed_rate / 10:
+                f.write('\r\n')
+
+    return os.path.getsize(path)
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Os módulos e scripts ficam na raiz do repositório (os scripts com hífen são carregados com importlib)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+Data no formato certo mas impossível (30/02/2025 -> 2025-02-30): a exportação Parquet
+grava nulo nessa célula e conta o aviso, em vez de abortar com ArrowInvalid
+"""
+
+import csv
+import importlib
+import random
+
+import pyarrow.dataset
+
+from lead_schema import CSV_HEADERS
+from synthetic_leads import synthetic_lead
+
+export_parquet = importlib.import_module('export-leads-parquet')
+
+def write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(rows)
+
+def test_impossible_date_is_written_as_null(tmp_path, capsys):
+    rng = random.Random(7)
+    rows = [synthetic_lead(rng, number) for number in range(5)]
+    rows[2][3] = '30/02/2025'
+    rows[4][3] = '01/03/2025'
+    csv_path = tmp_path / 'leads.csv'
+    write_csv(csv_path, rows)
+
+    output_dir = tmp_path / 'parquet'
+    assert export_parquet.export_leads_parquet(str(output_dir), csv_path=str(csv_path))
+    assert '1 datas inválidas em data_criada' in capsys.readouterr().out
+
+    table = pyarrow.dataset.dataset(str(output_dir), partitioning='hive').to_table()
+    dates = dict(zip(table.column('lead_id').to_pylist(), table.column('data_criada').to_pylist()))
+    assert len(dates) == 5
+    assert dates[rows[2][0]] is None
+    assert dates[rows[4][0]].isoformat() == '2025-03-01'
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Lote dividido ao meio em que uma metade é gravada e a outra falha por rede/timeout:
+o --resume envia só os registros não gravados, sem duplicar os já confirmados
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import re
+import subprocess
+import time
+from concurrent.futures import as_completed
+
+import pytest
+from aiohttp import web
+
+from import_journal import ImportJournal
+from leads_csv import encode_json_records
+from quarantine import QuarantineFile, is_row_error, isolate_row_errors
+from supabase_ingest import LeadsIngestClient
+
+POISON_DATE = '2025-02-30'
+
+def make_leads(count, poison, flaky):
+    leads = []
+    for number in range(1, count + 1):
+        leads.append({'lead_id': f'L{number}', 'data_criada': POISON_DATE if number == poison else '2025-02-01',
+                      'flaky': number == flaky})
+    return leads
+
+def quarantined_ids(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line)['registro']['lead_id'] for line in f]
+
+class FakePostgrest:
+    """POST /rest/v1/leads: 400 (22008) com data impossível, 500 com um registro 'flaky' enquanto down"""
+
+    def __init__(self):
+        self.down = True
+        self.inserted = []
+
+    async def handle(self, request):
+        rows = json.loads(await request.read())
+        if any(row['data_criada'] == POISON_DATE for row in rows):
+            return web.json_response({'code': '22008', 'message': 'date/time field value out of range'}, status=400)
+        if self.down and any(row['flaky'] for row in rows):
+            return web.json_response({'message': 'canceling statement due to statement timeout'}, status=500)
+        self.inserted.extend(row['lead_id'] for row in rows)
+        return web.Response(status=201)
+
+async def run_rest_import(server, journal, leads, quarantine, api):
+    """Um --resume de import-batch-api.py: lotes de 8 com os números do diário, checkpoint a cada lote"""
+    app = web.Application()
+    app.router.add_post('/rest/v1/leads', server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    pending = list(journal.pending_rows(leads))
+    batches = [encode_json_records([lead for _, lead in pending[i:i + 8]], [number for number, _ in pending[i:i + 8]])
+               for i in range(0, len(pending), 8)]
+
+    def on_result(batch_number, batch, success, message):
+        api.record_journal_batch(journal, batch, success)
+
+    try:
+        async with LeadsIngestClient(f'http://127.0.0.1:{port}', 'key', max_in_flight=1, max_retries=0,
+                                     quarantine=quarantine) as client:
+            return await client.ingest(batches, on_result)
+    finally:
+        await runner.cleanup()
+
+def test_rest_resume_skips_committed_halves(tmp_path, monkeypatch):
+    monkeypatch.setenv('VITE_SUPABASE_URL', 'http://127.0.0.1')
+    monkeypatch.setenv('SUPABASE_SERVICE_ROLE_KEY', 'key')
+    api = importlib.import_module('import-batch-api')
+
+    leads = make_leads(8, poison=2, flaky=7)
+    server = FakePostgrest()
+    journal_path = tmp_path / 'leads.journal'
+    quarantine = QuarantineFile(str(tmp_path / 'quarantine.jsonl'))
+
+    journal = ImportJournal(str(journal_path), 'origem')
+    stats = asyncio.run(run_rest_import(server, journal, leads, quarantine, api))
+    journal.close()
+    assert stats.failed_batches == 1
+    assert sorted(server.inserted) == ['L1', 'L3', 'L4']
+
+    server.down = False
+    journal = ImportJournal(str(journal_path), 'origem', resume=True)
+    assert journal.committed_rows == 4
+    stats = asyncio.run(run_rest_import(server, journal, leads, quarantine, api))
+    journal.close()
+    quarantine.close()
+
+    assert stats.failed_batches == 0
+    assert sorted(server.inserted) == ['L1', 'L3', 'L4', 'L5', 'L6', 'L7', 'L8']
+    assert quarantined_ids(quarantine.path) == ['L2']
+
+def write_batch(path, leads):
+    records = [f"(\n'{lead['lead_id']}', '{lead['data_criada']}', {str(lead['flaky']).lower()}\n)" for lead in leads]
+    path.write_text('INSERT INTO public.leads (lead_id, data_criada, flaky) VALUES\n' + ',\n'.join(records) + ';\n',
+                    encoding='utf-8')
+
+def test_psql_resume_skips_committed_halves(tmp_path, monkeypatch):
+    psql = importlib.import_module('import-direct-psql')
+    state = {'down': True, 'inserted': []}
+
+    def fake_run_psql(connection_string, sql_file='-', sql_text=None, single_transaction=False):
+        text = sql_text if sql_text is not None else open(sql_file, encoding='utf-8').read()
+        records = [record for _, record in psql.split_insert_records(text)]
+        if any(POISON_DATE in record for record in records):
+            return subprocess.CompletedProcess([], 3, '', 'ERROR:  22008: date/time field value out of range')
+        if state['down'] and any('true' in record for record in records):
+            return subprocess.CompletedProcess([], 2, '', 'psql: error: server closed the connection unexpectedly')
+        state['inserted'].extend(re.search(r"'(\w+)'", record).group(1) for record in records)
+        return subprocess.CompletedProcess([], 0, '', '')
+
+    monkeypatch.setattr(psql, 'run_psql', fake_run_psql)
+
+    batch = tmp_path / '01_insert_batch_1_to_8.sql'
+    write_batch(batch, make_leads(8, poison=2, flaky=7))
+    journal_path = tmp_path / 'import-journal.jsonl'
+    quarantine = QuarantineFile(str(tmp_path / 'quarantine.jsonl'))
+
+    journal = ImportJournal(str(journal_path), 'lotes')
+    results = psql.run_insert_batches([str(batch)], 'postgresql://localhost/leads', 1, 0, journal, quarantine)
+    journal.close()
+    assert not results[0]['success']
+    assert sorted(state['inserted']) == ['L1', 'L3', 'L4']
+
+    state['down'] = False
+    journal = ImportJournal(str(journal_path), 'lotes', resume=True)
+    assert journal.settled_positions(batch.name) == [[1, 4]]
+    results = psql.run_insert_batches([str(batch)], 'postgresql://localhost/leads', 1, 0, journal, quarantine)
+    journal.close()
+    quarantine.close()
+
+    assert results[0]['success'] and results[0]['rows'] == 4
+    assert journal.is_committed(batch.name)
+    assert sorted(state['inserted']) == ['L1', 'L3', 'L4', 'L5', 'L6', 'L7', 'L8']
+    assert len(quarantined_ids(quarantine.path)) == 1
+
+def test_psql_interrupt_journals_batches_still_running(tmp_path, monkeypatch):
+    psql = importlib.import_module('import-direct-psql')
+    inserted = []
+
+    def fake_run_psql(connection_string, sql_file='-', sql_text=None, single_transaction=False):
+        text = sql_text if sql_text is not None else open(sql_file, encoding='utf-8').read()
+        records = [record for _, record in psql.split_insert_records(text)]
+        if 'L1' not in text:
+            time.sleep(0.2)
+        inserted.extend(re.search(r"'(\w+)'", record).group(1) for record in records)
+        return subprocess.CompletedProcess([], 0, '', '')
+
+    def interrupted_as_completed(futures):
+        # Ctrl-C logo depois do primeiro lote concluído, com os outros dois ainda no psql
+        yield next(as_completed(futures))
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(psql, 'run_psql', fake_run_psql)
+    monkeypatch.setattr(psql, 'as_completed', interrupted_as_completed)
+
+    leads = make_leads(6, poison=0, flaky=0)
+    batches = []
+    for first in (1, 3, 5):
+        batch = tmp_path / f'01_insert_batch_{first}_to_{first + 1}.sql'
+        write_batch(batch, leads[first - 1:first + 1])
+        batches.append(str(batch))
+
+    journal_path = tmp_path / 'import-journal.jsonl'
+    journal = ImportJournal(str(journal_path), 'lotes')
+    with pytest.raises(KeyboardInterrupt):
+        psql.run_insert_batches(batches, 'postgresql://localhost/leads', 3, 0, journal)
+    journal.close()
+
+    assert sorted(inserted) == ['L1', 'L2', 'L3', 'L4', 'L5', 'L6']
+    journal = ImportJournal(str(journal_path), 'lotes', resume=True)
+    assert all(journal.is_committed(os.path.basename(batch)) for batch in batches)
+    journal.close()
+
+def test_bisection_stops_when_both_halves_fail_alike():
+    loads = []
+
+    def load(positions):
+        loads.append(positions)
+        return False, 'ERROR:  23502: null value in column "nome"', '23502'
+
+    result = isolate_row_errors(list(range(64)), load, 'ERROR:  23502')
+    assert len(loads) == 2
+    assert result.rejected == [] and result.committed == 0
+    assert result.failed_rows == 64
+
+def test_unique_violation_is_not_a_row_error():
+    assert is_row_error('22008') and is_row_error('23502')
+    assert not is_row_error('23505')
+
+def test_psql_already_loaded_batch_is_not_bisected(tmp_path, monkeypatch):
+    psql = importlib.import_module('import-direct-psql')
+    calls = []
+
+    def fake_run_psql(connection_string, sql_file='-', sql_text=None, single_transaction=False):
+        calls.append(sql_file)
+        return subprocess.CompletedProcess([], 3, '', 'ERROR:  23505: duplicate key value violates unique constraint')
+
+    monkeypatch.setattr(psql, 'run_psql', fake_run_psql)
+    batch = tmp_path / '01_insert_batch_1_to_8.sql'
+    write_batch(batch, make_leads(8, poison=0, flaky=0))
+    quarantine = QuarantineFile(str(tmp_path / 'quarantine.jsonl'))
+
+    result = psql.run_batch_with_retry(str(batch), 'postgresql://localhost/leads', 3, quarantine)
+    quarantine.close()
+    assert not result['success'] and result['attempts'] == 1
+    assert len(calls) == 1 and quarantine.count == 0
+
+async def post_with_slow_commit(**client_options):
+    """Servidor que grava o lote mas responde depois do timeout do cliente; retorna (resultado, requisições)"""
+    requests = []
+
+    async def handle(request):
+        requests.append(await request.read())
+        await asyncio.sleep(0.5)
+        return web.Response(status=201)
+
+    app = web.Application()
+    app.router.add_post('/rest/v1/leads', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with LeadsIngestClient(f'http://127.0.0.1:{port}', 'key', max_retries=2, timeout=0.1,
+                                     **client_options) as client:
+            client._backoff_delay = lambda attempt, retry_after=None: 0.0
+            return await client.post_batch([{'lead_id': 'L1'}]), len(requests)
+    finally:
+        await runner.cleanup()
+
+def test_rest_timeout_retries_only_idempotent_requests():
+    (success, message), requests = asyncio.run(post_with_slow_commit())
+    assert not success and requests == 1
+    assert 'não repetido' in message
+
+    (success, _), requests = asyncio.run(post_with_slow_commit(upsert_on='lead_id'))
+    assert not success and requests == 3